@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+
+"""Local stand-in for the Sleuren API serving a deterministic synthetic fleet, with configurable latency, error rate and rate limit"""
+
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+LOCATIONS = ['Frankfurt', 'New York', 'Singapore', 'London', 'Sydney', 'Sao Paulo']
+SYSTEMS = ['Ubuntu 22.04', 'Ubuntu 20.04', 'Debian 12', 'Debian 11', 'Rocky Linux 9']
+TAGS = ['prod', 'staging', 'db', 'web', 'cache', 'eu', 'us', 'asia']
+MOUNTS = ['/', '/data', '/var', '/backup']
+GB = 1024 ** 3
+
+def generateServer(rnd, number: int):
+    """Return the API data of a server with one to four disk mounts and up to three tags"""
+
+    server = {
+        'id': 'srv%06d' % number,
+        'name': 'host-%d.example.com' % number,
+        'os': rnd.choice(SYSTEMS),
+        'status': 'online' if rnd.random() < 0.95 else 'offline',
+        'agent_version': '1.2.0',
+        'ip_whois': {'ip': '10.%d.%d.%d' % (number >> 16 & 255, number >> 8 & 255, number & 255), 'country': 'DE', 'org': 'Example Hosting'},
+        'summary': {
+            'cpu_usage_percent': round(rnd.betavariate(2, 5) * 100, 2),
+            'mem_usage_percent': round(rnd.betavariate(3, 4) * 100, 2),
+            'disk_usage_percent': round(rnd.betavariate(3, 3) * 100, 2),
+        },
+        'last_data': {
+            'uptime': {'seconds': rnd.randint(60, 10 ** 7)},
+            'cores': rnd.choice([2, 4, 8, 16]),
+            'df': [{'mount': mount, 'free_bytes': rnd.randint(1, 500) * GB, 'used_bytes': rnd.randint(1, 500) * GB} for mount in MOUNTS[:rnd.randint(1, len(MOUNTS))]],
+        },
+        'tags': rnd.sample(TAGS, rnd.randint(0, 3)),
+    }
+
+    # servers that have not reported yet
+    if rnd.random() < 0.02:
+        server['summary'] = None
+        server['last_data'] = None
+    return server
+
+def generateMonitor(rnd, number: int):
+    """Return the API data of a website monitor, some of them not checked yet"""
+
+    monitor = {
+        'id': 'mon%06d' % number,
+        'url': 'site%d.example.com' % number,
+        'name': 'site%d' % number,
+        'code': rnd.choice([200] * 18 + [301, 503]),
+        'status': 'up',
+        'status_message': 'OK',
+        'monitor': {'name': rnd.choice(LOCATIONS)},
+        'uptime_percentage': '%.4f' % (100 - rnd.expovariate(2)),
+    }
+    if monitor['code'] == 503:
+        monitor['status'] = 'down'
+        monitor['status_message'] = 'Service Unavailable'
+    if rnd.random() < 0.9:
+        monitor['last_check'] = {'ttfb': round(rnd.lognormvariate(-1, 0.6), 4)}
+    return monitor
+
+class Fleet(object):
+    """Servers, monitors and tokens generated from a seed, with every item encoded once so pages are served quickly"""
+
+    def __init__(self, servers: int, monitors: int, seed: int = 1):
+        rnd = random.Random(seed)
+        self.servers = {}
+        for number in range(servers):
+            server = generateServer(rnd, number)
+            self.servers[server['id']] = server
+        # id -> encoded item, in the order of the API
+        self.encoded = {
+            'servers': {id: json.dumps(server).encode() for id, server in self.servers.items()},
+            'monitors': {},
+        }
+        for number in range(monitors):
+            monitor = generateMonitor(rnd, number)
+            self.encoded['monitors'][monitor['id']] = json.dumps(monitor).encode()
+        self.tokens = [{'token': 'token%d' % number} for number in range(2)]
+        self.next_monitor = monitors
+        # lists of the encoded items to slice pages from, rebuilt after modifications
+        self.lists = {}
+        # changed by every modification, so cached pages are revalidated
+        self.version = 0
+        self.lock = threading.Lock()
+
+    def page(self, key: str, page: int, size: int):
+        with self.lock:
+            if key not in self.lists:
+                self.lists[key] = list(self.encoded[key].values())
+            items = self.lists[key][(page - 1) * size:page * size]
+        return b'{"' + key.encode() + b'": [' + b', '.join(items) + b']}'
+
+    def item(self, key: str, id: str):
+        """Return the encoded server or monitor with the given id, None if there is none"""
+
+        with self.lock:
+            return self.encoded[key].get(id)
+
+    def modified(self, key: str):
+        self.lists.pop(key, None)
+        self.version += 1
+
+    def addMonitor(self, data: dict):
+        with self.lock:
+            monitor = generateMonitor(random.Random(self.next_monitor), self.next_monitor)
+            monitor.update({'url': data.get('url', ''), 'name': data.get('name', '')})
+            self.next_monitor += 1
+            self.encoded['monitors'][monitor['id']] = json.dumps(monitor).encode()
+            self.modified('monitors')
+
+    def removeMonitor(self, id: str):
+        with self.lock:
+            if self.encoded['monitors'].pop(id, None) == None:
+                return False
+            self.modified('monitors')
+            return True
+
+    def updateServer(self, id: str, data: dict):
+        with self.lock:
+            server = self.servers.get(id)
+            if server == None:
+                return False
+            server['tags'] = data.get('tags', [])
+            self.encoded['servers'][id] = json.dumps(server).encode()
+            self.modified('servers')
+            return True
+
+class MockApi(object):
+    """HTTP server implementing the endpoints used by the CLI. Requests are counted per method and path, e.g. "GET servers"
+
+    Besides the API it offers GET /__stats returning the counts and POST /__reset generating the fleet again and resetting the counts"""
+
+    def __init__(self, port: int = 0, servers: int = 1000, monitors: int = 1000, seed: int = 1, latency: float = 0.0, error_rate: float = 0.0, rate_limit: int = 0):
+        self.sizes = (servers, monitors, seed)
+        self.latency = latency
+        self.error_rate = error_rate
+        # requests per second, counted in windows of a second like most APIs do
+        self.rate_limit = rate_limit
+        self.window = (0, 0)
+        self.errors = random.Random(seed)
+        self.fleet = Fleet(servers, monitors, seed)
+        self.counts = {}
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), self.handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def endpoint(self):
+        return 'http://127.0.0.1:' + str(self.server.server_address[1]) + '/api/'
+
+    def start(self):
+        """Serve in a background thread"""
+
+        self.thread = threading.Thread(target=self.server.serve_forever, name='mockapi', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def reset(self):
+        """Generate the fleet again, undoing all modifications, and reset the counts"""
+
+        fleet = Fleet(*self.sizes)
+        with self.lock:
+            self.fleet = fleet
+        self.resetCounts()
+
+    def resetCounts(self):
+        with self.lock:
+            self.errors = random.Random(self.sizes[2])
+            self.counts = {}
+
+    def throttle(self):
+        """Return the seconds until the next window if the rate limit is exceeded, otherwise None"""
+
+        if self.rate_limit <= 0:
+            return None
+        now = time.time()
+        with self.lock:
+            second, requests = self.window
+            if second != int(now):
+                second, requests = int(now), 0
+            self.window = (second, requests + 1)
+            if requests < self.rate_limit:
+                return None
+            self.counts['throttled'] = self.counts.get('throttled', 0) + 1
+            return second + 1 - now
+
+    def count(self, method: str, path: str):
+        """Count a request and return True if it should fail, drawn from a seeded generator so failures are reproducible"""
+
+        with self.lock:
+            name = method + ' ' + path
+            self.counts[name] = self.counts.get(name, 0) + 1
+            self.counts['total'] = self.counts.get('total', 0) + 1
+            return self.error_rate > 0 and self.errors.random() < self.error_rate
+
+    def handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def handle(self):
+                # the CLI closes connections of prefetched pages it does not need
+                try:
+                    super().handle()
+                except ConnectionError:
+                    pass
+
+            def send(self, status: int, body: bytes = b'', headers = None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                if body:
+                    self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def read(self):
+                try:
+                    return json.loads(self.body or b'{}')
+                except ValueError:
+                    return {}
+
+            def route(self, method: str):
+                """Return the path below /api/ and the query, or handle the control endpoints and return None"""
+
+                # the body is read before any response, otherwise it is taken for the next request on the connection
+                length = int(self.headers.get('Content-Length') or 0)
+                self.body = self.rfile.read(length) if length > 0 else b''
+
+                url = urlparse(self.path)
+                if url.path == '/__stats':
+                    self.send(200, json.dumps(api.counts).encode())
+                    return None
+                if url.path == '/__reset':
+                    api.reset()
+                    self.send(200, b'{}')
+                    return None
+                if not url.path.startswith('/api/'):
+                    self.send(404, b'{}')
+                    return None
+
+                path = url.path[len('/api/'):].rstrip('/')
+                delay = api.throttle()
+                if delay != None:
+                    self.send(429, b'{"message": "Too Many Attempts."}', {'Retry-After': str(max(1, round(delay)))})
+                    return None
+                # the counts group the requests of all servers and monitors, e.g. "DELETE monitor"
+                if api.count(method, path.split('/')[0]):
+                    self.send(500, b'{"message": "injected error"}')
+                    return None
+                if api.latency > 0:
+                    time.sleep(api.latency)
+                return path, parse_qs(url.query)
+
+            def do_GET(self):
+                route = self.route('GET')
+                if route == None:
+                    return
+                path, query = route
+
+                if path in ('servers', 'monitors'):
+                    page = int(query.get('page', ['1'])[0])
+                    size = int(query.get('perpage', ['5000'])[0])
+                    etag = '"' + '-'.join(str(value) for value in (api.fleet.version, page, size)) + '"'
+                    if self.headers.get('If-None-Match') == etag:
+                        with api.lock:
+                            api.counts['not modified'] = api.counts.get('not modified', 0) + 1
+                        self.send(304, b'', {'ETag': etag})
+                    else:
+                        self.send(200, api.fleet.page(path, page, size), {'ETag': etag})
+                elif path.startswith(('server/', 'monitor/')):
+                    kind, id = path.split('/', 1)
+                    item = api.fleet.item(kind + 's', id)
+                    if item == None:
+                        self.send(404, b'{}')
+                    else:
+                        self.send(200, item)
+                elif path == 'token':
+                    self.send(200, json.dumps({'tokens': api.fleet.tokens}).encode())
+                else:
+                    self.send(404, b'{}')
+
+            def do_POST(self):
+                route = self.route('POST')
+                if route == None:
+                    return
+                path, query = route
+
+                if path == 'monitors':
+                    api.fleet.addMonitor(self.read())
+                    self.send(200, b'{}')
+                elif path == 'token':
+                    api.fleet.tokens.append({'token': 'token%d' % len(api.fleet.tokens)})
+                    self.send(200, json.dumps(api.fleet.tokens[-1]).encode())
+                else:
+                    self.send(404, b'{}')
+
+            def do_PUT(self):
+                route = self.route('PUT')
+                if route == None:
+                    return
+                path, query = route
+
+                if path.startswith('server/') and api.fleet.updateServer(path.split('/', 1)[1], self.read()):
+                    self.send(200, b'{}')
+                else:
+                    self.send(404, b'{}')
+
+            def do_DELETE(self):
+                route = self.route('DELETE')
+                if route == None:
+                    return
+                path, query = route
+
+                if path.startswith('monitor/') and api.fleet.removeMonitor(path.split('/', 1)[1]):
+                    self.send(204)
+                else:
+                    self.send(404, b'{}')
+
+        return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a synthetic Sleuren API for testing and benchmarking sleurencli')
+    parser.add_argument('--port', default=8765, type=int, metavar='port', help='port to listen on, 0 for any free port')
+    parser.add_argument('--servers', default=1000, type=int, metavar='n', help='number of servers')
+    parser.add_argument('--monitors', default=1000, type=int, metavar='n', help='number of website monitors')
+    parser.add_argument('--seed', default=1, type=int, metavar='n', help='seed of the generated fleet')
+    parser.add_argument('--latency', default=0.0, type=float, metavar='sec', help='delay of every response')
+    parser.add_argument('--error-rate', default=0.0, type=float, metavar='rate', help='fraction of API requests failing with status 500')
+    parser.add_argument('--rate-limit', default=0, type=int, metavar='n', help='requests per second answered before responding with status 429, 0 for no limit')
+    args = parser.parse_args()
+
+    api = MockApi(args.port, args.servers, args.monitors, args.seed, args.latency, args.error_rate, args.rate_limit)
+    print('Serving', args.servers, 'servers and', args.monitors, 'monitors at', api.endpoint)
+    print('Set "endpoint =', api.endpoint + '" in the [Connection] section of sleuren.ini to use it')
+    try:
+        api.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
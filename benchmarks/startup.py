@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+"""Measure the startup time of the CLI for commands that do not call the API and check which modules they import"""
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+import time
+
+here = os.path.abspath(os.path.dirname(__file__))
+
+# commands to measure, none of them reads data from the API
+COMMANDS = [
+    ['--version'],
+    ['--help'],
+    ['servers', 'list', '--help'],
+    ['sites', 'list', '--help'],
+    ['config', 'print'],
+    ['__complete', 'bash', 'sleurencli sites list --url '],
+]
+
+# modules that are only needed when a command requests data from the API
+LAZY_MODULES = ['requests', 'prettytable', 'webbrowser', 'sleurencli.lib.servers', 'sleurencli.lib.sites', 'sleurencli.lib.statistics']
+
+def run(args, cwd: str, env: dict):
+    """Run the CLI once and return the wall-clock time in milliseconds"""
+
+    start = time.perf_counter()
+    subprocess.run([sys.executable] + args, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+    return (time.perf_counter() - start) * 1000
+
+def measure(args, runs: int, cwd: str, env: dict):
+    """Return the minimum and median of the wall-clock times of the given number of runs"""
+
+    times = [run(args, cwd, env) for i in range(runs)]
+    return {'min': min(times), 'median': statistics.median(times)}
+
+def importedModules(args, cwd: str, env: dict):
+    """Return the names of all modules imported by a command"""
+
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + args, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True, check=False)
+    return set(line.split('|')[-1].strip() for line in result.stderr.splitlines() if line.startswith('import time:'))
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the startup time of sleurencli')
+    parser.add_argument('--runs', default=20, type=int, metavar='n', help='number of runs per command')
+    parser.add_argument('--json', default='', metavar='file', help='save the results in JSON format to file')
+    parser.add_argument('--max-ms', default=0, type=float, metavar='ms', help='fail if the median startup time of --version exceeds the interpreter startup by more than ms')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.path.dirname(here) + os.pathsep + env.get('PYTHONPATH', '')
+
+    failed = False
+    results = {}
+
+    # run in an empty directory, so no config file is read
+    with tempfile.TemporaryDirectory() as cwd:
+        results['python'] = measure(['-c', 'pass'], args.runs, cwd, env)
+        print('{:<32} {:>8.1f} ms min {:>8.1f} ms median'.format('python -c pass', results['python']['min'], results['python']['median']))
+
+        for command in COMMANDS:
+            name = 'sleurencli ' + ' '.join(command)
+            results[name] = measure(['-m', 'sleurencli.sleurencli'] + command, args.runs, cwd, env)
+            results[name]['startup'] = results[name]['median'] - results['python']['median']
+            print('{:<32} {:>8.1f} ms min {:>8.1f} ms median {:>8.1f} ms startup'.format(name, results[name]['min'], results[name]['median'], results[name]['startup']))
+
+        modules = importedModules(['-m', 'sleurencli.sleurencli', '--version'], cwd, env)
+
+    imported = [module for module in LAZY_MODULES if module in modules]
+    results['imported'] = imported
+    if imported:
+        print('ERROR: sleurencli --version imports', ', '.join(imported))
+        failed = True
+
+    startup = results['sleurencli --version']['startup']
+    if args.max_ms > 0 and startup > args.max_ms:
+        print('ERROR: startup time of sleurencli --version is {:.1f} ms, more than {:.1f} ms'.format(startup, args.max_ms))
+        failed = True
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=4)
+        print('Saved results to', args.json)
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
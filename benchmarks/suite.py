@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+
+"""Measure wall time, peak memory and API requests of the CLI commands against the local mock API"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+from mockapi import MockApi
+
+here = os.path.abspath(os.path.dirname(__file__))
+
+# name, arguments and whether the command modifies the fleet, which is generated again before the next command
+COMMANDS = [
+    ('servers list', ['servers', 'list'], False),
+    ('servers list sorted', ['servers', 'list', '--sort=-cpu', '--limit', '20'], False),
+    ('servers list csv', ['servers', 'list', '--csv'], False),
+    ('servers list group-by', ['servers', 'list', '--group-by', 'tag'], False),
+    ('sites list', ['sites', 'list'], False),
+    ('sites list issues', ['sites', 'list', '--issues'], False),
+    ('sites list json', ['sites', 'list', '--json'], False),
+    ('statistics', ['statistics'], False),
+    ('sites add bulk', ['sites', 'add', '--file', '{urls}'], True),
+    ('sites remove bulk', ['sites', 'remove', '--pattern', 'site42'], True),
+    ('servers update bulk', ['servers', 'update', '--match-tag', 'db', '--add-tag', 'benchmark'], True),
+]
+
+CONFIG = '''[Connection]
+api-key = benchmark
+endpoint = {endpoint}
+
+[Cache]
+enabled = False
+'''
+
+def run(args, cwd: str, env: dict):
+    """Run the CLI once and return its wall-clock time in seconds, peak memory in MB and exit status"""
+
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-m', 'sleurencli.sleurencli'] + args, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    pid, status, usage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - start
+
+    # the maximum resident set size is reported in kilobytes on Linux and in bytes on macOS
+    peak = usage.ru_maxrss / 1024 if sys.platform != 'darwin' else usage.ru_maxrss / 1024 / 1024
+    return elapsed, peak, os.WEXITSTATUS(status) if os.WIFEXITED(status) else -1
+
+def measure(api, name: str, args, mutates: bool, runs: int, cwd: str, env: dict):
+    """Run a command the given number of times on a fresh fleet and return the times, peak memory and requests"""
+
+    times = []
+    peaks = []
+    failed = 0
+    for i in range(runs):
+        api.resetCounts()
+        elapsed, peak, status = run(args, cwd, env)
+        times.append(elapsed)
+        peaks.append(peak)
+        if status != 0:
+            failed += 1
+        requests = dict(api.counts)
+        if mutates:
+            api.reset()
+
+    return {
+        'min': min(times),
+        'median': statistics.median(times),
+        'peak_mb': max(peaks),
+        'requests': requests.get('total', 0),
+        'requests_by_endpoint': {endpoint: count for endpoint, count in requests.items() if endpoint != 'total'},
+        'failed_runs': failed,
+    }
+
+def compare(results: dict, baseline: dict, tolerance: float):
+    """Return the list of regressions against the results of an earlier run"""
+
+    regressions = []
+    for size, commands in results.items():
+        for name, result in commands.items():
+            before = baseline.get(size, {}).get(name)
+            if before == None:
+                continue
+            if result['median'] > before['median'] * (1 + tolerance):
+                regressions.append('{} at {}: median {:.3f} s, was {:.3f} s'.format(name, size, result['median'], before['median']))
+            if result['peak_mb'] > before['peak_mb'] * (1 + tolerance):
+                regressions.append('{} at {}: peak memory {:.1f} MB, was {:.1f} MB'.format(name, size, result['peak_mb'], before['peak_mb']))
+            # the number of requests is deterministic, any increase is a regression
+            if result['requests'] > before['requests']:
+                regressions.append('{} at {}: {} requests, were {}'.format(name, size, result['requests'], before['requests']))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark sleurencli against a local mock API')
+    parser.add_argument('--sizes', default='1000,10000', metavar='n,n', help='comma separated numbers of servers and monitors of the fleets, e.g. 1000,10000,100000')
+    parser.add_argument('--runs', default=3, type=int, metavar='n', help='number of runs per command')
+    parser.add_argument('--commands', default='', metavar='name,name', help='comma separated names of the commands to run, all by default')
+    parser.add_argument('--bulk', default=200, type=int, metavar='n', help='number of URLs added by the bulk add')
+    parser.add_argument('--latency', default=0.0, type=float, metavar='sec', help='delay of every response of the mock API')
+    parser.add_argument('--error-rate', default=0.0, type=float, metavar='rate', help='fraction of API requests failing with status 500')
+    parser.add_argument('--rate-limit', default=0, type=int, metavar='n', help='requests per second the mock API answers before responding with status 429')
+    parser.add_argument('--json', default='', metavar='file', help='save the results in JSON format to file')
+    parser.add_argument('--baseline', default='', metavar='file', help='fail if the results regressed against those saved to file by an earlier run')
+    parser.add_argument('--tolerance', default=0.25, type=float, metavar='fraction', help='allowed increase of time and memory against the baseline')
+    args = parser.parse_args()
+
+    selected = [name.strip() for name in args.commands.split(',') if name.strip()]
+    commands = [command for command in COMMANDS if not selected or command[0] in selected]
+
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.path.dirname(here) + os.pathsep + env.get('PYTHONPATH', '')
+
+    results = {}
+    failed = False
+
+    with tempfile.TemporaryDirectory() as cwd:
+        # keep the completion index and history of the benchmark away from the user cache
+        env['XDG_CACHE_HOME'] = os.path.join(cwd, 'cache')
+
+        urls = os.path.join(cwd, 'urls.txt')
+        with open(urls, 'w') as file:
+            file.write(''.join('https://benchmark%d.example.com\n' % number for number in range(args.bulk)))
+
+        for size in [int(size) for size in args.sizes.split(',')]:
+            api = MockApi(0, size, size, latency=args.latency, error_rate=args.error_rate, rate_limit=args.rate_limit).start()
+            with open(os.path.join(cwd, 'sleuren.ini'), 'w') as file:
+                file.write(CONFIG.format(endpoint=api.endpoint))
+
+            results[str(size)] = {}
+            print('{} servers and {} monitors'.format(size, size))
+            print('{:<24} {:>10} {:>10} {:>10} {:>9}'.format('command', 'min s', 'median s', 'peak MB', 'requests'))
+            for name, command, mutates in commands:
+                result = measure(api, name, [urls if arg == '{urls}' else arg for arg in command], mutates, args.runs, cwd, env)
+                results[str(size)][name] = result
+                print('{:<24} {:>10.3f} {:>10.3f} {:>10.1f} {:>9}{}'.format(name, result['min'], result['median'], result['peak_mb'], result['requests'],
+                    '  ({} failed runs)'.format(result['failed_runs']) if result['failed_runs'] else ''))
+                if result['failed_runs'] and args.error_rate == 0:
+                    failed = True
+            print()
+            api.stop()
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            print('REGRESSION:', regression)
+        if regressions:
+            failed = True
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=4)
+        print('Saved results to', args.json)
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
@@ -36,6 +36,9 @@ setuptools.setup(
     ],
     keywords='sleuren system monitoring cli',
     install_requires=install_requires,
+    extras_require={
+        'numpy': ['numpy'],
+    },
     packages=setuptools.find_packages(),
     entry_points={
         'console_scripts': [
@@ -0,0 +1,499 @@
+#!/usr/bin/env python3
+
+"""Servers, sites, tokens and statistics of a Sleuren account as Python objects, for programs that would otherwise run sleurencli --json
+
+    from sleurencli.api import SleurenClient
+
+    with SleurenClient('YOUR_API_KEY') as sleuren:
+        for server in sleuren.servers(tags=['db'], issuesOnly=True):
+            print(server.name, server.cpu)
+"""
+
+import json
+import time
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .lib.config import Config
+from .lib.paginator import Paginator
+from .lib.records import Server, Monitor
+from .lib.columns import Thresholds, ServerColumns, MonitorColumns, flagIssues, batches
+from .lib.completion import CompletionIndex
+from .lib.history import History
+
+# attributes of the config that are no settings
+INTERNAL = ('version', 'filename', 'http', 'responses', 'service', 'lock')
+
+class SleurenError(Exception):
+    """Failed request to the Sleuren API, with the status code of the response if there was one"""
+
+    def __init__(self, message: str, status: int = None):
+        super().__init__(message)
+        self.status = status
+
+class SleurenTimeout(SleurenError):
+    """Request that did not finish within the timeout of the settings"""
+
+class Issue(object):
+    """A value of a server or site outside of its threshold, e.g. the cpu usage of a server above max-cpu-usage-percent"""
+
+    __slots__ = ('resource', 'id', 'name', 'metric', 'value', 'threshold')
+
+    def __init__(self, resource: str, id: str, name: str, metric: str, value: float, threshold: float):
+        self.resource = resource
+        self.id = id
+        self.name = name
+        self.metric = metric
+        self.value = value
+        self.threshold = threshold
+
+    def toDict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return 'Issue(' + ', '.join(name + '=' + repr(getattr(self, name)) for name in self.__slots__) + ')'
+
+class ServerSummary(object):
+    """Number of servers and servers with issues, and the aggregates (count, total, avg, min, max) of cpu, mem and disk usage and free disk space"""
+
+    def __init__(self, aggregates: dict):
+        self.count = aggregates['count']
+        self.issues = aggregates['issues']
+        self.cpu = aggregates['cpu']
+        self.mem = aggregates['mem']
+        self.disk = aggregates['disk']
+        self.free = aggregates['free']
+
+class SiteSummary(object):
+    """Number of sites and sites with issues, and the aggregates of uptime and time to first byte of the sites checked so far"""
+
+    def __init__(self, aggregates: dict):
+        self.count = aggregates['count']
+        self.issues = aggregates['issues']
+        self.uptime = aggregates['uptime']
+        self.ttfb = aggregates['ttfb']
+
+class FleetStatistics(object):
+    """Summaries of servers and sites and the number of tokens. Parts that could not be fetched are None, with the exception in errors"""
+
+    def __init__(self, servers: ServerSummary, sites: SiteSummary, tokens: int, errors: dict):
+        self.servers = servers
+        self.sites = sites
+        self.tokens = tokens
+        self.errors = errors
+
+def recordServer(index, history, server):
+    """Add a server to the completion index and the history of a download"""
+
+    index.add('id', server.id)
+    index.add('name', server.name)
+    index.add('tag', server.tags)
+    if history != None:
+        history.add(server.id, [server.cpu, server.mem, server.disk])
+
+def recordMonitor(index, history, monitor):
+    """Add a monitor to the completion index and the history of a download"""
+
+    index.add('id', monitor.id)
+    index.add('url', monitor.url)
+    index.add('name', monitor.name)
+    index.add('location', monitor.location)
+    if history != None:
+        # like the average of the list, the uptime of monitors that have not been checked yet is left out
+        history.add(monitor.id, [monitor.uptime if monitor.ttfb != None else None, monitor.ttfb])
+
+def observe(items, callback):
+    """Yield the items, calling callback with each on the way"""
+
+    for item in items:
+        callback(item)
+        yield item
+
+class SleurenClient(object):
+    """Synchronous client returning servers, monitors, issues and statistics instead of printing them. Failed requests raise SleurenError.
+
+    Settings are read from configFile if given, e.g. sleuren.ini, and are otherwise the defaults. Any setting of the config file
+    can be overridden by its attribute name, e.g. cache_enabled=False, workers=16 or threshold_cpu_usage=90.
+    A client is thread-safe and shares its connections, cache and rate limits between all threads"""
+
+    def __init__(self, apiKey: str = None, endpoint: str = None, configFile: str = None, config = None, **settings):
+        if config == None:
+            from .sleurencli import __version__
+            config = Config(__version__, configFile)
+
+        if apiKey != None:
+            config.api_key = apiKey
+        if endpoint != None:
+            config.endpoint = endpoint
+        for name, value in settings.items():
+            if name in INTERNAL or not hasattr(config, name):
+                raise TypeError('Unknown setting ' + name)
+            setattr(config, name, value)
+
+        self.config = config
+        self.thresholds = Thresholds(config)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def close(self):
+        """Close all pooled connections"""
+
+        if self.config.http != None:
+            self.config.http.close()
+
+    def check(self):
+        if not self.config.api_key:
+            raise SleurenError('No API key specified')
+
+    def download(self, path: str, resource: str, ttl: float, record, keep: bool, remember, cancel = None):
+        """Yield the records of all items of a resource page by page as they are downloaded. Every complete download
+        updates the completion index of the shell and, if enabled, the history of the resource with the items passed to remember.
+        Setting the threading.Event cancel stops the download at the next page with SleurenTimeout"""
+
+        index = CompletionIndex(self.config, resource)
+        # metrics of every fetch for trends, recorded only if enabled in the config file
+        history = History(self.config, resource) if self.config.history_enabled else None
+
+        paginator = Paginator(self.config, path, path, ttl, cancel)
+        try:
+            for item in paginator:
+                item = record.fromDict(item, keep)
+                remember(index, history, item)
+                yield item
+        except OSError as e:
+            # requests raises subclasses of OSError for connection errors and timeouts
+            raise SleurenError('An error occurred: ' + str(e)) from e
+        except (ValueError, KeyError) as e:
+            # a malformed or truncated body, or items without the fields of a record
+            raise SleurenError('An error occurred: invalid response of ' + path + ': ' + str(e)) from e
+        if paginator.cancelled:
+            raise SleurenTimeout('Cancelled download of ' + path)
+        if paginator.failed:
+            raise SleurenError('An error occurred: ' + str(paginator.status), paginator.status)
+
+        index.save()
+        if history != None:
+            history.save()
+
+    def servers(self, tags = (), name: str = '', issuesOnly: bool = False, keep: bool = False, cancel = None):
+        """Return an iterator of the servers as they are downloaded, only those with all given tags, whose name contains name
+        and with issues if requested. The complete API data of every server is kept in its data attribute if keep is set.
+        Setting the threading.Event cancel, e.g. from another thread, stops the download at the next page"""
+
+        self.check()
+        servers = self.download('servers', 'servers', self.config.cache_ttl_servers, Server, keep, recordServer, cancel)
+        if len(tags) > 0 or name:
+            servers = (server for server in servers if name in server.name and all(tag in server.tags for tag in tags))
+        if issuesOnly:
+            servers = (server for server, issue in flagIssues(servers, lambda: ServerColumns(self.thresholds)) if issue)
+        return servers
+
+    def monitors(self, url: str = '', location: str = '', issuesOnly: bool = False, keep: bool = False, cancel = None):
+        """Return an iterator of the website monitors as they are downloaded, only those whose URL and location contain the given texts
+        and with issues if requested. The complete API data of every monitor is kept in its data attribute if keep is set.
+        Setting the threading.Event cancel, e.g. from another thread, stops the download at the next page"""
+
+        self.check()
+        monitors = self.download('monitors', 'sites', self.config.cache_ttl_monitors, Monitor, keep, recordMonitor, cancel)
+        if url or location:
+            monitors = (monitor for monitor in monitors if url in monitor.url and location in monitor.location)
+        if issuesOnly:
+            monitors = (monitor for monitor, issue in flagIssues(monitors, lambda: MonitorColumns(self.thresholds)) if issue)
+        return monitors
+
+    def tokens(self):
+        """Return the list of tokens as returned by the API, dicts with the token in the key token"""
+
+        self.check()
+        if self.config.debug:
+            print('GET', self.config.endpoint + 'token?', self.config.params())
+
+        try:
+            response = self.config.cache().get('token', self.config.params(), self.config.cache_ttl_tokens)
+        except OSError as e:
+            raise SleurenError('An error occurred: ' + str(e)) from e
+
+        if response.status_code != 200:
+            response.close()
+            raise SleurenError('An error occurred: ' + str(response.status_code), response.status_code)
+
+        try:
+            data = response.json()
+        except ValueError as e:
+            raise SleurenError('An error occurred: invalid response of token: ' + str(e)) from e
+        if 'tokens' not in data:
+            raise SleurenError('An error occurred: no tokens in the response')
+        return data['tokens']
+
+    def serverIssues(self, tags = ()):
+        """Return the list of all values of the servers with the given tags that are outside of their thresholds"""
+
+        t = self.thresholds
+        issues = []
+        for server in self.servers(tags=tags, issuesOnly=True):
+            for metric, value, threshold in (('cpu', server.cpu, t.cpu_usage), ('mem', server.mem, t.mem_usage), ('disk', server.disk, t.disk_usage)):
+                if value >= threshold:
+                    issues.append(Issue('servers', server.id, server.name, metric, value, threshold))
+            for disk in server.disks:
+                if disk.free_percent <= t.free_diskspace:
+                    issues.append(Issue('servers', server.id, server.name, 'free ' + disk.mount, disk.free_percent, t.free_diskspace))
+        return issues
+
+    def siteIssues(self, location: str = ''):
+        """Return the list of all uptimes and times to first byte of the sites in the given location that are outside of their thresholds"""
+
+        t = self.thresholds
+        issues = []
+        for monitor in self.monitors(location=location, issuesOnly=True):
+            if monitor.uptime <= t.uptime:
+                issues.append(Issue('sites', monitor.id, monitor.url, 'uptime', monitor.uptime, t.uptime))
+            if monitor.ttfb != None and monitor.ttfb >= t.ttfb:
+                issues.append(Issue('sites', monitor.id, monitor.url, 'ttfb', monitor.ttfb, t.ttfb))
+        return issues
+
+    def issues(self):
+        """Return the issues of all servers and sites"""
+
+        return self.serverIssues() + self.siteIssues()
+
+    def statistics(self, onServer = None, onMonitor = None):
+        """Download servers, sites and tokens at the same time and return their summaries. The callbacks are called with every
+        server and monitor as they arrive, e.g. to collect more statistics in the same pass. A download that timed out may still
+        call them until it stops at its next page, so anything they collect must only be used if the summary is returned"""
+
+        self.check()
+
+        def servers(cancel):
+            items = self.servers(cancel=cancel)
+            if onServer != None:
+                items = observe(items, onServer)
+            return ServerSummary(ServerColumns(self.thresholds).extend(items).aggregates())
+
+        def sites(cancel):
+            items = self.monitors(cancel=cancel)
+            if onMonitor != None:
+                items = observe(items, onMonitor)
+            return SiteSummary(MonitorColumns(self.thresholds).extend(items).aggregates())
+
+        results, errors = self.fetchAll({
+            'servers': servers,
+            'sites': sites,
+            'tokens': lambda cancel: len(self.tokens()),
+        })
+        return FleetStatistics(results.get('servers'), results.get('sites'), results.get('tokens'), errors)
+
+    def fetchAll(self, tasks: dict):
+        """Run all given tasks at the same time within the statistics timeout. Every task is called with a threading.Event that is
+        set once the timeout passed, to stop downloading. Return the dicts of results and exceptions by name"""
+
+        cancel = threading.Event()
+
+        def fetch(outcome, task):
+            try:
+                outcome['result'] = task(cancel)
+            except Exception as e:
+                outcome['error'] = e
+
+        # every task fills its own outcome, which is only read once the task finished in time
+        outcomes = {name: {} for name in tasks}
+        threads = {}
+        for name, task in tasks.items():
+            threads[name] = threading.Thread(target=fetch, args=(outcomes[name], task), daemon=True)
+            threads[name].start()
+
+        # one shared deadline, so a slow resource cannot delay the others beyond the timeout
+        results = {}
+        errors = {}
+        deadline = time.monotonic() + float(self.config.statistics_timeout)
+        for name, thread in threads.items():
+            thread.join(max(0, deadline - time.monotonic()))
+            if thread.is_alive():
+                errors[name] = SleurenTimeout('Timed out fetching ' + name + ' after ' + str(self.config.statistics_timeout) + ' seconds')
+            elif 'error' in outcomes[name]:
+                errors[name] = outcomes[name]['error']
+            else:
+                results[name] = outcomes[name]['result']
+
+        # late downloads stop at their next page instead of running on in the background
+        cancel.set()
+        return (results, errors)
+
+    def send(self, method: str, path: str, data, expected: int, resource: str, failure: str):
+        """Send a request changing a resource and invalidate its cached responses. Return False without a request in readonly mode"""
+
+        self.check()
+        if self.config.debug:
+            print(method, self.config.endpoint + path + ('?' if data != None else ''), data if data != None else '')
+
+        if self.config.readonly:
+            return False
+
+        try:
+            response = self.config.client().request(method, path, data=json.dumps(data) if data != None else None)
+        except OSError as e:
+            raise SleurenError(failure + ': ' + str(e)) from e
+
+        response.close()
+        if response.status_code != expected:
+            raise SleurenError(failure + ' with response code: ' + str(response.status_code), response.status_code)
+
+        self.config.cache().invalidate(resource)
+        return True
+
+    def updateTags(self, serverId: str, tags):
+        """Replace the tags of a server"""
+
+        return self.send('PUT', 'server/' + serverId, {'tags': list(tags)}, 200, 'servers', 'Failed to update server ' + serverId)
+
+    def addSite(self, url: str, name: str = '', protocol: str = 'https'):
+        """Add a monitor for the URL, which is given without protocol, named after the URL unless a name is given"""
+
+        # other parameters:
+        #   port: int (e.g. 443, 80)
+        #   keyword: string that needs to be in the http response body (e.g. "error")
+        #   redirects: int (e.g. 3 max redirects; 0 for no redirects)
+        #   timeout: int (e.g. 30 seconds)
+        url = url.replace('https://', '').replace('http://', '')
+        data = {
+            'url': url,
+            'name': name or url,
+            'protocol': protocol or 'https',
+        }
+        return self.send('POST', 'monitors', data, 200, 'monitors', 'Failed to add site monitor ' + url)
+
+    def removeSite(self, id: str):
+        """Remove the monitor with the given id"""
+
+        return self.send('DELETE', 'monitor/' + id, None, 204, 'monitors', 'Failed to remove site monitor ' + id)
+
+    def createToken(self):
+        """Create a new token"""
+
+        return self.send('POST', 'token', None, 200, 'token', 'Failed to create token')
+
+# end of the items of an iterator handed over from a thread to the event loop
+DONE = object()
+
+class AsyncSleurenClient(object):
+    """asyncio interface of SleurenClient for many concurrent queries on one event loop. The blocking requests run in a thread pool
+    and share the connections, cache and rate limits of one SleurenClient. Servers and monitors are async iterators:
+
+        async with AsyncSleurenClient('YOUR_API_KEY') as sleuren:
+            statistics, issues = await asyncio.gather(sleuren.statistics(), sleuren.serverIssues(tags=['db']))
+            async for monitor in sleuren.monitors(location='Frankfurt'):
+                print(monitor.url, monitor.ttfb)
+    """
+
+    # items handed over to the event loop at once and batches downloaded ahead of the consumer
+    BATCH_SIZE = 500
+    AHEAD = 4
+
+    def __init__(self, apiKey: str = None, endpoint: str = None, configFile: str = None, **settings):
+        self.client = SleurenClient(apiKey, endpoint, configFile, **settings)
+        # a thread per running query, the shared limits of the client keep their requests within the limits of the API
+        self.executor = ThreadPoolExecutor(max_workers=max(int(self.client.config.pool_size), int(self.client.config.workers)))
+        # create the HTTP client before the threads share it
+        if self.client.config.api_key:
+            self.client.config.client()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+        return False
+
+    async def close(self):
+        await self.call(self.client.close)
+        self.executor.shutdown(wait=False)
+
+    async def call(self, function, *args, **kwargs):
+        """Run a method of the synchronous client in the thread pool"""
+
+        import asyncio
+        return await asyncio.get_event_loop().run_in_executor(self.executor, functools.partial(function, *args, **kwargs))
+
+    async def iterate(self, function, *args, **kwargs):
+        """Yield the items of an iterator of the synchronous client, downloaded in a thread and handed over in batches"""
+
+        import asyncio
+        loop = asyncio.get_event_loop()
+        queue = asyncio.Queue()
+        # the thread stays at most AHEAD batches ahead of the consumer, so a slow consumer does not buffer everything
+        ahead = threading.Semaphore(self.AHEAD)
+        stopped = threading.Event()
+
+        def produce():
+            items = None
+            try:
+                items = function(*args, **kwargs)
+                for batch in batches(items, self.BATCH_SIZE):
+                    ahead.acquire()
+                    if stopped.is_set():
+                        return
+                    loop.call_soon_threadsafe(queue.put_nowait, batch)
+                loop.call_soon_threadsafe(queue.put_nowait, DONE)
+            except Exception as e:
+                if not stopped.is_set():
+                    loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                # stop the downloads of the following pages if the consumer stopped early
+                if items != None and hasattr(items, 'close'):
+                    items.close()
+
+        loop.run_in_executor(self.executor, produce)
+        try:
+            while True:
+                batch = await queue.get()
+                if batch is DONE:
+                    return
+                if isinstance(batch, Exception):
+                    raise batch
+                ahead.release()
+                for item in batch:
+                    yield item
+        finally:
+            stopped.set()
+            ahead.release()
+
+    def servers(self, tags = (), name: str = '', issuesOnly: bool = False, keep: bool = False):
+        """Async iterator of the servers, see SleurenClient.servers()"""
+        return self.iterate(self.client.servers, tags, name, issuesOnly, keep)
+
+    def monitors(self, url: str = '', location: str = '', issuesOnly: bool = False, keep: bool = False):
+        """Async iterator of the website monitors, see SleurenClient.monitors()"""
+        return self.iterate(self.client.monitors, url, location, issuesOnly, keep)
+
+    async def tokens(self):
+        return await self.call(self.client.tokens)
+
+    async def serverIssues(self, tags = ()):
+        return await self.call(self.client.serverIssues, tags)
+
+    async def siteIssues(self, location: str = ''):
+        return await self.call(self.client.siteIssues, location)
+
+    async def issues(self):
+        return await self.call(self.client.issues)
+
+    async def statistics(self, onServer = None, onMonitor = None):
+        """Summaries of servers and sites and the number of tokens. The callbacks are called in a thread of the pool"""
+        return await self.call(self.client.statistics, onServer, onMonitor)
+
+    async def updateTags(self, serverId: str, tags):
+        return await self.call(self.client.updateTags, serverId, tags)
+
+    async def addSite(self, url: str, name: str = '', protocol: str = 'https'):
+        return await self.call(self.client.addSite, url, name, protocol)
+
+    async def removeSite(self, id: str):
+        return await self.call(self.client.removeSite, id)
+
+    async def createToken(self):
+        return await self.call(self.client.createToken)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+import sys
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+class Bulk(object):
+    """Run many API calls with bounded concurrency, show the progress and collect a result per item"""
+
+    def __init__(self, config, action: str):
+        self.config = config
+        self.action = action
+        self.workers = max(1, int(config.workers))
+        self.items = []
+        self.counts = {}
+        self.total = 0
+        self.lock = threading.Lock()
+
+    def add(self, item: dict, result: str, detail: str = ''):
+        """Record the result of an item"""
+
+        with self.lock:
+            entry = dict(item)
+            entry['result'] = result
+            if detail:
+                entry['detail'] = detail
+            self.items.append(entry)
+            self.counts[result] = self.counts.get(result, 0) + 1
+            self.printProgress()
+
+    def run(self, items, task):
+        """Call task for every item using a pool of workers. The task returns the result and an optional detail"""
+
+        items = list(items)
+        self.total = len(self.items) + len(items)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(task, item): item for item in items}
+            for future in as_completed(futures):
+                try:
+                    result, detail = future.result()
+                except Exception as e:
+                    result, detail = 'failed', str(e)
+                self.add(futures[future], result, detail)
+
+    def printProgress(self):
+        """Update the progress line if the output goes to a terminal"""
+
+        if sys.stderr.isatty():
+            done = len(self.items)
+            counts = ', '.join(result + ' ' + str(count) for result, count in sorted(self.counts.items()))
+            print('\r' + self.action + ': ' + str(done) + '/' + str(max(done, self.total)) + ' (' + counts + ')', end='', file=sys.stderr, flush=True)
+
+    def printSummary(self):
+        """Print the number of items per result"""
+
+        if sys.stderr.isatty() and self.items:
+            print(file=sys.stderr)
+
+        for result, count in sorted(self.counts.items()):
+            print(result + ':', count)
+
+    def report(self):
+        """Return the results as dict that can be stored as JSON"""
+
+        return {
+            'summary': dict(self.counts),
+            'items': self.items,
+        }
+
+    def writeReport(self, filename: str):
+        """Write the results to the given file in JSON format"""
+
+        with open(filename, 'w') as file:
+            json.dump(self.report(), file, indent=4)
+
+        print('Saved report to', filename)
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+
+CHUNK_SIZE = 65536
+# bytes read after the reader stopped to complete a body for the cache, e.g. meta data following the items
+DRAIN_LIMIT = CHUNK_SIZE
+
+def cacheDirectory():
+    """Return the directory of the user specific cache for sleurencli"""
+
+    if sys.platform == 'darwin':
+        base = os.path.expanduser('~/Library/Caches')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(base, 'sleurencli')
+
+def accountDirectory(config):
+    """Return the cache directory of the account, separated by endpoint and API key without storing the key itself"""
+
+    account = hashlib.sha256((config.endpoint + '\n' + config.api_key).encode()).hexdigest()[:16]
+    return os.path.join(cacheDirectory(), account)
+
+class CachedResponse(object):
+    """Response read from a cached body, offering the parts of requests.Response used by the resources"""
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.status_code = 200
+        self.file = None
+
+    def iter_content(self, chunk_size: int = CHUNK_SIZE):
+        self.file = open(self.filename, 'rb')
+        while True:
+            chunk = self.file.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+    def json(self):
+        with open(self.filename, 'rb') as file:
+            return json.load(file)
+
+    def close(self):
+        if self.file:
+            self.file.close()
+
+class CachingResponse(object):
+    """Response that writes its body to the cache while it is read"""
+
+    def __init__(self, cache, response, directory: str, name: str):
+        self.cache = cache
+        self.response = response
+        self.status_code = response.status_code
+        self.directory = directory
+        self.name = name
+        self.chunks = None
+        self.file = None
+        # set only once the whole body was received, a body cut off by an error must never be cached
+        self.complete = False
+
+    def iter_content(self, chunk_size: int = CHUNK_SIZE):
+        self.file = self.cache.tempFile(self.directory)
+        self.chunks = self.read(chunk_size)
+        return self.chunks
+
+    def read(self, chunk_size: int):
+        for chunk in self.response.iter_content(chunk_size=chunk_size):
+            if self.file:
+                self.file.write(chunk)
+            yield chunk
+        self.complete = True
+
+    def json(self):
+        data = self.response.json()
+        self.file = self.cache.tempFile(self.directory)
+        if self.file:
+            self.file.write(self.response.content)
+            self.complete = True
+        self.close()
+        return data
+
+    def drain(self):
+        """Read the rest of a body the reader stopped early in, unless it is more than DRAIN_LIMIT bytes"""
+
+        drained = 0
+        try:
+            for chunk in self.chunks:
+                drained += len(chunk)
+                if drained > DRAIN_LIMIT:
+                    return
+        except Exception:
+            pass
+
+    def close(self):
+        if self.file:
+            try:
+                # readers stop after the data they need, so store the few remaining bytes as well to keep the body complete
+                if not self.complete and self.chunks != None:
+                    self.drain()
+                self.file.close()
+                if self.complete:
+                    self.cache.commit(self.directory, self.name, self.file.name, self.response.headers)
+            except Exception:
+                self.complete = False
+            finally:
+                if not self.complete:
+                    self.file.close()
+                    if os.path.exists(self.file.name):
+                        os.remove(self.file.name)
+                self.file = None
+        self.response.close()
+
+class Cache(object):
+
+    def __init__(self, config):
+        self.config = config
+        self.directory = accountDirectory(config)
+
+    def entry(self, path: str, params: dict):
+        """Return directory and file name of the cache entry for the given request"""
+
+        name = hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:32]
+        return (os.path.join(self.directory, path.replace('/', '_')), name)
+
+    def maxAge(self, ttl: float):
+        """Return the maximum age of cached data, the --max-age flag overrides the TTL of the resource"""
+
+        if self.config.max_age != None:
+            return float(self.config.max_age)
+        return float(ttl)
+
+    def readJson(self, directory: str, filename: str):
+        """Return the decoded content of a JSON file of the cache, or None if it is missing or broken"""
+
+        try:
+            with open(os.path.join(directory, filename)) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def get(self, path: str, params: dict, ttl: float, revalidate: bool = False):
+        """Return a fresh cached response or request the data, revalidating a stale cache entry if possible.
+        With revalidate even fresh entries are only served after the API confirmed them"""
+
+        if not self.config.cache_enabled:
+            return self.config.client().get(path, params=params, stream=True)
+
+        directory, name = self.entry(path, params)
+        body = os.path.join(directory, name + '.body')
+        meta = self.readJson(directory, name + '.meta')
+
+        # validators of an entry without body would be answered by 304 without anything to serve
+        if meta != None and not os.path.isfile(body):
+            meta = None
+
+        if meta != None and not revalidate and time.time() - meta['time'] <= self.maxAge(ttl):
+            return CachedResponse(body)
+
+        headers = {}
+        if meta != None and meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta != None and meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+
+        response = self.config.client().get(path, params=params, headers=headers, stream=True)
+
+        if response.status_code == 304 and meta != None:
+            response.close()
+            meta['time'] = time.time()
+            self.writeMeta(directory, name, meta)
+            return CachedResponse(body)
+        elif response.status_code == 200:
+            return CachingResponse(self, response, directory, name)
+        else:
+            return response
+
+    def listing(self, path: str, params: dict, ttl: float):
+        """Return the cached pages of the last complete download of a paginated resource as (page, size, response),
+        or None unless it is fresh and all its pages are still those of that download"""
+
+        if not self.config.cache_enabled:
+            return None
+
+        directory, name = self.entry(path, params)
+        walk = self.readJson(directory, name + '.walk')
+        # the first page is as old as the start of the download
+        if walk == None or time.time() - walk['start'] > self.maxAge(ttl):
+            return None
+
+        pages = []
+        for page, size in walk['pages']:
+            page_directory, page_name = self.entry(path, dict(params, page=page, perpage=size))
+            body = os.path.join(page_directory, page_name + '.body')
+            meta = self.readJson(page_directory, page_name + '.meta')
+            # a page stored by another download since would stitch together items of different times
+            if meta == None or not os.path.isfile(body) or not walk['start'] <= meta['time'] <= walk['time']:
+                return None
+            pages.append((page, size, body))
+        return [(page, size, CachedResponse(body)) for page, size, body in pages]
+
+    def saveListing(self, path: str, params: dict, start: float, pages):
+        """Remember the pages as (page, size) of a complete download started at start, so it is served as a whole while it is fresh"""
+
+        if not self.config.cache_enabled:
+            return
+
+        directory, name = self.entry(path, params)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with tempfile.NamedTemporaryFile('w', dir=directory, delete=False) as file:
+                json.dump({'start': start, 'time': time.time(), 'pages': pages}, file)
+            os.replace(file.name, os.path.join(directory, name + '.walk'))
+        except OSError:
+            pass
+
+    def tempFile(self, directory: str):
+        """Return a new temporary file in the given cache directory or None if the cache is not writable"""
+
+        try:
+            os.makedirs(directory, exist_ok=True)
+            return tempfile.NamedTemporaryFile(dir=directory, delete=False)
+        except OSError:
+            return None
+
+    def commit(self, directory: str, name: str, filename: str, headers):
+        """Move a completely downloaded body into the cache and remember its validators"""
+
+        os.replace(filename, os.path.join(directory, name + '.body'))
+        self.writeMeta(directory, name, {
+            'time': time.time(),
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+        })
+
+    def writeMeta(self, directory: str, name: str, meta: dict):
+        """Atomically write the meta data of a cache entry"""
+
+        with tempfile.NamedTemporaryFile('w', dir=directory, delete=False) as file:
+            json.dump(meta, file)
+        os.replace(file.name, os.path.join(directory, name + '.meta'))
+
+    def invalidate(self, path: str):
+        """Remove all cached responses of the given resource, e.g. after it was changed"""
+
+        shutil.rmtree(os.path.join(self.directory, path.replace('/', '_')), ignore_errors=True)
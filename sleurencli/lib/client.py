@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import tracing
+from .limiter import TokenBucket, AdaptiveLimit, Backoff, retryAfter, THROTTLED, RETRY_STATUSES, IDEMPOTENT, MAX_DELAY
+
+class Client(object):
+
+    def __init__(self, config):
+        self.config = config
+        self.timeout = float(config.timeout)
+
+        # one keep-alive session shared by all resources, so connections are reused between calls
+        self.session = requests.Session()
+        self.session.headers.update(config.headers())
+
+        # keep enough connections for all parallel workers of bulk operations
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(int(config.pool_size), int(config.workers)))
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        # shared by all requests of the command, so bulk operations and prefetched pages stay below the limits of the API together
+        self.bucket = TokenBucket(float(config.rate_limit), int(config.rate_burst))
+        self.concurrency = AdaptiveLimit(max(int(config.pool_size), int(config.workers)))
+        self.backoff = Backoff(float(config.retry_backoff))
+        self.retries = int(config.retries)
+
+        if tracing.tracer != None:
+            tracing.traceConnections()
+
+    def request(self, method: str, path: str, **kwargs):
+        """Send a request to the given API path using the pooled session. Throttled requests are sent again after the
+        Retry-After of the API, failed idempotent requests after an increasing delay, up to the configured number of retries"""
+
+        kwargs.setdefault('timeout', self.timeout)
+        attempt = 0
+        while True:
+            with tracing.span('wait for rate limit', 'limiter'):
+                self.concurrency.acquire()
+                started = self.bucket.acquire()
+
+            response = None
+            try:
+                # with stream=True the span ends when the headers arrived, the body is traced while it is read
+                with tracing.span(method + ' ' + path, 'http', method + ' ' + path.split('/')[0], params=kwargs.get('params'), attempt=attempt) as span:
+                    response = self.session.request(method, self.config.endpoint + path, **kwargs)
+                    span.set('status', response.status_code)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if method not in IDEMPOTENT or attempt >= self.retries:
+                    raise
+                reason = type(e).__name__
+            finally:
+                throttled = response != None and response.status_code in THROTTLED
+                self.bucket.release(started, throttled)
+                self.concurrency.release(started, throttled)
+
+            if response != None:
+                status = response.status_code
+                if status not in RETRY_STATUSES or attempt >= self.retries or (method not in IDEMPOTENT and status not in THROTTLED):
+                    return response
+                reason = 'status ' + str(status)
+
+            delay = retryAfter(response.headers.get('Retry-After')) if response != None else None
+            if delay != None:
+                delay = min(delay, MAX_DELAY)
+                # the API asked all requests to wait, not only this one
+                self.bucket.pause(delay)
+            else:
+                delay = self.backoff.delay(attempt)
+            if response != None:
+                response.close()
+
+            if self.config.debug:
+                print('Retrying', method, self.config.endpoint + path, 'in', '{:.2f}'.format(delay), 'seconds after', reason)
+
+            with tracing.span('retry delay', 'limiter', reason=reason):
+                time.sleep(delay)
+            attempt += 1
+
+    def get(self, path: str, **kwargs):
+        """Send a GET request to the given API path"""
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path: str, **kwargs):
+        """Send a POST request to the given API path"""
+        return self.request('POST', path, **kwargs)
+
+    def put(self, path: str, **kwargs):
+        """Send a PUT request to the given API path"""
+        return self.request('PUT', path, **kwargs)
+
+    def delete(self, path: str, **kwargs):
+        """Send a DELETE request to the given API path"""
+        return self.request('DELETE', path, **kwargs)
+
+    def close(self):
+        """Close all pooled connections"""
+        self.session.close()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+
+import math
+from array import array
+
+# NumPy is optional, without it the same columns are evaluated with plain Python loops
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from . import tracing
+
+BATCH_SIZE = 4096
+
+class Thresholds(object):
+    """Thresholds of the config file, converted to numbers once instead of for every row"""
+
+    def __init__(self, config):
+        self.uptime = float(config.threshold_uptime)
+        self.ttfb = float(config.threshold_ttfb)
+        self.free_diskspace = float(config.threshold_free_diskspace)
+        self.cpu_usage = float(config.threshold_cpu_usage)
+        self.mem_usage = float(config.threshold_mem_usage)
+        self.disk_usage = float(config.threshold_disk_usage)
+
+class Aggregate(object):
+    """Count, average, minimum and maximum of a column"""
+
+    def __init__(self, count: int = 0, total: float = 0.0, minimum: float = 0.0, maximum: float = 0.0):
+        self.count = count
+        self.total = total
+        self.avg = total / count if count > 0 else 0.0
+        self.min = minimum
+        self.max = maximum
+
+def aggregate(column):
+    """Aggregate the values of a column of doubles, ignoring NaN and infinite values"""
+
+    if numpy != None:
+        values = numpy.frombuffer(column, dtype=numpy.float64)
+        values = values[numpy.isfinite(values)]
+        if len(values) == 0:
+            return Aggregate()
+        return Aggregate(len(values), float(values.sum()), float(values.min()), float(values.max()))
+
+    values = [value for value in column if not (math.isnan(value) or math.isinf(value))]
+    if len(values) == 0:
+        return Aggregate()
+    return Aggregate(len(values), math.fsum(values), min(values), max(values))
+
+def batches(items, size: int = BATCH_SIZE):
+    """Group items into lists of the given size"""
+
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def flagIssues(items, columns):
+    """Yield every item with whether it has an issue, evaluating the thresholds for a batch of items at once.
+    Columns returns new, empty columns, e.g. lambda: ServerColumns(thresholds)"""
+
+    for batch in batches(items):
+        yield from zip(batch, columns().extend(batch).issues())
+
+class ServerColumns(object):
+    """Usage of servers stored as columns, to evaluate thresholds and aggregates in one pass"""
+
+    def __init__(self, thresholds: Thresholds):
+        self.thresholds = thresholds
+        self.cpu = array('d')
+        self.mem = array('d')
+        self.disk = array('d')
+        # lowest free disk space of all mounts of a server, infinite if there is none
+        self.free = array('d')
+
+    def add(self, server):
+        self.cpu.append(server.cpu)
+        self.mem.append(server.mem)
+        self.disk.append(server.disk)
+        self.free.append(min((disk.free_percent for disk in server.disks), default=math.inf))
+
+    def extend(self, servers):
+        for server in servers:
+            self.add(server)
+        return self
+
+    def issues(self):
+        """Return a list telling for every server whether a value is outside of its threshold"""
+
+        with tracing.span('evaluate thresholds', 'thresholds', rows=len(self.cpu)):
+            return self.evaluate()
+
+    def evaluate(self):
+        t = self.thresholds
+        if numpy != None:
+            mask = (numpy.frombuffer(self.cpu, dtype=numpy.float64) >= t.cpu_usage) \
+                | (numpy.frombuffer(self.mem, dtype=numpy.float64) >= t.mem_usage) \
+                | (numpy.frombuffer(self.disk, dtype=numpy.float64) >= t.disk_usage) \
+                | (numpy.frombuffer(self.free, dtype=numpy.float64) <= t.free_diskspace)
+            return mask.tolist()
+
+        return [cpu >= t.cpu_usage or mem >= t.mem_usage or disk >= t.disk_usage or free <= t.free_diskspace
+            for cpu, mem, disk, free in zip(self.cpu, self.mem, self.disk, self.free)]
+
+    def aggregates(self):
+        """Return the number of servers and issues and the aggregates of all usage columns"""
+
+        return {
+            'count': len(self.cpu),
+            'issues': sum(self.issues()),
+            'cpu': aggregate(self.cpu),
+            'mem': aggregate(self.mem),
+            'disk': aggregate(self.disk),
+            'free': aggregate(self.free),
+        }
+
+class MonitorColumns(object):
+    """Uptime and time to first byte of monitors stored as columns, to evaluate thresholds and aggregates in one pass"""
+
+    def __init__(self, thresholds: Thresholds):
+        self.thresholds = thresholds
+        self.uptime = array('d')
+        # NaN for monitors without a check so far
+        self.ttfb = array('d')
+
+    def add(self, monitor):
+        self.uptime.append(monitor.uptime)
+        self.ttfb.append(monitor.ttfb if monitor.ttfb != None else math.nan)
+
+    def extend(self, monitors):
+        for monitor in monitors:
+            self.add(monitor)
+        return self
+
+    def issues(self):
+        """Return a list telling for every monitor whether its uptime or time to first byte is outside of its threshold"""
+
+        with tracing.span('evaluate thresholds', 'thresholds', rows=len(self.uptime)):
+            return self.evaluate()
+
+    def evaluate(self):
+        t = self.thresholds
+        if numpy != None:
+            with numpy.errstate(invalid='ignore'):
+                mask = (numpy.frombuffer(self.uptime, dtype=numpy.float64) <= t.uptime) \
+                    | (numpy.frombuffer(self.ttfb, dtype=numpy.float64) >= t.ttfb)
+            return mask.tolist()
+
+        return [uptime <= t.uptime or ttfb >= t.ttfb for uptime, ttfb in zip(self.uptime, self.ttfb)]
+
+    def aggregates(self):
+        """Return the number of monitors and issues and the aggregates of uptime and time to first byte"""
+
+        # like in the sites list, the average uptime only includes monitors that have been checked
+        if numpy != None:
+            ttfb = numpy.frombuffer(self.ttfb, dtype=numpy.float64)
+            checked = array('d', numpy.frombuffer(self.uptime, dtype=numpy.float64)[~numpy.isnan(ttfb)].tobytes())
+        else:
+            checked = array('d', (uptime for uptime, ttfb in zip(self.uptime, self.ttfb) if not math.isnan(ttfb)))
+
+        return {
+            'count': len(self.uptime),
+            'issues': sum(self.issues()),
+            'uptime': aggregate(checked),
+            'ttfb': aggregate(self.ttfb),
+        }
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+
+import os
+import shlex
+import bisect
+import argparse
+import threading
+
+from .cache import accountDirectory
+
+SCRIPTS = {
+    'bash': '''# bash completion for sleurencli, load with: eval "$(sleurencli completion bash)"
+_sleurencli() {
+    local IFS=$'\\n'
+    COMPREPLY=($(sleurencli __complete bash "${COMP_LINE:0:$COMP_POINT}" 2>/dev/null))
+}
+complete -o default -F _sleurencli sleurencli
+''',
+    'zsh': '''#compdef sleurencli
+# zsh completion for sleurencli, load with: eval "$(sleurencli completion zsh)"
+_sleurencli() {
+    local -a candidates
+    candidates=("${(@f)$(sleurencli __complete zsh "${(@)words[1,CURRENT]}" 2>/dev/null)}")
+    candidates=(${candidates:#})
+    if (( ${#candidates} )); then
+        compadd -- "${candidates[@]}"
+    else
+        _files
+    fi
+}
+compdef _sleurencli sleurencli
+''',
+    'fish': '''# fish completion for sleurencli, load with: sleurencli completion fish | source
+function __sleurencli_complete
+    set -l current (commandline -ct)
+    sleurencli __complete fish "$current" (commandline -opc) 2>/dev/null
+end
+complete -c sleurencli -f -a '(__sleurencli_complete)'
+''',
+}
+
+class CompletionIndex(object):
+    """Sorted lists of ids, names, URLs and tags of a resource in the cache directory, read by the shell completion instead of calling the API"""
+
+    def __init__(self, config, resource: str):
+        self.directory = os.path.join(accountDirectory(config), 'completion')
+        self.resource = resource
+        self.values = {}
+
+    def filename(self, field: str):
+        return os.path.join(self.directory, self.resource + '.' + field)
+
+    def add(self, field: str, value):
+        """Add a value or a list of values of a field"""
+
+        values = self.values.setdefault(field, set())
+        if isinstance(value, (list, tuple)):
+            values.update(value)
+        elif value:
+            values.add(value)
+
+    def save(self):
+        """Write the index in a background thread, which the interpreter waits for before exiting"""
+
+        threading.Thread(target=self.write, name='completion-index').start()
+
+    def write(self):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            for field, values in self.values.items():
+                # completion is line based, values containing line breaks cannot be completed anyway
+                lines = sorted(str(value) for value in values if '\n' not in str(value))
+                temp = self.filename(field) + '.' + str(os.getpid())
+                with open(temp, 'w', encoding='utf-8') as file:
+                    file.write('\n'.join(lines))
+                os.replace(temp, self.filename(field))
+        except OSError:
+            # the index is only a convenience, failing to write it must not fail the command
+            pass
+
+    def find(self, field: str, prefix: str):
+        """Return all values of a field starting with prefix"""
+
+        try:
+            with open(self.filename(field), encoding='utf-8') as file:
+                lines = file.read().split('\n')
+        except OSError:
+            return []
+
+        start = bisect.bisect_left(lines, prefix)
+        end = start
+        while end < len(lines) and lines[end].startswith(prefix):
+            end += 1
+        return lines[start:end]
+
+def subcommands(parser):
+    """Return the dict of name -> parser of the sub commands of a parser"""
+
+    for action in parser._actions:
+        if isinstance(action, argparse._SubParsersAction):
+            return action.choices
+    return {}
+
+def options(parser):
+    """Return the dict of option string -> action of all options of a parser"""
+
+    return {option: action for action in parser._actions for option in action.option_strings}
+
+def candidates(parser, words, values):
+    """Return the completions of the last word. Values is called with the command path and option to complete option values"""
+
+    path = []
+    pending = None
+    for word in words[:-1]:
+        if word.startswith('-'):
+            action = options(parser).get(word.split('=')[0])
+            # options with their value attached or without values, e.g. --issues, do not take the next word
+            pending = action if action != None and action.nargs != 0 and '=' not in word else None
+        elif pending != None:
+            if pending.nargs not in ('*', '+'):
+                pending = None
+        elif word in subcommands(parser):
+            parser = subcommands(parser)[word]
+            path.append(word)
+
+    current = words[-1] if words else ''
+    if current.startswith('-'):
+        found = [option for option in options(parser) if option.startswith('--')]
+    elif pending != None:
+        found = values(tuple(path), pending.option_strings[-1], current)
+        if found == None:
+            found = [str(choice) for choice in pending.choices or []]
+    else:
+        found = list(subcommands(parser)) + [str(choice) for action in parser._actions
+            if not action.option_strings and action.choices and not isinstance(action, argparse._SubParsersAction) for choice in action.choices]
+
+    return [candidate for candidate in found if candidate.startswith(current)]
+
+def complete(parser, shell: str, args, values):
+    """Print the completions for the words of the command line as passed by the completion script of the shell"""
+
+    if shell == 'bash':
+        # bash passes the line up to the cursor, as its own word splitting breaks URLs at every colon
+        line = args[0] if args else ''
+        try:
+            words = shlex.split(line)
+        except ValueError:
+            words = line.split()
+        if not line or line[-1].isspace():
+            words.append('')
+    elif shell == 'fish':
+        # fish passes the current word first, as it may be empty
+        words = list(args[1:]) + [args[0] if args else '']
+    else:
+        words = list(args) or ['']
+
+    found = candidates(parser, words[1:], values)
+
+    # bash replaces only the part of the current word after the last colon or equal sign
+    if shell == 'bash':
+        cut = max(words[-1].rfind(':'), words[-1].rfind('=')) + 1
+        found = [candidate[cut:] for candidate in found]
+
+    print('\n'.join(found))
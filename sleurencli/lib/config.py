@@ -2,22 +2,52 @@
 #!/usr/bin/env python3
 
 import os
+import threading
 import configparser
 
 from .functions import printError
 from .bcolors import bcolors
 
+CONFIG_FILE = 'sleuren.ini'
+
 class Config(object):
 
-    def __init__(self, version: str):
+    def __init__(self, version: str, filename: str = CONFIG_FILE):
         self.version = version
-        self.filename = 'sleuren.ini'
+        # without a file only the defaults are used, e.g. by clients embedded in other programs
+        self.filename = filename or CONFIG_FILE
         self.endpoint = 'https://api.sleuren.com/api/'
         self.api_key = ''
         self.max_items = 5000
         self.debug = False
         self.readonly = False
         self.hide_ids = False
+        self.pool_size = 10
+        self.timeout = 30.0
+        # overall time of the statistics for all pages of servers and sites, unlike timeout for a single request
+        self.statistics_timeout = 300.0
+        self.prefetch_pages = 4
+        self.page_latency = 1.0
+        self.workers = 8
+        self.rate_limit = 0.0
+        self.rate_burst = 10
+        self.retries = 3
+        self.retry_backoff = 0.5
+        self.http = None
+        self.service = None
+        # the shared objects are created on first use, possibly by several threads at once
+        self.lock = threading.RLock()
+
+        self.cache_enabled = True
+        self.cache_ttl_servers = 60.0
+        self.cache_ttl_monitors = 60.0
+        self.cache_ttl_tokens = 300.0
+        self.max_age = None
+        self.responses = None
+
+        self.history_enabled = False
+        self.history_interval = 900.0
+        self.history_retention = 90
 
         self.threshold_uptime = 99.0
         self.threshold_ttfb = 1.0
@@ -26,7 +56,8 @@ class Config(object):
         self.threshold_mem_usage = 80.0
         self.threshold_disk_usage = 80.0
 
-        self.loadFromFile()
+        if filename:
+            self.loadFromFile()
 
     def headers(self):
         """Set headers for http requests"""
@@ -40,6 +71,36 @@ class Config(object):
             printError('ERROR: No API key specified in ' + self.filename + ". Please run \"sleurencli config save --api-key YOUR_API_KEY\" to connect to your sleuren account.")
             return {}
 
+    def client(self):
+        """Return the shared HTTP client, creating it on first use"""
+
+        if self.http == None:
+            with self.lock:
+                if self.http == None:
+                    from .client import Client
+                    self.http = Client(self)
+        return self.http
+
+    def api(self):
+        """Return the client returning the data of the account, creating it on first use"""
+
+        if self.service == None:
+            with self.lock:
+                if self.service == None:
+                    from ..api import SleurenClient
+                    self.service = SleurenClient(config=self)
+        return self.service
+
+    def cache(self):
+        """Return the on-disk response cache, creating it on first use"""
+
+        if self.responses == None:
+            with self.lock:
+                if self.responses == None:
+                    from .cache import Cache
+                    self.responses = Cache(self)
+        return self.responses
+
     def params(self):
         """Set params for http requests"""
 
@@ -74,6 +135,59 @@ class Config(object):
                 if 'readonly' in parser['Connection']:
                     self.readonly = (parser['Connection']['readonly'] == 'True')
 
+                if 'pool-size' in parser['Connection']:
+                    self.pool_size = parser['Connection']['pool-size']
+
+                if 'timeout' in parser['Connection']:
+                    self.timeout = parser['Connection']['timeout']
+
+                if 'statistics-timeout' in parser['Connection']:
+                    self.statistics_timeout = parser['Connection']['statistics-timeout']
+
+                if 'prefetch-pages' in parser['Connection']:
+                    self.prefetch_pages = parser['Connection']['prefetch-pages']
+
+                if 'page-latency' in parser['Connection']:
+                    self.page_latency = parser['Connection']['page-latency']
+
+                if 'workers' in parser['Connection']:
+                    self.workers = parser['Connection']['workers']
+
+                if 'rate-limit' in parser['Connection']:
+                    self.rate_limit = parser['Connection']['rate-limit']
+
+                if 'rate-burst' in parser['Connection']:
+                    self.rate_burst = parser['Connection']['rate-burst']
+
+                if 'retries' in parser['Connection']:
+                    self.retries = parser['Connection']['retries']
+
+                if 'retry-backoff' in parser['Connection']:
+                    self.retry_backoff = parser['Connection']['retry-backoff']
+
+            if 'Cache' in parser.sections():
+                if 'enabled' in parser['Cache']:
+                    self.cache_enabled = (parser['Cache']['enabled'] == 'True')
+
+                if 'servers-ttl' in parser['Cache']:
+                    self.cache_ttl_servers = parser['Cache']['servers-ttl']
+
+                if 'monitors-ttl' in parser['Cache']:
+                    self.cache_ttl_monitors = parser['Cache']['monitors-ttl']
+
+                if 'tokens-ttl' in parser['Cache']:
+                    self.cache_ttl_tokens = parser['Cache']['tokens-ttl']
+
+            if 'History' in parser.sections():
+                if 'enabled' in parser['History']:
+                    self.history_enabled = (parser['History']['enabled'] == 'True')
+
+                if 'interval' in parser['History']:
+                    self.history_interval = parser['History']['interval']
+
+                if 'retention-days' in parser['History']:
+                    self.history_retention = parser['History']['retention-days']
+
             if 'Thresholds' in parser.sections():
                 if 'min-uptime-percent' in parser['Thresholds']:
                     self.threshold_uptime = parser['Thresholds']['min-uptime-percent']
@@ -104,6 +218,27 @@ class Config(object):
             'hide-ids': self.hide_ids,
             'debug': self.debug,
             'readonly': self.readonly,
+            'pool-size': self.pool_size,
+            'timeout': self.timeout,
+            'statistics-timeout': self.statistics_timeout,
+            'prefetch-pages': self.prefetch_pages,
+            'page-latency': self.page_latency,
+            'workers': self.workers,
+            'rate-limit': self.rate_limit,
+            'rate-burst': self.rate_burst,
+            'retries': self.retries,
+            'retry-backoff': self.retry_backoff,
+        }
+        parser['Cache'] = {
+            'enabled': self.cache_enabled,
+            'servers-ttl': self.cache_ttl_servers,
+            'monitors-ttl': self.cache_ttl_monitors,
+            'tokens-ttl': self.cache_ttl_tokens,
+        }
+        parser['History'] = {
+            'enabled': self.history_enabled,
+            'interval': self.history_interval,
+            'retention-days': self.history_retention,
         }
         parser['Thresholds'] = {
             'min-uptime-percent': self.threshold_uptime,
@@ -139,6 +274,29 @@ class Config(object):
         print('hide ids:                  ', self.hide_ids)
         print('debug:                     ', self.debug)
         print('readonly:                  ', self.readonly)
+        print('pool size:                 ', self.pool_size)
+        print('timeout:                   ', self.timeout)
+        print('statistics timeout:        ', self.statistics_timeout)
+        print('prefetch pages:            ', self.prefetch_pages)
+        print('page latency:              ', self.page_latency)
+        print('workers:                   ', self.workers)
+        print('rate limit:                ', self.rate_limit)
+        print('rate burst:                ', self.rate_burst)
+        print('retries:                   ', self.retries)
+        print('retry backoff:             ', self.retry_backoff)
+        print()
+        print('Cache')
+        print('-----')
+        print('enabled:                   ', self.cache_enabled)
+        print('servers-ttl:               ', self.cache_ttl_servers)
+        print('monitors-ttl:              ', self.cache_ttl_monitors)
+        print('tokens-ttl:                ', self.cache_ttl_tokens)
+        print()
+        print('History')
+        print('-------')
+        print('enabled:                   ', self.history_enabled)
+        print('interval:                  ', self.history_interval)
+        print('retention-days:            ', self.history_retention)
         print()
         print('Thresholds')
         print('----------')
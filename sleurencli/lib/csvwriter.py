@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+
+import csv
+import io
+import sys
+
+# size of the write buffer, so piping a large inventory does not cost a system call per row
+BUFFER_SIZE = 256 * 1024
+
+QUOTING = {
+    'minimal': csv.QUOTE_MINIMAL,
+    'all': csv.QUOTE_ALL,
+    'nonnumeric': csv.QUOTE_NONNUMERIC,
+    'none': csv.QUOTE_NONE,
+}
+
+def openStdout():
+    """Open stdout with a large write buffer, or line buffered if it is a terminal"""
+
+    try:
+        fileno = sys.stdout.fileno()
+    except (AttributeError, io.UnsupportedOperation):
+        return sys.stdout
+
+    sys.stdout.flush()
+    return io.open(fileno, 'w', buffering=1 if sys.stdout.isatty() else BUFFER_SIZE, encoding=sys.stdout.encoding, errors=sys.stdout.errors, newline='', closefd=False)
+
+class CsvWriter(object):
+    """Write items as CSV rows to stdout as soon as they arrive. Columns are a list of (header, function returning the value of an item)"""
+
+    def __init__(self, columns, delimiter: str = ';', quoting: str = 'minimal'):
+        self.columns = columns
+        self.stream = openStdout()
+        self.writer = csv.writer(self.stream, delimiter=delimiter, quoting=QUOTING[quoting], escapechar='\\' if quoting == 'none' else None, lineterminator='\n')
+
+    def writeHeader(self):
+        self.writer.writerow([header for header, value in self.columns])
+
+    def write(self, item):
+        self.writer.writerow([value(item) for header, value in self.columns])
+
+    def close(self):
+        """Flush all buffered rows"""
+
+        if self.stream != sys.stdout:
+            self.stream.flush()
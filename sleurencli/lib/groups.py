@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+import json
+
+from .table import Table, SortKey
+from .csvwriter import CsvWriter
+from .bcolors import bcolors
+
+class Running(object):
+    """Count, sum, minimum and maximum of a column, updated row by row"""
+
+    __slots__ = ('count', 'total', 'min', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        # missing values, e.g. the time to first byte of unchecked monitors, do not count
+        if value == None or value != value:
+            return
+        self.count += 1
+        self.total += value
+        if self.min == None or value < self.min:
+            self.min = value
+        if self.max == None or value > self.max:
+            self.max = value
+
+    @property
+    def avg(self):
+        return self.total / self.count if self.count > 0 else None
+
+class Group(object):
+    """Number of rows and issues and the running aggregates of the columns of a group"""
+
+    __slots__ = ('name', 'count', 'issues', 'columns')
+
+    def __init__(self, name: str, columns):
+        self.name = name
+        self.count = 0
+        self.issues = 0
+        self.columns = {column: Running() for column in columns}
+
+    def add(self, item, issue: bool, columns: dict):
+        self.count += 1
+        if issue:
+            self.issues += 1
+        for column, value in columns.items():
+            self.columns[column].add(value(item))
+
+class Groups(object):
+    """Rows aggregated per group in one pass as they arrive. A row can belong to several groups, e.g. a server to each of its tags"""
+
+    def __init__(self, key, columns: dict):
+        # function returning the list of group names of a row
+        self.key = key
+        # dict of column name -> function returning the value of a row
+        self.columns = columns
+        self.groups = {}
+        # all rows counted once, for the total below the groups
+        self.total = Group('All', columns)
+
+    def add(self, item, issue: bool):
+        for name in self.key(item):
+            group = self.groups.get(name)
+            if group == None:
+                group = self.groups[name] = Group(name, self.columns)
+            group.add(item, issue, self.columns)
+        self.total.add(item, issue, self.columns)
+
+    def print(self, fields, format: str = 'table', sort: str = '', reverse: bool = False, limit: int = 0, delimiter: str = ';', quoting: str = 'minimal'):
+        """Print one row per group, sorted by name unless sorted by a column. Fields are a list of
+        (header, short name, function returning the value of a group, number format, function telling if a value is an issue)"""
+
+        table = Table([header for header, name, value, number, issue in fields], [name for header, name, value, number, issue in fields])
+        table.align = {header: 'r' for header, name, value, number, issue in fields}
+        table.align[fields[0][0]] = 'l'
+
+        groups = [self.groups[name] for name in sorted(self.groups)]
+        if sort:
+            order = table.sortOrder(sort, table.field_names, reverse)
+            if order == None:
+                return
+            groups.sort(key=lambda group: SortKey([value(group) for header, name, value, number, issue in fields], order))
+        if limit > 0:
+            groups = groups[:limit]
+
+        if (format == 'json'):
+            print(json.dumps([{name: value(group) for header, name, value, number, issue in fields} for group in groups], indent=4))
+        elif (format == 'csv'):
+            csv = CsvWriter([(name, value) for header, name, value, number, issue in fields], delimiter=delimiter, quoting=quoting)
+            csv.writeHeader()
+            for group in groups:
+                csv.write(group)
+            csv.close()
+        else:
+            def text(group, value, number, issue):
+                value = value(group)
+                if value == None:
+                    return 'n/a'
+                if issue != None and issue(value):
+                    return f"{bcolors.FAIL}" + number.format(value) + f"{bcolors.ENDC}"
+                return number.format(value)
+
+            for group in groups:
+                table.add_row([text(group, value, number, issue) for header, name, value, number, issue in fields])
+            table.print(footer=[text(self.total, value, number, issue) for header, name, value, number, issue in fields])
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import math
+import time
+import struct
+import itertools
+from array import array
+
+# file locks are only available on POSIX systems, elsewhere concurrent recorders are not serialized
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from .cache import accountDirectory
+from .functions import printError
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+# metrics recorded per resource and whether higher (1) or lower (-1) values are worse
+METRICS = {
+    'servers': [('cpu', 1), ('mem', 1), ('disk', 1)],
+    'sites': [('uptime', -1), ('ttfb', 1)],
+}
+
+# samples are kept as fetched for a day, then as hourly averages for a week and then as daily averages until the retention ends
+TIERS = [('raw', 0, DAY), ('hourly', HOUR, 7 * DAY), ('daily', DAY, None)]
+
+# header of a block, the columns follow in native byte order as the store never leaves the machine
+HEADER = struct.Struct('=dI')
+
+UNITS = {'m': 60, 'h': HOUR, 'd': DAY, 'w': 7 * DAY}
+
+def parseDuration(text: str):
+    """Return the number of seconds of a duration like 90m, 24h, 7d or 2w, or None if it is invalid"""
+
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)([mhdw])', (text or '').strip().lower())
+    if match == None or float(match.group(1)) <= 0:
+        printError('ERROR: Invalid duration', text, '- use a number followed by m, h, d or w, e.g. 7d')
+        return None
+    return float(match.group(1)) * UNITS[match.group(2)]
+
+def formatDuration(seconds: float):
+    """Return a duration as text, e.g. 7d or 36h"""
+
+    for unit in ('d', 'h'):
+        if seconds >= UNITS[unit] and seconds % UNITS[unit] == 0:
+            return '{:g}'.format(seconds / UNITS[unit]) + unit
+    return '{:g}m'.format(seconds / 60)
+
+def resolution(window: float):
+    """Return the interval the samples of a window are averaged over: hours for up to a week, days beyond"""
+
+    return HOUR if window <= 7 * DAY else DAY
+
+class Block(object):
+    """Rows of one fetch or one interval stored as columns: entity numbers, then the number of samples and the average of every metric.
+    Metrics count their own samples, as missing values like the time to first byte of unchecked monitors are left out of their averages"""
+
+    def __init__(self, time: float, metrics: int):
+        self.time = time
+        self.entities = array('I')
+        self.counts = [array('I') for i in range(metrics)]
+        self.values = [array('f') for i in range(metrics)]
+
+    def add(self, entity: int, counts, values):
+        self.entities.append(entity)
+        for column, count in zip(self.counts, counts):
+            column.append(count)
+        for column, value in zip(self.values, values):
+            column.append(value)
+
+    def toBytes(self):
+        return HEADER.pack(self.time, len(self.entities)) + self.entities.tobytes() + b''.join(column.tobytes() for column in self.counts + self.values)
+
+def readBlocks(filename: str, metrics: int):
+    """Yield the blocks of a file in the order they were written. A block cut off by an interrupted write ends the file"""
+
+    try:
+        with open(filename, 'rb') as file:
+            data = file.read()
+    except FileNotFoundError:
+        return
+
+    offset = 0
+    while offset + HEADER.size <= len(data):
+        start, rows = HEADER.unpack_from(data, offset)
+        offset += HEADER.size
+        if offset + rows * 4 * (1 + 2 * metrics) > len(data):
+            return
+
+        block = Block(start, metrics)
+        for column in [block.entities] + block.counts + block.values:
+            column.frombytes(data[offset:offset + rows * 4])
+            offset += rows * 4
+        yield block
+
+def downsample(blocks, interval: int, metrics: int):
+    """Yield one block per interval with the average of every entity weighted by its number of samples. Blocks must be in time order"""
+
+    for start, group in itertools.groupby(blocks, key=lambda block: block.time - block.time % interval):
+        group = list(group)
+        if len(group) == 1 and group[0].time == start:
+            # hourly and daily blocks are averaged already
+            yield group[0]
+            continue
+
+        rows = {}
+        for block in group:
+            for i, entity in enumerate(block.entities):
+                row = rows.get(entity)
+                if row == None:
+                    row = rows[entity] = [0.0, 0] * metrics
+                for m, (counts, column) in enumerate(zip(block.counts, block.values)):
+                    count = counts[i]
+                    # missing values, e.g. the time to first byte of unchecked monitors, do not count
+                    if count > 0 and not math.isnan(column[i]):
+                        row[2 * m] += column[i] * count
+                        row[1 + 2 * m] += count
+
+        merged = Block(start, metrics)
+        for entity, row in rows.items():
+            merged.add(entity, [row[1 + 2 * m] for m in range(metrics)], [row[2 * m] / row[1 + 2 * m] if row[1 + 2 * m] > 0 else math.nan for m in range(metrics)])
+        yield merged
+
+class Trend(object):
+    """Moving average, change and worst interval of a metric, updated with the average of every interval in time order"""
+
+    __slots__ = ('direction', 'count', 'total', 'first', 'last', 'worst', 'worst_time')
+
+    def __init__(self, direction: int):
+        self.direction = direction
+        self.count = 0
+        self.total = 0.0
+        self.first = None
+        self.last = None
+        self.worst = None
+        self.worst_time = None
+
+    def add(self, time: float, value: float):
+        if math.isnan(value):
+            return
+        self.count += 1
+        self.total += value
+        if self.first == None:
+            self.first = value
+        self.last = value
+        if self.worst == None or (value - self.worst) * self.direction > 0:
+            self.worst = value
+            self.worst_time = time
+
+    @property
+    def avg(self):
+        return self.total / self.count if self.count > 0 else None
+
+    @property
+    def change(self):
+        return self.last - self.first if self.count > 0 else None
+
+class History(object):
+    """Append-only store of the metrics of every fetch of a resource in the cache directory, compacted into hourly and daily averages as it ages"""
+
+    def __init__(self, config, resource: str):
+        self.directory = os.path.join(accountDirectory(config), 'history')
+        self.resource = resource
+        self.metrics = METRICS[resource]
+        self.interval = float(config.history_interval)
+        self.retention = float(config.history_retention) * DAY
+        self.samples = []
+
+    def filename(self, tier: str):
+        return os.path.join(self.directory, self.resource + '.' + tier)
+
+    def add(self, id: str, values):
+        """Add the metrics of an entity to the samples of the current fetch"""
+
+        self.samples.append((id, [float(value) if value != None else math.nan for value in values]))
+
+    def save(self):
+        """Append the samples as one block unless the last one was recorded less than the configured interval ago"""
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.filename('lock'), 'a') as lock:
+                if fcntl != None:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+
+                # the raw file is written last by every recording, so its age is the time since the last sample
+                now = time.time()
+                raw = self.filename('raw')
+                if os.path.exists(raw) and now - os.path.getmtime(raw) < self.interval:
+                    return
+
+                numbers = self.numbers(set(id for id, values in self.samples))
+                block = Block(now, len(self.metrics))
+                for id, values in self.samples:
+                    block.add(numbers[id], [0 if math.isnan(value) else 1 for value in values], values)
+
+                self.compact(now)
+                with open(raw, 'ab') as file:
+                    file.write(block.toBytes())
+        except OSError:
+            # the history is only a convenience, failing to record it must not fail the command
+            pass
+
+    def numbers(self, ids):
+        """Return the dict of id -> entity number, appending new ids to the list of known ids"""
+
+        filename = self.filename('ids')
+        try:
+            with open(filename, encoding='utf-8') as file:
+                known = file.read().split('\n')[:-1]
+        except FileNotFoundError:
+            known = []
+
+        numbers = {id: number for number, id in enumerate(known)}
+        new = sorted(str(id) for id in ids if str(id) not in numbers)
+        if new:
+            with open(filename, 'a', encoding='utf-8') as file:
+                file.write(''.join(id + '\n' for id in new))
+            numbers.update((id, len(known) + i) for i, id in enumerate(new))
+        return {id: numbers[str(id)] for id in ids}
+
+    def firstTime(self, tier: str):
+        """Return the time of the oldest block of a tier, or None if it is empty"""
+
+        try:
+            with open(self.filename(tier), 'rb') as file:
+                header = file.read(HEADER.size)
+        except FileNotFoundError:
+            return None
+        return HEADER.unpack(header)[0] if len(header) == HEADER.size else None
+
+    def write(self, tier: str, blocks):
+        """Replace the blocks of a tier"""
+
+        temp = self.filename(tier) + '.' + str(os.getpid())
+        with open(temp, 'wb') as file:
+            for block in blocks:
+                file.write(block.toBytes())
+        os.replace(temp, self.filename(tier))
+
+    def compact(self, now: float):
+        """Move the samples that aged out of a tier into averages of the next one and drop the averages older than the retention"""
+
+        for (tier, interval, keep), (next, next_interval, next_keep) in zip(TIERS, TIERS[1:]):
+            # whole intervals are moved at once, so every interval is averaged only once
+            cutoff = now - keep
+            cutoff -= cutoff % next_interval
+            first = self.firstTime(tier)
+            if first == None or first >= cutoff:
+                continue
+
+            blocks = list(readBlocks(self.filename(tier), len(self.metrics)))
+            with open(self.filename(next), 'ab') as file:
+                for block in downsample((block for block in blocks if block.time < cutoff), next_interval, len(self.metrics)):
+                    file.write(block.toBytes())
+            self.write(tier, [block for block in blocks if block.time >= cutoff])
+
+        last = TIERS[-1][0]
+        first = self.firstTime(last)
+        if first != None and first < now - self.retention:
+            self.write(last, [block for block in readBlocks(self.filename(last), len(self.metrics)) if block.time >= now - self.retention])
+
+    def blocks(self, since: float):
+        """Yield the blocks of all tiers from since on, oldest first"""
+
+        for tier, interval, keep in reversed(TIERS):
+            for block in readBlocks(self.filename(tier), len(self.metrics)):
+                if block.time >= since:
+                    yield block
+
+    def ids(self):
+        """Return the list of ids by entity number"""
+
+        try:
+            with open(self.filename('ids'), encoding='utf-8') as file:
+                return file.read().split('\n')[:-1]
+        except FileNotFoundError:
+            return []
+
+    def fleet(self, window: float):
+        """Return the trends of the averages of all entities per interval for every metric, or None if nothing was recorded in the window"""
+
+        trends = {name: Trend(direction) for name, direction in self.metrics}
+        found = False
+        for block in downsample(self.blocks(time.time() - window), resolution(window), len(self.metrics)):
+            found = True
+            for (name, direction), counts, column in zip(self.metrics, block.counts, block.values):
+                total = 0.0
+                weight = 0
+                for count, value in zip(counts, column):
+                    if not math.isnan(value):
+                        total += value * count
+                        weight += count
+                trends[name].add(block.time, total / weight if weight > 0 else math.nan)
+        return trends if found else None
+
+    def entities(self, window: float):
+        """Return the dict of id -> trends of every metric per interval of the entities recorded in the window"""
+
+        trends = {}
+        for block in downsample(self.blocks(time.time() - window), resolution(window), len(self.metrics)):
+            for i, entity in enumerate(block.entities):
+                entity_trends = trends.get(entity)
+                if entity_trends == None:
+                    entity_trends = trends[entity] = [Trend(direction) for name, direction in self.metrics]
+                for trend, column in zip(entity_trends, block.values):
+                    trend.add(block.time, column[i])
+
+        ids = self.ids()
+        return {ids[entity]: dict(zip([name for name, direction in self.metrics], entity_trends)) for entity, entity_trends in trends.items() if entity < len(ids)}
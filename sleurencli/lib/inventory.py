@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+from . import tracing
+
+GRAM = 3
+
+class Inventory(object):
+    """Indexes over a list of servers or monitors, built once per download, to resolve selectors without scanning all items"""
+
+    def __init__(self, items):
+        self.items = items
+        self.keys = {}
+        self.kinds = {}
+        self.indexes = {}
+        self.grams = {}
+        self.queries = {}
+
+    def define(self, name: str, key, kind: str = 'exact'):
+        """Define an index. Kind is 'exact' for single values, 'multi' for lists of values like tags or 'substring'"""
+
+        self.keys[name] = key
+        self.kinds[name] = kind
+
+    def index(self, name: str):
+        """Return the hash index of value -> positions for the given name, building it on first use"""
+
+        if name not in self.indexes:
+            key = self.keys[name]
+            index = {}
+            for position, item in enumerate(self.items):
+                values = key(item) if self.kinds[name] == 'multi' else [key(item)]
+                for value in values or []:
+                    if value in index:
+                        index[value].append(position)
+                    else:
+                        index[value] = [position]
+            self.indexes[name] = index
+        return self.indexes[name]
+
+    def gramIndex(self, name: str):
+        """Return the n-gram index of n-gram -> distinct values for the given substring index, building it on first use"""
+
+        if name not in self.grams:
+            grams = {}
+            for value in self.index(name):
+                for gram in set(value[i:i + GRAM] for i in range(len(value) - GRAM + 1)):
+                    if gram in grams:
+                        grams[gram].append(value)
+                    else:
+                        grams[gram] = [value]
+            self.grams[name] = grams
+        return self.grams[name]
+
+    def find(self, name: str, value):
+        """Return the set of positions of all items matching the value in the given index, building the index on first use"""
+
+        with tracing.span('find ' + name, 'filter', 'filter', value=str(value)):
+            return self.lookup(name, value)
+
+    def lookup(self, name: str, value):
+        index = self.index(name)
+        if self.kinds[name] != 'substring':
+            return set(index.get(value, ()))
+
+        # a single lookup is answered by scanning the distinct values, the n-gram index pays off from the second lookup on
+        self.queries[name] = self.queries.get(name, 0) + 1
+        if len(value) < GRAM or self.queries[name] < 2:
+            candidates = index.keys()
+        else:
+            grams = self.gramIndex(name)
+            lists = sorted((grams.get(value[i:i + GRAM], ()) for i in range(len(value) - GRAM + 1)), key=len)
+            candidates = set(lists[0])
+            for values in lists[1:]:
+                candidates.intersection_update(values)
+                if not candidates:
+                    break
+
+        positions = set()
+        for candidate in candidates:
+            if value in candidate:
+                positions.update(index[candidate])
+        return positions
+
+    def get(self, positions):
+        """Return the items at the given positions in their original order"""
+
+        return [self.items[position] for position in sorted(positions)]
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+import codecs
+import json
+
+WHITESPACE = ' \t\n\r'
+# characters that may follow a value, a value followed by anything else might continue in the next chunk
+DELIMITERS = ',:]}' + WHITESPACE
+
+class JsonStream(object):
+    """Incremental reader for JSON documents that arrive in chunks of bytes"""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.text = codecs.getincrementaldecoder('utf-8')()
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """Append the next chunk to the buffer and drop everything already consumed"""
+
+        if self.eof:
+            return False
+
+        chunk = next(self.chunks, None)
+        if chunk == None:
+            self.eof = True
+            data = self.text.decode(b'', final=True)
+        else:
+            data = self.text.decode(chunk)
+
+        self.buffer = self.buffer[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it"""
+
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, char: str):
+        """Consume the given character or fail if the document continues differently"""
+
+        if self.peek() != char:
+            raise ValueError('Expected ' + repr(char) + ' in JSON response at position ' + str(self.pos))
+        self.pos += 1
+
+    def value(self):
+        """Decode and return the next complete JSON value"""
+
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+
+                # a number cut at the end of a chunk decodes as well, e.g. 12 of 12.5
+                if self.eof or (end < len(self.buffer) and self.buffer[end] in DELIMITERS):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+
+            self.fill()
+
+    def items(self, key: str, fields: dict = None):
+        """Yield the elements of the array stored under the given key of the top-level object one by one.
+        The values of other top-level names in fields are stored in fields, reading the document to its end if needed"""
+
+        self.expect('{')
+        while True:
+            char = self.peek()
+            if char == '}':
+                return
+            if char == '':
+                raise ValueError('Unexpected end of JSON response')
+            if char == ',':
+                self.pos += 1
+                continue
+
+            name = self.value()
+            self.expect(':')
+
+            if name == key and self.peek() == '[':
+                self.pos += 1
+                while True:
+                    char = self.peek()
+                    if char == ']':
+                        self.pos += 1
+                        break
+                    if char == '':
+                        raise ValueError('Unexpected end of JSON response')
+                    if char == ',':
+                        self.pos += 1
+                        continue
+                    yield self.value()
+                # names following the array are only read if their values are wanted
+                if not fields:
+                    return
+            elif fields and name in fields:
+                fields[name] = self.value()
+            else:
+                # skip other values like meta data without keeping them
+                self.value()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+
+import time
+import random
+import collections
+import threading
+import email.utils
+
+# responses telling that the request was not processed, so it can be sent again even if it is not idempotent
+THROTTLED = (429,)
+# responses worth retrying for idempotent requests, the server may have processed a failed request before failing
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+IDEMPOTENT = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+
+# longest wait for a Retry-After or a backoff, so a broken header cannot block the command
+MAX_DELAY = 60.0
+
+def retryAfter(value: str):
+    """Return the seconds to wait of a Retry-After header, given in seconds or as HTTP date, or None if it is invalid"""
+
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if date == None:
+        return None
+    return max(0.0, date.timestamp() - time.time())
+
+class TokenBucket(object):
+    """Allow bursts of up to burst requests and rate requests per second on average, 0 for no limit.
+    When the API throttles, the rate is halved from the rate sent before and then increased by one request per second
+    every second, so it settles just below the limit of the API even if none is configured.
+    A Retry-After of the API pauses all requests of the command, not only the throttled one"""
+
+    def __init__(self, rate: float, burst: int):
+        self.maximum = rate
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        # send times of the last second, to know the rate the API throttled at
+        self.sent = collections.deque()
+        self.decreased = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Wait until a request may be sent and return the time it is sent"""
+
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                delay = self.paused_until - now
+                if delay <= 0 and self.rate > 0:
+                    self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return self.send(now)
+                    delay = (1 - self.tokens) / self.rate
+                elif delay <= 0:
+                    return self.send(now)
+            time.sleep(delay)
+
+    def send(self, now: float):
+        self.sent.append(now)
+        while self.sent[0] < now - 1:
+            self.sent.popleft()
+        return now
+
+    def release(self, started: float, throttled: bool):
+        """Adjust the rate to the response of a request sent at started"""
+
+        with self.lock:
+            if throttled:
+                # all requests sent before the rate was lowered are throttled as well and must not lower it again
+                if started >= self.decreased:
+                    sent = len([sent_at for sent_at in self.sent if sent_at > started - 1])
+                    self.rate = max(1.0, min(self.rate or sent, sent) / 2)
+                    self.tokens = min(self.tokens, 1.0)
+                    self.decreased = time.monotonic()
+            elif self.rate != self.maximum:
+                self.rate += 1 / self.rate
+                if self.maximum > 0 and self.rate > self.maximum:
+                    self.rate = self.maximum
+
+    def pause(self, seconds: float):
+        """Hold back all requests for the given seconds"""
+
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            # start with a single token afterwards instead of a burst that is throttled again
+            self.tokens = min(self.tokens, 1.0)
+
+class AdaptiveLimit(object):
+    """Number of concurrent requests adjusted like the congestion window of TCP: increased by one per limit
+    successful requests and halved when the API throttles, at most once per round of requests in flight"""
+
+    def __init__(self, maximum: int, minimum: int = 1):
+        self.maximum = max(minimum, maximum)
+        self.minimum = minimum
+        self.limit = float(self.maximum)
+        self.active = 0
+        # requests started before the last decrease saw the old limit and do not decrease it again
+        self.decreased = 0.0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        """Wait for a free slot and return the start time of the request"""
+
+        with self.condition:
+            while self.active >= int(self.limit):
+                self.condition.wait()
+            self.active += 1
+            return time.monotonic()
+
+    def release(self, started: float, throttled: bool):
+        with self.condition:
+            self.active -= 1
+            if throttled:
+                if started >= self.decreased:
+                    self.limit = max(self.minimum, self.limit / 2)
+                    self.decreased = time.monotonic()
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self.condition.notify_all()
+
+class Backoff(object):
+    """Delays of retries growing exponentially from base up to cap seconds, with full jitter so parallel workers do not retry in lockstep"""
+
+    def __init__(self, base: float, cap: float = MAX_DELAY):
+        self.base = base
+        self.cap = cap
+
+    def delay(self, attempt: int):
+        return random.uniform(0, min(self.cap, self.base * 2 ** attempt))
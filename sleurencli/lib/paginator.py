@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+
+import collections
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import tracing
+from .jsonstream import JsonStream
+
+CHUNK_SIZE = 65536
+
+class Paginator(object):
+
+    def __init__(self, config, path: str, key: str, ttl: float = 0, cancel = None):
+        self.config = config
+        self.path = path
+        self.key = key
+        self.ttl = ttl
+        # threading.Event stopping the download at the next page, e.g. after a timeout
+        self.cancel = cancel
+        self.cancelled = False
+        self.failed = False
+        # status code of the failed page
+        self.status = None
+
+        self.prefetch = max(1, int(config.prefetch_pages))
+        self.target_latency = float(config.page_latency)
+
+        # page sizes are doubled or halved starting from min_size, so a size dividing the items already requested is always found
+        self.min_size = min(100, int(config.max_items))
+        self.max_size = self.min_size
+        while self.max_size * 2 <= int(config.max_items):
+            self.max_size *= 2
+
+    def fetchPage(self, page: int, size: int):
+        """Request a single page and return its response as soon as the headers arrived"""
+
+        params = self.config.params()
+        params['page'] = page
+        params['perpage'] = size
+
+        if self.config.debug:
+            print('GET', self.config.endpoint + self.path + '?', params)
+
+        # the sizes of the pages depend on their latency, so pages are only served together from the cache by listing()
+        start = time.monotonic()
+        response = self.config.cache().get(self.path, params, self.ttl, revalidate=True)
+        latency = time.monotonic() - start
+
+        return (page, size, response, latency)
+
+    def items(self, response, page: int = 1, fields: dict = None):
+        """Decode the items of a page one by one while its body is downloaded, and the values of the names in fields"""
+
+        chunks = response.iter_content(chunk_size=CHUNK_SIZE)
+        if tracing.tracer != None:
+            return tracing.tracer.stream(self.path + ' page ' + str(page), iter(chunks), lambda chunks: JsonStream(chunks).items(self.key, fields))
+        return JsonStream(chunks).items(self.key, fields)
+
+    def nextPageSize(self, size: int, latency: float):
+        """Choose the size of the next pages based on the latency of the last page, growing by several steps at once if it was fast"""
+
+        if latency > self.target_latency and size // 2 >= self.min_size:
+            return size // 2
+        while latency < self.target_latency / 2 and size * 2 <= self.max_size:
+            # the latency grows at most with the size of the page
+            size *= 2
+            latency *= 2
+        return size
+
+    def pageSize(self, offset: int, size: int):
+        """Return the largest page size up to size whose pages start at offset, as the API addresses pages by number and size only"""
+
+        while offset % size != 0:
+            size //= 2
+        return size
+
+    def restart(self, offset: int, limit: int):
+        """Continue with pages starting at offset that are no larger than the limit, e.g. the most items the API returns per page"""
+
+        self.min_size = math.gcd(offset, limit)
+        self.max_size = self.min_size
+        while self.max_size * 2 <= limit:
+            self.max_size *= 2
+
+    def total(self, fields: dict):
+        """Return the total number of items of the pagination data of a page, or None if the API does not report it"""
+
+        meta = fields.get('meta')
+        for total in (fields.get('total'), meta.get('total') if isinstance(meta, dict) else None):
+            if isinstance(total, int) and not isinstance(total, bool):
+                return total
+        return None
+
+    def __iter__(self):
+        """Yield all items, from the cache if the last complete download is fresh, otherwise downloaded page by page"""
+
+        self.failed = False
+        self.cancelled = False
+        self.status = None
+
+        params = self.config.params()
+        del params['perpage']
+        cached = self.config.cache().listing(self.path, params, self.ttl)
+        if cached != None:
+            for page, page_size, response in cached:
+                if self.stopped():
+                    return
+                try:
+                    yield from self.items(response, page)
+                finally:
+                    response.close()
+            return
+
+        start = time.time()
+        pages = []
+        for item in self.download(pages):
+            yield item
+        if not self.failed and not self.cancelled:
+            self.config.cache().saveListing(self.path, params, start, pages)
+
+    def download(self, pages: list):
+        """Yield all items page by page while the following pages are downloaded in the background, adding the complete pages as (page, size) to pages"""
+
+        executor = ThreadPoolExecutor(max_workers=self.prefetch)
+        pending = collections.deque()
+        first_id = None
+        # ids of the items yielded so far, a page starting with one of them was not returned at the requested offset
+        seen = set()
+        # total number of items if the API reports it, which tells the last page even if the API returned fewer items than requested
+        total = None
+
+        try:
+            # the first page is requested alone and small, so the first items arrive quickly
+            size = self.min_size
+            pending.append(executor.submit(self.fetchPage, 1, size))
+            requested = size
+
+            while pending:
+                if self.stopped():
+                    return
+                page, page_size, response, latency = pending.popleft().result()
+                offset = (page - 1) * page_size
+                fields = {'total': None, 'meta': None}
+                misplaced = False
+
+                try:
+                    if response.status_code != 200:
+                        self.status = response.status_code
+                        self.failed = True
+                        return
+
+                    count = 0
+                    for item in self.items(response, page, fields):
+                        if count == 0:
+                            if page == 1:
+                                first_id = item.get('id')
+                            elif item.get('id') in seen:
+                                # the endpoint ignores the page parameter and returns the first page again
+                                if item.get('id') == first_id:
+                                    return
+                                # the API returns fewer items per page than requested and counts the pages in its own size
+                                misplaced = True
+
+                        count += 1
+                        if misplaced:
+                            continue
+                        seen.add(item.get('id'))
+
+                        # a full page means there might be more, so keep the next pages downloading in the background
+                        if count == page_size:
+                            size = self.nextPageSize(size, latency)
+                            while len(pending) < self.prefetch and (total == None or requested < total):
+                                next_size = self.pageSize(requested, size)
+                                # while the pages grow every page requests as many items as all before, one page ahead is enough
+                                if next_size < size and pending:
+                                    break
+                                pending.append(executor.submit(self.fetchPage, requested // next_size + 1, next_size))
+                                requested += next_size
+
+                        yield item
+                finally:
+                    response.close()
+
+                if self.total(fields) != None:
+                    total = self.total(fields)
+
+                if misplaced:
+                    # continue at the offset of the page, with pages no larger than the API returns
+                    self.restart(offset, count)
+                elif count == page_size or count == 0 or total == None or offset + count >= total:
+                    pages.append((page, page_size))
+                    # a page that is not full is the last one
+                    if count < page_size or (total != None and offset + count >= total):
+                        return
+                    continue
+                else:
+                    # a page shorter than requested before the reported total was cut by a limit of the API
+                    pages.append((page, page_size))
+                    self.restart(offset + count, count)
+
+                for future in pending:
+                    if not future.cancel():
+                        future.add_done_callback(self.discard)
+                pending.clear()
+                size = self.min_size
+                requested = offset if misplaced else offset + count
+                pending.append(executor.submit(self.fetchPage, requested // size + 1, size))
+                requested += size
+        finally:
+            for future in pending:
+                if not future.cancel():
+                    future.add_done_callback(self.discard)
+            executor.shutdown(wait=False)
+
+    def stopped(self):
+        """Return whether the download was cancelled, remembering it"""
+
+        if self.cancel != None and self.cancel.is_set():
+            self.cancelled = True
+        return self.cancelled
+
+    def discard(self, future):
+        """Close the response of a page that is not needed anymore"""
+
+        if not future.cancelled() and future.exception() == None:
+            future.result()[2].close()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+from sys import intern
+
+def text(value):
+    """Return the value as interned string, as many servers and monitors share the same OS, status or location"""
+
+    return intern(str(value)) if value != None else ''
+
+class DiskMount(object):
+    """Free and used space of a mounted file system"""
+
+    __slots__ = ('mount', 'free_bytes', 'used_bytes', 'free_percent')
+
+    def __init__(self, mount: str, free_bytes: int, used_bytes: int):
+        self.mount = text(mount)
+        self.free_bytes = free_bytes
+        self.used_bytes = used_bytes
+        total = free_bytes + used_bytes
+        self.free_percent = free_bytes / total * 100 if total > 0 else 0.0
+
+class Server(object):
+    """The fields of a monitored server used by the CLI, taken from the API response with defaults resolved"""
+
+    __slots__ = ('id', 'name', 'os', 'status', 'ip_address', 'cpu', 'mem', 'disk', 'disks', 'tags', 'data')
+
+    @staticmethod
+    def fromDict(server: dict, keep: bool = False):
+        """Create a record from the API data of a server. The full data is only kept if requested, e.g. for JSON output"""
+
+        record = Server()
+        record.id = server['id']
+        record.name = server['name']
+        record.os = text(server['os'] if 'os' in server else '')
+        record.status = text(server['status'] if 'status' in server else '')
+
+        ip_whois = server['ip_whois'] if 'ip_whois' in server else None
+        record.ip_address = ip_whois['ip'] if ip_whois and 'ip' in ip_whois else ''
+
+        summary = server['summary'] if 'summary' in server and server['summary'] else {}
+        record.cpu = summary.get('cpu_usage_percent', 0)
+        record.mem = summary.get('mem_usage_percent', 0)
+        record.disk = summary.get('disk_usage_percent', 0)
+
+        last_data = server['last_data'] if 'last_data' in server and server['last_data'] else {}
+        record.disks = tuple(DiskMount(disk['mount'], disk['free_bytes'], disk['used_bytes']) for disk in last_data.get('df') or ())
+
+        record.tags = [text(tag) for tag in server['tags']] if 'tags' in server and server['tags'] else []
+        record.data = server if keep else None
+        return record
+
+class Monitor(object):
+    """The fields of a website monitor used by the CLI, taken from the API response with defaults resolved"""
+
+    __slots__ = ('id', 'url', 'name', 'code', 'status', 'status_message', 'location', 'uptime', 'ttfb', 'data')
+
+    @staticmethod
+    def fromDict(monitor: dict, keep: bool = False):
+        """Create a record from the API data of a monitor. The full data is only kept if requested, e.g. for JSON output"""
+
+        record = Monitor()
+        record.id = monitor['id']
+        record.url = monitor['url']
+        record.name = monitor['name'] if 'name' in monitor and monitor['name'] != None else ''
+        record.code = text(monitor['code'] if 'code' in monitor else '')
+        record.status = text(monitor['status'] if 'status' in monitor else '')
+        record.status_message = text(monitor['status_message'] if 'status_message' in monitor else '')
+        record.location = text(monitor['monitor']['name'])
+        record.uptime = float(monitor['uptime_percentage'])
+
+        # monitors without a check so far have no time to first byte
+        if 'last_check' in monitor and monitor['last_check'] and 'ttfb' in monitor['last_check']:
+            record.ttfb = float(monitor['last_check']['ttfb'])
+        else:
+            record.ttfb = None
+
+        record.data = monitor if keep else None
+        return record
@@ -1,22 +1,58 @@
 #!/usr/bin/env python3
 
-import requests
+import re
 import json
-from prettytable import PrettyTable
 
 from .config import Config
+from .table import Table
+from .csvwriter import CsvWriter
+from .bulk import Bulk
+from .watch import Watch
+from .inventory import Inventory
+from .groups import Groups
+from .columns import Thresholds, ServerColumns, flagIssues
+from ..api import SleurenError
 from .functions import printError, printWarn
 from .bcolors import bcolors
 
+# groups of a server for --group-by, a server with several tags is counted in each of them
+GROUP_KEYS = {
+    'tag': lambda server: server.tags or ['(untagged)'],
+    'os': lambda server: [server.os or '(unknown)'],
+    'status': lambda server: [server.status or '(unknown)'],
+}
+
 class Servers(object):
 
+    # header and value of the columns of the CSV output
+    csv_columns = [
+        ('id', lambda server: server.id),
+        ('server name', lambda server: server.name),
+        ('ip address', lambda server: server.ip_address),
+        ('status', lambda server: server.status),
+        ('os', lambda server: server.os),
+        ('cpu usage %', lambda server: server.cpu),
+        ('mem usage %', lambda server: server.mem),
+        ('disk usage %', lambda server: server.disk),
+        ('free disk space', lambda server: ', '.join("{:.0f}".format(disk.free_percent) + '% free on ' + disk.mount for disk in server.disks)),
+        ('tags', lambda server: ', '.join(server.tags)),
+    ]
+
     def __init__(self, config):
         self.config = config
+        self.thresholds = Thresholds(config)
         self.servers = None
+        self.indexed = None
+        self.failed = False
         self.format = 'table'
-
-        self.table = PrettyTable()
-        self.table.field_names = ['ID', 'Server name', 'IP Address', 'Status', 'OS', 'CPU Usage %', 'Mem Usage %', 'Disk Usage %', 'Disk Info', 'Tags']
+        self.delimiter = ';'
+        self.quoting = 'minimal'
+        self.csv = None
+        # snapshot to query instead of downloading the servers
+        self.source = None
+
+        self.table = Table(['ID', 'Server name', 'IP Address', 'Status', 'OS', 'CPU Usage %', 'Mem Usage %', 'Disk Usage %', 'Disk Info', 'Tags'],
+            ['id', 'name', 'ip', 'status', 'os', 'cpu', 'mem', 'disk', 'free', 'tags'])
         self.table.align['ID'] = 'l'
         self.table.align['Server name'] = 'l'
         self.table.min_width['Server name'] = 24
@@ -34,123 +70,322 @@ class Servers(object):
         if self.servers != None:
             return True
 
-        # check if headers are correctly set for authorization
-        if not self.config.headers():
+        servers = list(self.iterData())
+        if self.failed:
+            self.servers = None
             return False
 
-        if self.config.debug:
-            print('GET', self.config.endpoint + 'servers?', self.config.params())
+        self.servers = servers
+        return True
 
-        # Make request to API endpoint
-        response = requests.get(self.config.endpoint + 'servers', params=self.config.params(), headers=self.config.headers())
+    def iterData(self):
+        """Yield the monitored servers page by page as they are downloaded"""
 
-        # Check status code of response
-        if response.status_code == 200:
-            # Get list of servers from response
-            self.servers = response.json()['servers']
-            return True
-        else:
-            printError('An error occurred:', response.status_code)
-            self.servers = None
-            return False
+        self.failed = False
 
-    def update(self, serverId: str, tags):
-        """Update a specific server and add specified tags to it"""
+        # if data is already downloaded, use cached data
+        if self.servers != None:
+            yield from self.servers
+            return
 
-        data = {
-            "tags": tags
-        }
+        # check if headers are correctly set for authorization
+        if not self.config.headers():
+            self.failed = True
+            return
 
-        if self.config.debug:
-            print('PUT', self.config.endpoint + 'server/' + serverId + '?', data)
+        # keep the complete API data only if it is printed as JSON
+        keep = (self.format == 'json')
 
-        if self.config.readonly:
-            return False
+        # the download updates the completion index and the history as well
+        try:
+            yield from self.config.api().servers(keep=keep)
+        except SleurenError as e:
+            printError(e)
+            self.failed = True
 
-        # Make request to API endpoint
-        response = requests.put(self.config.endpoint + 'server/' + serverId,  data=json.dumps(data), headers=self.config.headers())
+    def update(self, serverId: str, tags):
+        """Update a specific server and add specified tags to it"""
 
-        # Check status code of response
-        if response.status_code == 200:
-            print('Updated tags of server', serverId, 'to', tags)
-            return True
-        else:
-            printError('Failed to update server', serverId, 'with response code:', response.status_code)
+        try:
+            if not self.config.api().updateTags(serverId, tags):
+                return False
+        except SleurenError as e:
+            printError(e)
             return False
 
+        print('Updated tags of server', serverId, 'to', tags)
+        return True
+
     def list(self, issuesOnly: bool, sort: str, reverse: bool, limit: int, tags):
         """Iterate through list of server monitors and print details"""
 
-        if self.fetchData():
+        if self.source != None:
+            self.listSnapshot(issuesOnly, sort, reverse, limit, tags)
+            return
 
-            # if JSON was requested and no filters, then just print it without iterating through
-            if (self.format == 'json' and not (issuesOnly or len(tags) > 0 or limit > 0)):
-                print(json.dumps(self.servers, indent=4))
-                return
+        # if JSON was requested and no filters, then just print it without iterating through
+        if (self.format == 'json' and not (issuesOnly or len(tags) > 0 or limit > 0)):
+            if self.fetchData():
+                print(json.dumps([server.data for server in self.servers], indent=4))
+            return
 
-            self.printHeader()
-
-            self.sum_cpu_usage = 0
-            self.sum_mem_usage = 0
-            self.sum_disk_usage = 0
-            self.num_servers = 0
-
-            # Iterate through list of monitors and print urls, etc.
-            for server in self.servers:
-                if len(tags) == 0:
-                    if (not issuesOnly) or self.hasIssue(server):
-                        self.print(server)
-                elif 'tags' in server:
-                    match = True
-                    for tag in tags:
-                        if not tag in server['tags']:
-                            match = False
-                            break
-                    if match:
-                        if (not issuesOnly) or self.hasIssue(server):
-                            self.print(server)
+        # check if headers are correctly set for authorization
+        if not self.config.headers():
+            return
+
+        self.printHeader()
+
+        self.sum_cpu_usage = 0
+        self.sum_mem_usage = 0
+        self.sum_disk_usage = 0
+        self.num_servers = 0
+
+        # tags are resolved through the indexes of the complete inventory, otherwise rows are printed as they arrive
+        if len(tags) > 0:
+            servers = self.select(tags=tags) if self.fetchData() else []
+        else:
+            servers = self.iterData()
+
+        if issuesOnly:
+            servers = self.withIssues(servers)
+
+        # Iterate through list of monitors and print urls, etc.
+        for server in servers:
+            self.print(server)
 
+        if (self.format == 'csv'):
+            self.csv.close()
+
+        if not self.failed:
             self.printFooter(sort=sort, reverse=reverse, limit=limit)
 
+    def listGroups(self, group_by: str, issuesOnly: bool, sort: str, reverse: bool, limit: int, tags):
+        """Print one row per tag, OS or status with the number of servers and issues, the averages and worst values, aggregated in one pass"""
+
+        if self.source != None:
+            servers = self.source.servers(tags=tags, issuesOnly=issuesOnly)
+        else:
+            # check if headers are correctly set for authorization
+            if not self.config.headers():
+                return
+
+            if len(tags) > 0:
+                servers = self.select(tags=tags) if self.fetchData() else []
+            else:
+                servers = self.iterData()
+
+        groups = Groups(GROUP_KEYS[group_by], {
+            'cpu': lambda server: server.cpu,
+            'mem': lambda server: server.mem,
+            'disk': lambda server: server.disk,
+            'free': lambda server: min((disk.free_percent for disk in server.disks), default=None),
+        })
+
+        # thresholds are evaluated for a batch of servers at once, like for --issues
+        for server, issue in flagIssues(servers, lambda: ServerColumns(self.thresholds)):
+            if issue or not issuesOnly:
+                groups.add(server, issue)
+
+        if self.failed:
+            return
+
+        t = self.thresholds
+        groups.print([
+            ('OS' if group_by == 'os' else group_by.capitalize(), group_by, lambda group: group.name, '{}', None),
+            ('Servers', 'count', lambda group: group.count, '{}', None),
+            ('Issues', 'issues', lambda group: group.issues, '{}', lambda value: value > 0),
+            ('Avg CPU %', 'avg_cpu', lambda group: group.columns['cpu'].avg, '{:.1f}', lambda value: value >= t.cpu_usage),
+            ('Max CPU %', 'max_cpu', lambda group: group.columns['cpu'].max, '{:.1f}', lambda value: value >= t.cpu_usage),
+            ('Avg Mem %', 'avg_mem', lambda group: group.columns['mem'].avg, '{:.1f}', lambda value: value >= t.mem_usage),
+            ('Max Mem %', 'max_mem', lambda group: group.columns['mem'].max, '{:.1f}', lambda value: value >= t.mem_usage),
+            ('Avg Disk %', 'avg_disk', lambda group: group.columns['disk'].avg, '{:.1f}', lambda value: value >= t.disk_usage),
+            ('Max Disk %', 'max_disk', lambda group: group.columns['disk'].max, '{:.1f}', lambda value: value >= t.disk_usage),
+            ('Min free disk %', 'min_free', lambda group: group.columns['free'].min, '{:.1f}', lambda value: value <= t.free_diskspace),
+        ], self.format, sort, reverse, limit, self.delimiter, self.quoting)
+
+    def listSnapshot(self, issuesOnly: bool, sort: str, reverse: bool, limit: int, tags):
+        """Print the servers of a snapshot, filtered, sorted and limited by the database"""
+
+        order = self.table.sortColumns(sort, reverse, ['ID'] if self.config.hide_ids else []) if sort else []
+        if order == None:
+            return
+
+        servers = self.source.servers(tags=tags, issuesOnly=issuesOnly, order=order, limit=limit, keep=(self.format == 'json'))
+
+        if (self.format == 'json' and not (issuesOnly or len(tags) > 0 or limit > 0)):
+            print(json.dumps([server.data for server in servers], indent=4))
+            return
+
+        self.printHeader()
+
+        for server in servers:
+            self.print(server)
+
+        if (self.format == 'csv'):
+            self.csv.close()
+
+        # the average row covers all matching servers, not only the printed ones
+        self.num_servers, self.sum_cpu_usage, self.sum_mem_usage, self.sum_disk_usage = self.source.serverTotals(tags, issuesOnly)
+        self.printFooter()
+
+    def watch(self, interval: float, issuesOnly: bool, sort: str, reverse: bool, limit: int, tags):
+        """Print the list of servers and then only the servers whose status or usage changed every interval seconds"""
+
+        def refresh():
+            self.servers = None
+            if self.fetchData():
+                return self.snapshot(tags)
+
+        Watch(self.config, interval).run(refresh, lambda: self.list(issuesOnly, sort, reverse, limit, tags), issuesOnly)
+
+    def snapshot(self, tags):
+        """Return the watched values of all servers matching the tags"""
+
+        rows = {}
+        for server in self.select(tags=tags):
+            rows[server.id] = (server.name, {
+                'status': server.status,
+                'cpu': "{:.1f}".format(server.cpu) + '%',
+                'mem': "{:.1f}".format(server.mem) + '%',
+                'disk': "{:.1f}".format(server.disk) + '%',
+            }, self.hasIssue(server))
+        return rows
+
     def setTags(self, pattern: str, tags):
-        """Set the tags for the server specified with pattern. Pattern can be either the server ID or its name"""
+        """Set the tags for the servers specified with pattern. Pattern can be either the server ID or part of its name"""
 
         if pattern and len(tags) > 0 and self.fetchData():
-            for server in self.servers:
-                if pattern == server['id'] or pattern in server['name']:
-                    return self.update(server['id'], tags)
+            if self.inventory().find('id', pattern):
+                return self.updateTags(id=pattern, tags=tags)
+            return self.updateTags(name=pattern, tags=tags)
 
         printWarn('No server with given pattern found: ' + pattern)
 
-    def hasIssue(self, server):
-        """Return True if the specified server has some issue by having a value outside of the expected threshold specified in config file"""
+    def inventory(self):
+        """Return the indexes over the downloaded servers, building them once per download"""
+
+        if self.indexed == None or self.indexed.items is not self.servers:
+            self.indexed = Inventory(self.servers)
+            self.indexed.define('id', lambda server: server.id)
+            self.indexed.define('name', lambda server: server.name, 'substring')
+            self.indexed.define('tags', lambda server: server.tags, 'multi')
+        return self.indexed
+
+    def select(self, id: str = '', name: str = '', regex: str = '', tags = (), issuesOnly: bool = False):
+        """Return all downloaded servers matching every given criteria"""
+
+        inventory = self.inventory()
+        positions = None
+        if id:
+            positions = inventory.find('id', id)
+        if name:
+            found = inventory.find('name', name)
+            positions = found if positions == None else positions & found
+        for tag in tags:
+            found = inventory.find('tags', tag)
+            positions = found if positions == None else positions & found
+
+        selected = inventory.get(positions) if positions != None else self.servers
+
+        if regex:
+            expression = re.compile(regex)
+            selected = [server for server in selected if expression.search(server.name)]
+        if issuesOnly:
+            selected = list(self.withIssues(selected))
+
+        return selected
+
+    def updateTags(self, id: str = '', name: str = '', regex: str = '', matchTags = (), issuesOnly: bool = False, tags = None, addTags = (), removeTags = (), dryRun: bool = False, report: str = ''):
+        """Replace, add or remove tags of all servers matching the given selector"""
+
+        if not (id or name or regex or len(matchTags) > 0 or issuesOnly):
+            printWarn('Please specify which servers to update with --id, --name, --regex, --match-tag or --issues')
+            return False
+
+        if tags == None and len(addTags) == 0 and len(removeTags) == 0:
+            printWarn('Please specify the tags to set with --tag, --add-tag or --remove-tag')
+            return False
 
-        cpu_usage_percent = server['summary']['cpu_usage_percent'] if 'summary' in server else 0
-        mem_usage_percent = server['summary']['mem_usage_percent'] if 'summary' in server else 0
-        disk_usage_percent = server['summary']['disk_usage_percent'] if 'summary' in server else 0
+        if regex:
+            try:
+                re.compile(regex)
+            except re.error as e:
+                printError('ERROR: Invalid regular expression', regex + ':', e)
+                return False
 
-        if cpu_usage_percent >= float(self.config.threshold_cpu_usage) \
-            or mem_usage_percent >= float(self.config.threshold_mem_usage) \
-            or disk_usage_percent >= float(self.config.threshold_disk_usage):
+        if not self.fetchData():
+            return False
+
+        # calculate the new tags of every selected server and skip servers that would not change
+        changes = []
+        for server in self.select(id, name, regex, matchTags, issuesOnly):
+            current = server.tags
+            new_tags = list(tags) if tags != None else list(current)
+            new_tags += [tag for tag in addTags if tag not in new_tags]
+            new_tags = [tag for tag in new_tags if tag not in removeTags]
+            if new_tags != current:
+                changes.append({'id': server.id, 'name': server.name, 'tags': new_tags})
+
+        if len(changes) == 0:
+            printWarn('No server with given pattern found or tags are already set')
+            return False
+
+        if dryRun:
+            print(len(changes), 'servers would be updated:')
+            for change in changes:
+                print(change['name'], '[', change['id'], '] ->', ', '.join(change['tags']))
             return True
 
-        last_data = server['last_data']
-        if 'df' in last_data:
-            for disk in last_data['df']:
-                free_disk_space = disk['free_bytes']
-                used_disk_space = disk['used_bytes']
-                total_disk_space = free_disk_space + used_disk_space
-                free_disk_space_percent = free_disk_space / total_disk_space * 100
+        bulk = Bulk(self.config, 'Updating servers')
+
+        def update(item):
+            try:
+                if not self.config.api().updateTags(item['id'], item['tags']):
+                    return ('skipped', 'readonly')
+            except SleurenError as e:
+                return ('failed', 'response code ' + str(e.status) if e.status != None else str(e))
+            return ('updated', '')
+
+        bulk.run(changes, update)
 
-                if free_disk_space_percent <= float(self.config.threshold_free_diskspace):
-                    return True
+        for item in bulk.items:
+            if item['result'] == 'updated':
+                print('Updated tags of server', item['name'], '[', item['id'], '] to', item['tags'])
+            elif item['result'] == 'failed':
+                printError('Failed to update server', item['name'], '[', item['id'], '] with', item['detail'])
+
+        bulk.printSummary()
+        if report:
+            bulk.writeReport(report)
+
+        return 'failed' not in bulk.counts
+
+    def hasIssue(self, server):
+        """Return True if the specified server has some issue by having a value outside of the expected threshold specified in config file"""
+
+        if server.cpu >= self.thresholds.cpu_usage \
+            or server.mem >= self.thresholds.mem_usage \
+            or server.disk >= self.thresholds.disk_usage:
+            return True
+
+        for disk in server.disks:
+            if disk.free_percent <= self.thresholds.free_diskspace:
+                return True
 
         return False
 
+    def withIssues(self, servers):
+        """Yield only the servers with issues, evaluating the thresholds for a batch of servers at once"""
+
+        for server, issue in flagIssues(servers, lambda: ServerColumns(self.thresholds)):
+            if issue:
+                yield server
+
     def printHeader(self):
         """Print CSV if CSV format requested"""
         if (self.format == 'csv'):
-            print('id;server name;ip address;status;os;cpu usage %;mem usage %;disk usage %;free disk space;tags')
+            self.csv = CsvWriter(self.csv_columns, delimiter=self.delimiter, quoting=self.quoting)
+            self.csv.writeHeader()
 
     def printFooter(self, sort: str = '', reverse: bool = False, limit: int = 0):
         """Print table if table format requested"""
@@ -161,136 +396,83 @@ class Servers(object):
             avg_mem_usage = self.sum_mem_usage / self.num_servers if self.sum_mem_usage > 0 and self.num_servers > 0 else 0
             avg_disk_usage = self.sum_disk_usage / self.num_servers if self.sum_disk_usage > 0 and self.num_servers > 0 else 0
 
-            if avg_cpu_usage >= float(self.config.threshold_cpu_usage):
+            if avg_cpu_usage >= self.thresholds.cpu_usage:
                 avg_cpu_usage_text = f"{bcolors.FAIL}" + "{:.1f}".format(avg_cpu_usage) + '%' + f"{bcolors.ENDC}"
             else:
                avg_cpu_usage_text = "{:.1f}".format(avg_cpu_usage) + '%'
 
-            if avg_mem_usage >= float(self.config.threshold_mem_usage):
+            if avg_mem_usage >= self.thresholds.mem_usage:
                 avg_mem_usage_text = f"{bcolors.FAIL}" + "{:.1f}".format(avg_mem_usage) + '%' + f"{bcolors.ENDC}"
             else:
                avg_mem_usage_text = "{:.1f}".format(avg_mem_usage) + '%'
 
-            if avg_disk_usage >= float(self.config.threshold_disk_usage):
+            if avg_disk_usage >= self.thresholds.disk_usage:
                 avg_disk_usage_text = f"{bcolors.FAIL}" + "{:.1f}".format(avg_disk_usage) + '%' + f"{bcolors.ENDC}"
             else:
                avg_disk_usage_text = "{:.1f}".format(avg_disk_usage) + '%'
 
-            # add average row as table footer
-            self.table.add_row(['', 'Average of ' + str(self.num_servers) + ' servers', '', '', '', avg_cpu_usage_text, avg_mem_usage_text, avg_disk_usage_text, '', ''])
-
-            if self.config.hide_ids:
-                self.table.del_column('ID')
-
-            # Get string to be printed and create list of elements separated by \n
-            list_of_table_lines = self.table.get_string().split('\n')
-
-            # remember summary row
-            summary_line = list_of_table_lines[-2]
+            # the average row is printed as table footer below the sorted and limited rows
+            footer = ['', 'Average of ' + str(self.num_servers) + ' servers', '', '', '', avg_cpu_usage_text, avg_mem_usage_text, avg_disk_usage_text, '', '']
 
-            # remove summary row again to allow sorting and limiting
-            self.table.del_row(len(self.table.rows)-1)
+            # remove columns that should be excluded
+            hide = ['ID'] if self.config.hide_ids else []
 
-            if sort:
-                # if sort contains the column index instead of the column name, get the column name instead
-                if sort.isdecimal():
-                    sort = self.table.get_csv_string().split(',')[int(sort) - 1]
-            else:
-                sort = None
-
-            if limit > 0:
-                list_of_table_lines = self.table.get_string(sortby=sort, reversesort=reverse, start=0, end=limit).split('\n')
-            else:
-                list_of_table_lines = self.table.get_string(sortby=sort, reversesort=reverse).split('\n')
-
-            # Sorting by multiple columns could be done like this
-            # list_of_table_lines = self.table.get_string(sortby=("Col Name 1", "Col Name 2")), reversesort=reverse).split('\n')
-
-            # Print the table
-            print('\n'.join(list_of_table_lines))
-            print(summary_line)
-            print(list_of_table_lines[0])
+            self.table.print(sort=sort, reverse=reverse, limit=limit, footer=footer, hide=hide)
 
     def print(self, server):
         """Print the data of the specified server monitor"""
 
         if (self.format == 'json'):
-            print(json.dumps(server, indent=4))
+            print(json.dumps(server.data, indent=4))
             return
 
-        id = server['id']
-        name = server['name']
-        os = server['os'] if 'os' in server else ''
-        agent_version = server['agent_version'] if 'agent_version' in server else ''
-        status = server['status'] if 'status' in server else ''
-        last_data = server['last_data']
-        uptime_seconds = last_data['uptime']['seconds'] if 'uptime' in last_data else 0
-        cores = last_data['cores'] if 'cores' in last_data else 0
-        memory_used = last_data['memory']['used'] if 'memory' in last_data else 0
-        memory_free = last_data['memory']['free'] if 'memory' in last_data else 0
-        memory_available = last_data['memory']['available'] if 'memory' in last_data else 0
-        memory_total = last_data['memory']['total'] if 'memory' in last_data else 0
-        connecting_ip = server['connecting_ip'] if 'connecting_ip' in server else ''
-        if 'ip_whois' in server and server['ip_whois']:
-            ip_whois = server['ip_whois']
-            ip_address = ip_whois['ip'] if 'ip' in ip_whois else ''
-            ip_country = ip_whois['country'] if 'country' in ip_whois else ''
-            ip_hoster = ip_whois['org'] if 'org' in ip_whois else ''
-        else:
-            ip_address = ''
-            ip_country = ''
-            ip_hoster = ''
-        cpu_usage_percent = server['summary']['cpu_usage_percent'] if 'summary' in server else 0
-        mem_usage_percent = server['summary']['mem_usage_percent'] if 'summary' in server else 0
-        disk_usage_percent = server['summary']['disk_usage_percent'] if 'summary' in server else 0
+        id = server.id
+        name = server.name
+        os = server.os
+        status = server.status
+        ip_address = server.ip_address
+        cpu_usage_percent = server.cpu
+        mem_usage_percent = server.mem
+        disk_usage_percent = server.disk
 
         self.sum_cpu_usage = self.sum_cpu_usage + cpu_usage_percent
         self.sum_mem_usage = self.sum_mem_usage + mem_usage_percent
         self.sum_disk_usage = self.sum_disk_usage + disk_usage_percent
         self.num_servers = self.num_servers + 1
 
-        if cpu_usage_percent >= float(self.config.threshold_cpu_usage):
+        if (self.format == 'csv'):
+            self.csv.write(server)
+            return
+
+        if cpu_usage_percent >= self.thresholds.cpu_usage:
             cpu_usage_percent_text = f"{bcolors.FAIL}" + "{:.1f}".format(cpu_usage_percent) + '%' + f"{bcolors.ENDC}"
         else:
             cpu_usage_percent_text = "{:.1f}".format(cpu_usage_percent) + '%'
 
-        if mem_usage_percent >= float(self.config.threshold_mem_usage):
+        if mem_usage_percent >= self.thresholds.mem_usage:
             mem_usage_percent_text = f"{bcolors.FAIL}" + "{:.1f}".format(mem_usage_percent) + '%' + f"{bcolors.ENDC}"
         else:
             mem_usage_percent_text = "{:.1f}".format(mem_usage_percent) + '%'
 
-        if disk_usage_percent >= float(self.config.threshold_disk_usage):
+        if disk_usage_percent >= self.thresholds.disk_usage:
             disk_usage_percent_text = f"{bcolors.FAIL}" + "{:.1f}".format(disk_usage_percent) + '%' + f"{bcolors.ENDC}"
         else:
             disk_usage_percent_text = "{:.1f}".format(disk_usage_percent) + '%'
 
-        tags = ''
-        if 'tags' in server and server['tags']:
-            for tag in server['tags']:
-                if tags:
-                    tags += ', ' + tag
-                else:
-                    tags = tag
+        tags = ', '.join(server.tags)
 
         disk_info = ''
-        if 'df' in last_data:
-            for disk in last_data['df']:
-                free_disk_space = disk['free_bytes']
-                used_disk_space = disk['used_bytes']
-                total_disk_space = free_disk_space + used_disk_space
-                free_disk_space_percent = free_disk_space / total_disk_space * 100
-                mount = disk['mount']
-
-                # add separator
-                if disk_info:
-                    disk_info += ', '
-
-                if free_disk_space_percent <= float(self.config.threshold_free_diskspace):
-                    disk_info += f"{bcolors.FAIL}" + "{:.0f}".format(free_disk_space_percent) + "% free on " + mount + f"{bcolors.ENDC}"
-                else:
-                    disk_info += "{:.0f}".format(free_disk_space_percent) + "% free on " + mount
+        for disk in server.disks:
+            # add separator
+            if disk_info:
+                disk_info += ', '
 
-        if (self.format == 'csv'):
-            print(f"{id};{name};{ip_address};{status};{os};{cpu_usage_percent};{mem_usage_percent};{disk_usage_percent};{disk_info};{tags}")
-        else:
-            self.table.add_row([id, name, ip_address, status, os, cpu_usage_percent_text, mem_usage_percent_text, disk_usage_percent_text, disk_info, tags])
+            if disk.free_percent <= self.thresholds.free_diskspace:
+                disk_info += f"{bcolors.FAIL}" + "{:.0f}".format(disk.free_percent) + "% free on " + disk.mount + f"{bcolors.ENDC}"
+            else:
+                disk_info += "{:.0f}".format(disk.free_percent) + "% free on " + disk.mount
+
+        # rows are sorted by the numbers instead of the formatted texts, disk info by the lowest free disk space
+        free = min((disk.free_percent for disk in server.disks), default=None)
+        self.table.add_row([id, name, ip_address, status, os, cpu_usage_percent_text, mem_usage_percent_text, disk_usage_percent_text, disk_info, tags],
+            [id, name, ip_address, status, os, cpu_usage_percent, mem_usage_percent, disk_usage_percent, free, tags])
@@ -1,22 +1,63 @@
 #!/usr/bin/env python3
 
-import requests
 import json
-from prettytable import PrettyTable
 
 from .config import Config
+from .table import Table
+from .csvwriter import CsvWriter
+from .bulk import Bulk
+from .watch import Watch
+from .inventory import Inventory
+from .history import History, formatDuration
+from .groups import Groups
+from .columns import Thresholds, MonitorColumns, flagIssues
+from ..api import SleurenError
 from .functions import printError, printWarn
 from .bcolors import bcolors
 
+# short names of the columns added by --trend
+TREND_COLUMNS = ['uptime_trend', 'avg_ttfb', 'ttfb_trend', 'worst_ttfb']
+
+# groups of a monitor for --group-by
+GROUP_KEYS = {
+    'location': lambda monitor: [monitor.location or '(none)'],
+    'status': lambda monitor: [monitor.status_message or '(unknown)'],
+    'code': lambda monitor: [str(monitor.code) if monitor.code else '(none)'],
+}
+
 class Sites(object):
 
+    # header and value of the columns of the CSV output
+    csv_columns = [
+        ('id', lambda monitor: monitor.id),
+        ('url', lambda monitor: monitor.url),
+        ('name', lambda monitor: monitor.name),
+        ('code', lambda monitor: monitor.code),
+        ('status', lambda monitor: monitor.status),
+        ('status_message', lambda monitor: monitor.status_message),
+        ('uptime_percentage', lambda monitor: str(monitor.uptime) + '%'),
+        ('ttfb', lambda monitor: monitor.ttfb if monitor.ttfb != None else -1),
+        ('location', lambda monitor: monitor.location),
+    ]
+
     def __init__(self, config):
         self.config = config
+        self.thresholds = Thresholds(config)
         self.monitors = None
+        self.indexed = None
+        self.failed = False
         self.format = 'table'
-
-        self.table = PrettyTable()
-        self.table.field_names = ['ID', 'URL', 'Status', 'Uptime %', 'Time to first Byte', 'Location']
+        self.delimiter = ';'
+        self.quoting = 'minimal'
+        self.csv = None
+        # snapshot to query instead of downloading the monitors
+        self.source = None
+        # window in seconds of the recorded history the trend columns are computed from
+        self.trend = 0
+        self.trends = None
+
+        self.table = Table(['ID', 'URL', 'Status', 'Uptime %', 'Time to first Byte', 'Location'],
+            ['id', 'url', 'status', 'uptime', 'ttfb', 'location'])
         self.table.align['ID'] = 'l'
         self.table.align['URL'] = 'l'
         self.table.min_width['URL'] = 25
@@ -29,6 +70,36 @@ class Sites(object):
         self.sum_ttfb = 0
         self.num_monitors = 0
 
+    def showTrend(self, window: float):
+        """Add columns with the average, change and worst interval of the recorded uptime and time to first byte over the window"""
+
+        self.trend = window
+        self.table.add_column('Uptime trend', 'uptime_trend', 'r')
+        self.table.add_column('Avg TTFB', 'avg_ttfb', 'r')
+        self.table.add_column('TTFB trend', 'ttfb_trend', 'r')
+        self.table.add_column('Worst TTFB', 'worst_ttfb', 'r')
+        self.csv_columns = self.csv_columns + [
+            ('uptime_trend', lambda monitor: self.trendValue(monitor, 'uptime', 'change')),
+            ('avg_ttfb', lambda monitor: self.trendValue(monitor, 'ttfb', 'avg')),
+            ('ttfb_trend', lambda monitor: self.trendValue(monitor, 'ttfb', 'change')),
+            ('worst_ttfb', lambda monitor: self.trendValue(monitor, 'ttfb', 'worst')),
+        ]
+
+    def loadTrends(self):
+        """Compute the trends of all monitors from the recorded history"""
+
+        self.trends = History(self.config, 'sites').entities(self.trend)
+        if not self.trends:
+            printWarn('No history of the sites recorded in the last', formatDuration(self.trend) + ('.' if self.config.history_enabled else ', run "sleurencli config save --history on" to record it.'))
+
+    def trendValue(self, monitor, metric: str, value: str):
+        """Return the average, change or worst interval of a metric of the monitor, or None if it has no history"""
+
+        trends = self.trends.get(str(monitor.id)) if self.trends else None
+        result = getattr(trends[metric], value) if trends else None
+        # the history stores single precision values
+        return round(result, 4) if result != None else None
+
     def fetchData(self):
         """Retrieve the list of all website monitors"""
 
@@ -36,56 +107,183 @@ class Sites(object):
         if self.monitors != None:
             return True
 
-        # check if headers are correctly set for authorization
-        if not self.config.headers():
+        monitors = list(self.iterData())
+        if self.failed:
+            self.monitors = None
             return False
 
-        if self.config.debug:
-            print('GET', self.config.endpoint + 'monitors?', self.config.params())
+        self.monitors = monitors
+        return True
 
-        # Make request to API endpoint
-        response = requests.get(self.config.endpoint + 'monitors', params=self.config.params(), headers=self.config.headers())
+    def iterData(self):
+        """Yield the website monitors page by page as they are downloaded"""
 
-        # Check status code of response
-        if response.status_code == 200:
-            # Get list of servers from response
-            self.monitors = response.json()['monitors']
-            return True
-        else:
-            printError('An error occurred:', response.status_code)
-            self.monitors = None
-            return False
+        self.failed = False
+
+        # if data is already downloaded, use cached data
+        if self.monitors != None:
+            yield from self.monitors
+            return
+
+        # check if headers are correctly set for authorization
+        if not self.config.headers():
+            self.failed = True
+            return
+
+        # keep the complete API data only if it is printed as JSON
+        keep = (self.format == 'json')
+
+        # the download updates the completion index and the history as well
+        try:
+            yield from self.config.api().monitors(keep=keep)
+        except SleurenError as e:
+            printError(e)
+            self.failed = True
 
     def list(self, id: str = '', url: str = '', name: str = '', location: str = '', pattern: str = '', issuesOnly: bool = False, sort: str = '', reverse: bool = False, limit: int = 0):
         """Iterate through list of web monitors and print details"""
 
-        if self.fetchData():
+        if self.source != None:
+            self.listSnapshot(id, url, name, location, pattern, issuesOnly, sort, reverse, limit)
+            return
+
+        # if JSON was requested and no filters, then just print it without iterating through
+        if (self.format == 'json' and not (id or url or name or location or pattern or issuesOnly or limit > 0)):
+            if self.fetchData():
+                print(json.dumps([monitor.data for monitor in self.monitors], indent=4))
+            return
+
+        # check if headers are correctly set for authorization
+        if not self.config.headers():
+            return
+
+        if self.trend:
+            self.loadTrends()
+
+        self.printHeader()
+
+        self.sum_uptime = 0
+        self.sum_ttfb = 0
+        self.num_monitors = 0
+
+        # selectors are resolved through the indexes of the complete inventory, otherwise rows are printed as they arrive
+        if (id or url or name or location or pattern):
+            monitors = self.select(id, url, name, location, pattern) if self.fetchData() else []
+        else:
+            monitors = self.iterData()
+
+        if issuesOnly:
+            monitors = self.withIssues(monitors)
+
+        for monitor in monitors:
+            self.print(monitor)
+
+        if (self.format == 'csv'):
+            self.csv.close()
+
+        if not self.failed:
+            self.printFooter(sort=sort, reverse=reverse, limit=limit)
+
+    def listGroups(self, group_by: str, id: str = '', url: str = '', name: str = '', location: str = '', pattern: str = '', issuesOnly: bool = False, sort: str = '', reverse: bool = False, limit: int = 0):
+        """Print one row per location, status or response code with the number of monitors and issues, the averages and worst values, aggregated in one pass"""
 
-            # if JSON was requested and no filters, then just print it without iterating through
-            if (self.format == 'json' and not (id or url or name or location or pattern or issuesOnly or limit > 0)):
-                print(json.dumps(self.monitors, indent=4))
+        if self.source != None:
+            monitors = self.source.monitors(id, url, name, location, pattern, issuesOnly)
+        else:
+            # check if headers are correctly set for authorization
+            if not self.config.headers():
                 return
 
-            self.printHeader()
-
-            self.sum_uptime = 0
-            self.sum_ttfb = 0
-            self.num_monitors = 0
-
-            for monitor in self.monitors:
-                if (id or url or name or location or pattern):
-                    if (id and monitor['id'] == id) \
-                        or (url and monitor['url'] == url) \
-                        or (name and 'name' in monitor and monitor['name'] == name) \
-                        or (location and location in monitor['monitor']['name']) \
-                        or (pattern and pattern in monitor['url']):
-                        if (not issuesOnly) or self.hasIssue(monitor):
-                            self.print(monitor)
-                else:
-                    if (not issuesOnly) or self.hasIssue(monitor):
-                        self.print(monitor)
+            if (id or url or name or location or pattern):
+                monitors = self.select(id, url, name, location, pattern) if self.fetchData() else []
+            else:
+                monitors = self.iterData()
+
+        # like in the list, the average uptime only includes monitors that have been checked
+        groups = Groups(GROUP_KEYS[group_by], {
+            'uptime': lambda monitor: monitor.uptime if monitor.ttfb != None else None,
+            'ttfb': lambda monitor: monitor.ttfb,
+        })
+
+        # thresholds are evaluated for a batch of monitors at once, like for --issues
+        for monitor, issue in flagIssues(monitors, lambda: MonitorColumns(self.thresholds)):
+            if issue or not issuesOnly:
+                groups.add(monitor, issue)
+
+        if self.failed:
+            return
+
+        t = self.thresholds
+        groups.print([
+            (group_by.capitalize(), group_by, lambda group: group.name, '{}', None),
+            ('Sites', 'count', lambda group: group.count, '{}', None),
+            ('Issues', 'issues', lambda group: group.issues, '{}', lambda value: value > 0),
+            ('Avg Uptime %', 'avg_uptime', lambda group: group.columns['uptime'].avg, '{:.4f}', lambda value: value <= t.uptime),
+            ('Min Uptime %', 'min_uptime', lambda group: group.columns['uptime'].min, '{:.4f}', lambda value: value <= t.uptime),
+            ('Avg TTFB', 'avg_ttfb', lambda group: group.columns['ttfb'].avg, '{:.2f}', lambda value: value >= t.ttfb),
+            ('Max TTFB', 'max_ttfb', lambda group: group.columns['ttfb'].max, '{:.2f}', lambda value: value >= t.ttfb),
+        ], self.format, sort, reverse, limit, self.delimiter, self.quoting)
+
+    def listSnapshot(self, id: str = '', url: str = '', name: str = '', location: str = '', pattern: str = '', issuesOnly: bool = False, sort: str = '', reverse: bool = False, limit: int = 0):
+        """Print the monitors of a snapshot, filtered, sorted and limited by the database"""
+
+        order = self.table.sortColumns(sort, reverse, ['ID'] if self.config.hide_ids else []) if sort else []
+        if order == None:
+            return
+
+        # trends are not stored in the snapshot, sorting by them is left to the table
+        if any(name in TREND_COLUMNS for name, descending in order):
+            monitors = self.source.monitors(id, url, name, location, pattern, issuesOnly, keep=(self.format == 'json'))
+        else:
+            monitors = self.source.monitors(id, url, name, location, pattern, issuesOnly, order=order, limit=limit, keep=(self.format == 'json'))
+            order = []
+
+        if (self.format == 'json' and not (id or url or name or location or pattern or issuesOnly or limit > 0)):
+            print(json.dumps([monitor.data for monitor in monitors], indent=4))
+            return
+
+        if self.trend:
+            self.loadTrends()
+
+        self.printHeader()
 
+        for monitor in monitors:
+            self.print(monitor)
+
+        if (self.format == 'csv'):
+            self.csv.close()
+
+        # the average row covers all matching monitors, not only the printed ones
+        self.num_monitors, self.sum_uptime, self.sum_ttfb = self.source.monitorTotals(id, url, name, location, pattern, issuesOnly)
+        if order:
             self.printFooter(sort=sort, reverse=reverse, limit=limit)
+        else:
+            self.printFooter()
+
+    def watch(self, interval: float, id: str = '', url: str = '', name: str = '', location: str = '', pattern: str = '', issuesOnly: bool = False, sort: str = '', reverse: bool = False, limit: int = 0):
+        """Print the list of sites and then only the sites whose status, uptime or time to first byte changed every interval seconds"""
+
+        def refresh():
+            self.monitors = None
+            if self.fetchData():
+                return self.snapshot(id, url, name, location, pattern)
+
+        def show():
+            self.list(id=id, url=url, name=name, location=location, pattern=pattern, issuesOnly=issuesOnly, sort=sort, reverse=reverse, limit=limit)
+
+        Watch(self.config, interval).run(refresh, show, issuesOnly)
+
+    def snapshot(self, id: str = '', url: str = '', name: str = '', location: str = '', pattern: str = ''):
+        """Return the watched values of all monitors matching the given filters"""
+
+        rows = {}
+        for monitor in (self.select(id, url, name, location, pattern) if (id or url or name or location or pattern) else self.monitors):
+            rows[monitor.id] = (monitor.url, {
+                'status': monitor.status_message,
+                'uptime': "{:.4f}".format(monitor.uptime),
+                'ttfb': "{:.2f}".format(monitor.ttfb) if monitor.ttfb != None else 'n/a',
+            }, self.hasIssue(monitor))
+        return rows
 
     def add(self, url: str, protocol: str = 'https', name: str = '', force: bool = False):
         """Add a monitor for the given URL"""
@@ -104,100 +302,163 @@ class Sites(object):
                 protocol = 'https'
 
             # check if monitored url already exists unless --force is specified
-            if not force:
-                for monitor in self.monitors:
-                    if monitor['url'] == url:
-                        print(url, 'already exists and will not be added')
-                        return
-
-            # other parameters:
-            #   port: int (e.g. 443, 80)
-            #   keyword: string that needs to be in the http response body (e.g. "error")
-            #   redirects: int (e.g. 3 max redirects; 0 for no redirects)
-            #   timeout: int (e.g. 30 seconds)
-
-            # Make request to API endpoint
-            data = {
-                'url': url,
-                'name': name,
-                'protocol': protocol
-            }
-
-            if self.config.debug:
-                print('POST', self.config.endpoint + 'monitors?', data)
-
-            if self.config.readonly:
+            if not force and self.inventory().find('url', url):
+                print(url, 'already exists and will not be added')
+                return
+
+            try:
+                if not self.config.api().addSite(url, name, protocol):
+                    return False
+            except SleurenError as e:
+                printError(e)
                 return False
 
-            response = requests.post(self.config.endpoint + 'monitors',  data=json.dumps(data), headers=self.config.headers())
+            print('Added site monitor:', url)
+            return True
+
+        else:
+            return False
+
+    def addMany(self, urls, protocol: str = 'https', force: bool = False, report: str = ''):
+        """Add monitors for all given URLs at the same time and print a summary"""
+
+        if not self.fetchData():
+            return False
+
+        # use https as protocol if not specified otherwise
+        if not protocol:
+            protocol = 'https'
 
-            # Check status code of response
-            if response.status_code == 200:
-                print('Added site monitor:', url)
-                return True
+        bulk = Bulk(self.config, 'Adding sites')
+
+        # check against a set of known urls instead of scanning all monitors for every url
+        known = set() if force else set(self.inventory().index('url'))
+        submit = []
+        for url in urls:
+            # urls do not include the protocol
+            url = url.strip().replace('https://', '').replace('http://', '')
+            if not url:
+                continue
+
+            if url in known:
+                bulk.add({'url': url}, 'skipped', 'already exists')
             else:
-                printError('Failed to add site monitor', url, 'with response code:', response.status_code)
-                return False
+                known.add(url)
+                submit.append({'url': url})
 
-        else:
+        def add(item):
+            try:
+                if not self.config.api().addSite(item['url'], item['url'], protocol):
+                    return ('skipped', 'readonly')
+            except SleurenError as e:
+                return ('failed', 'response code ' + str(e.status) if e.status != None else str(e))
+            return ('added', '')
+
+        bulk.run(submit, add)
+
+        bulk.printSummary()
+        if report:
+            bulk.writeReport(report)
+
+        return 'failed' not in bulk.counts
+
+    def remove(self, id: str = '', url: str = '', name: str = '', location: str = '', pattern: str = '', dryRun: bool = False, report: str = ''):
+        """Remove all monitors matching the given id, url, name, location or pattern"""
+
+        if not (id or url or name or location or pattern) or not self.fetchData():
             return False
 
-    def remove(self, id: str = '', url: str = '', name: str = '', location: str = '', pattern: str = ''):
-        """Remove the monitor for the given URL"""
-
-        removed = 0
-        if (id or url or name or location or pattern) and self.fetchData():
-            for monitor in self.monitors:
-                curr_id = monitor['id']
-                curr_url = monitor['url']
-                curr_name = monitor['name'] if 'name' in monitor else ''
-                curr_location = monitor['monitor']['name']
-
-                if (id == curr_id) \
-                    or (url and url == curr_url) \
-                    or (name and name == curr_name) \
-                    or (location and location in curr_location) \
-                    or (pattern and pattern in curr_url):
-                    removed += 1
-
-                    if self.config.debug:
-                        print('DELETE', self.config.endpoint + 'monitor/' + curr_id)
-
-                    if self.config.readonly:
-                        return False
-
-                    # Make request to API endpoint
-                    response = requests.delete(self.config.endpoint + 'monitor/' + curr_id, headers=self.config.headers())
-
-                    # Check status code of response
-                    if response.status_code == 204:
-                        print('Removed site monitor:', curr_url, '[', curr_id, ']')
-                        return True
-                    else:
-                        printError('Failed to remove site monitor', curr_url, '[', curr_id, '] with response code:', response.status_code)
-                        return False
-
-        if removed == 0:
+        # build the complete set of matching monitors from one download
+        matches = self.select(id, url, name, location, pattern)
+
+        if len(matches) == 0:
             printWarn('No monitors with given pattern found: id=' + id, 'url=', url, 'name=' + name, 'location=' + location, 'pattern=' + pattern)
+            return False
+
+        if dryRun:
+            print(len(matches), 'site monitors would be removed:')
+            for monitor in matches:
+                print(monitor.url, '[', monitor.id, ']', monitor.location)
+            return True
+
+        bulk = Bulk(self.config, 'Removing sites')
+
+        def remove(item):
+            try:
+                if not self.config.api().removeSite(item['id']):
+                    return ('skipped', 'readonly')
+            except SleurenError as e:
+                return ('failed', 'response code ' + str(e.status) if e.status != None else str(e))
+            return ('removed', '')
+
+        bulk.run([{'id': monitor.id, 'url': monitor.url} for monitor in matches], remove)
+
+        for item in bulk.items:
+            if item['result'] == 'removed':
+                print('Removed site monitor:', item['url'], '[', item['id'], ']')
+            elif item['result'] == 'failed':
+                printError('Failed to remove site monitor', item['url'], '[', item['id'], '] with', item['detail'])
+
+        bulk.printSummary()
+        if report:
+            bulk.writeReport(report)
+
+        return 'failed' not in bulk.counts
+
+    def inventory(self):
+        """Return the indexes over the downloaded monitors, building them once per download"""
+
+        if self.indexed == None or self.indexed.items is not self.monitors:
+            self.indexed = Inventory(self.monitors)
+            self.indexed.define('id', lambda monitor: monitor.id)
+            self.indexed.define('url', lambda monitor: monitor.url)
+            self.indexed.define('name', lambda monitor: monitor.name)
+            self.indexed.define('location', lambda monitor: monitor.location, 'substring')
+            self.indexed.define('pattern', lambda monitor: monitor.url, 'substring')
+        return self.indexed
+
+    def select(self, id: str = '', url: str = '', name: str = '', location: str = '', pattern: str = ''):
+        """Return all downloaded monitors matching any of the given id, url, name, location or pattern"""
+
+        inventory = self.inventory()
+        positions = set()
+        if id:
+            positions |= inventory.find('id', id)
+        if url:
+            positions |= inventory.find('url', url)
+        if name:
+            positions |= inventory.find('name', name)
+        if location:
+            positions |= inventory.find('location', location)
+        if pattern:
+            positions |= inventory.find('pattern', pattern)
+        return inventory.get(positions)
 
     def hasIssue(self, monitor):
         """Return True if the specified monitor has some issue by having a value outside of the expected threshold specified in config file"""
 
-        if float(monitor['uptime_percentage']) <= float(self.config.threshold_uptime):
+        if monitor.uptime <= self.thresholds.uptime:
             return True
 
-        if 'last_check' in monitor and 'ttfb' in monitor['last_check']:
-            if float(monitor['last_check']['ttfb']) >= float(self.config.threshold_ttfb):
-                return True
+        if monitor.ttfb != None and monitor.ttfb >= self.thresholds.ttfb:
+            return True
 
         return False
 
+    def withIssues(self, monitors):
+        """Yield only the monitors with issues, evaluating the thresholds for a batch of monitors at once"""
+
+        for monitor, issue in flagIssues(monitors, lambda: MonitorColumns(self.thresholds)):
+            if issue:
+                yield monitor
+
     def printHeader(self):
         """Print CSV header if CSV format requested"""
         if (self.format == 'csv'):
-            print('id;url;name;code;status;status_message;uptime_percentage;ttfb;location')
+            self.csv = CsvWriter(self.csv_columns, delimiter=self.delimiter, quoting=self.quoting)
+            self.csv.writeHeader()
 
-    def printFooter(self, sort: str = '', reverse: bool = False, limit: int = 0, delimiter: str = ';'):
+    def printFooter(self, sort: str = '', reverse: bool = False, limit: int = 0):
         """Print table if table format requested"""
 
         if (self.format == 'table'):
@@ -205,73 +466,39 @@ class Sites(object):
             avg_uptime = self.sum_uptime / self.num_monitors if self.sum_uptime > 0 and self.num_monitors > 0 else 0
             avg_ttfb = self.sum_ttfb / self.num_monitors if self.sum_ttfb > 0 and self.num_monitors > 0 else 0
 
-            if avg_uptime <= float(self.config.threshold_uptime):
+            if avg_uptime <= self.thresholds.uptime:
                 uptime_percentage_text = f"{bcolors.FAIL}" + "{:.4f}".format(avg_uptime) + f"{bcolors.ENDC}"
             else:
                 uptime_percentage_text = "{:.4f}".format(avg_uptime)
 
-            if avg_ttfb >= float(self.config.threshold_ttfb):
+            if avg_ttfb >= self.thresholds.ttfb:
                 ttfb_text = f"{bcolors.FAIL}" + "{:.2f}".format(avg_ttfb) + f"{bcolors.ENDC}"
             else:
                 ttfb_text = "{:.2f}".format(avg_ttfb)
 
-            # add average row as table footer
-            self.table.add_row(['', 'Average of ' + str(self.num_monitors) + ' monitors', '', uptime_percentage_text, ttfb_text, ''])
+            # the average row is printed as table footer below the sorted and limited rows
+            footer = ['', 'Average of ' + str(self.num_monitors) + ' monitors', '', uptime_percentage_text, ttfb_text, ''] + [''] * (len(TREND_COLUMNS) if self.trend else 0)
 
             # remove columns that should be excluded
-            if self.config.hide_ids:
-                self.table.del_column('ID')
-
-            # Get string to be printed and create list of elements separated by \n
-            list_of_table_lines = self.table.get_string().split('\n')
-
-            # remember summary row
-            summary_line = list_of_table_lines[-2]
-
-            # remove summary row again to allow sorting and limiting
-            self.table.del_row(len(self.table.rows)-1)
+            hide = ['ID'] if self.config.hide_ids else []
 
-            if sort:
-                # if sort contains the column index instead of the column name, get the column name instead
-                if sort.isdecimal():
-                    sort = self.table.get_csv_string().split(',')[int(sort) - 1]
-            else:
-                sort = None
-
-            if limit > 0:
-                list_of_table_lines = self.table.get_string(sortby=sort, reversesort=reverse, start=0, end=limit).split('\n')
-            else:
-                list_of_table_lines = self.table.get_string(sortby=sort, reversesort=reverse).split('\n')
-
-            # Sorting by multiple columns could be done like this
-            # list_of_table_lines = self.table.get_string(sortby=("Col Name 1", "Col Name 2")), reversesort=reverse).split('\n')
-
-            # Print the table
-            print('\n'.join(list_of_table_lines))
-            print(summary_line)
-            print(list_of_table_lines[0])
-
-        # elif (self.format == 'csv'):
-        #    print(self.table.get_csv_string(delimiter=delimiter))
+            self.table.print(sort=sort, reverse=reverse, limit=limit, footer=footer, hide=hide)
 
     def print(self, monitor):
         """Print the data of the specified web monitor"""
 
         if (self.format == 'json'):
-            print(json.dumps(monitor, indent=4))
+            print(json.dumps(monitor.data, indent=4))
             return
 
-        id = monitor['id']
-        url = monitor['url']
-        name = monitor['name'] if 'name' in monitor else ''
-        code = monitor['code'] if 'code' in monitor else ''
-        status = monitor['status'] if 'status' in monitor else ''
-        status_message = monitor['status_message'] if 'status_message' in monitor else ''
-        location = monitor['monitor']['name']
-        uptime_percentage = float(monitor['uptime_percentage'])
-
-        if 'last_check' in monitor and 'ttfb' in monitor['last_check']:
-            ttfb = float(monitor['last_check']['ttfb'])
+        id = monitor.id
+        url = monitor.url
+        status_message = monitor.status_message
+        location = monitor.location
+        uptime_percentage = monitor.uptime
+
+        if monitor.ttfb != None:
+            ttfb = monitor.ttfb
             self.sum_uptime = self.sum_uptime + uptime_percentage
             self.sum_ttfb = self.sum_ttfb + ttfb
             self.num_monitors = self.num_monitors + 1
@@ -279,19 +506,44 @@ class Sites(object):
             ttfb = -1
 
         if (self.format == 'csv'):
-            #self.table.add_row([id, url, status_message, uptime_percentage, ttfb, location])
-            print(f"{id};{url};{name};{code};{status};{status_message};{uptime_percentage}%;{ttfb};{location}")
+            self.csv.write(monitor)
         else:
-            if uptime_percentage <= float(self.config.threshold_uptime):
+            if uptime_percentage <= self.thresholds.uptime:
                 uptime_percentage_text = f"{bcolors.FAIL}" + "{:.4f}".format(uptime_percentage) + f"{bcolors.ENDC}"
             else:
                 uptime_percentage_text = "{:.4f}".format(uptime_percentage)
 
-            if ttfb >= float(self.config.threshold_ttfb):
+            if ttfb >= self.thresholds.ttfb:
                 ttfb_text = f"{bcolors.FAIL}" + "{:.2f}".format(ttfb) + f"{bcolors.ENDC}"
             elif ttfb != -1:
                 ttfb_text = "{:.2f}".format(ttfb)
             else:
                 ttfb_text = f"{bcolors.FAIL}n/a{bcolors.ENDC}"
 
-            self.table.add_row([id, url, status_message, uptime_percentage_text, ttfb_text, location])
+            row = [id, url, status_message, uptime_percentage_text, ttfb_text, location]
+            keys = [id, url, status_message, uptime_percentage, monitor.ttfb, location]
+
+            if self.trend:
+                uptime_trend = self.trendValue(monitor, 'uptime', 'change')
+                avg_ttfb = self.trendValue(monitor, 'ttfb', 'avg')
+                ttfb_trend = self.trendValue(monitor, 'ttfb', 'change')
+                worst_ttfb = self.trendValue(monitor, 'ttfb', 'worst')
+                row += [
+                    "{:+.4f}".format(uptime_trend) if uptime_trend != None else 'n/a',
+                    self.thresholdText(avg_ttfb, "{:.2f}"),
+                    "{:+.2f}".format(ttfb_trend) if ttfb_trend != None else 'n/a',
+                    self.thresholdText(worst_ttfb, "{:.2f}"),
+                ]
+                keys += [uptime_trend, avg_ttfb, ttfb_trend, worst_ttfb]
+
+            # rows are sorted by the numbers instead of the formatted texts
+            self.table.add_row(row, keys)
+
+    def thresholdText(self, ttfb, format: str):
+        """Format a time to first byte of the history, highlighted if it exceeds the threshold"""
+
+        if ttfb == None:
+            return 'n/a'
+        if ttfb >= self.thresholds.ttfb:
+            return f"{bcolors.FAIL}" + format.format(ttfb) + f"{bcolors.ENDC}"
+        return format.format(ttfb)
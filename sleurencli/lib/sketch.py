@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+
+import math
+import json
+
+from .functions import printError, printWarn
+
+# values up to this are counted as zero, as their logarithm cannot be indexed, e.g. an idle cpu
+MIN_VALUE = 1e-9
+
+class DDSketch(object):
+    """Quantiles of a stream of values with a relative error of at most alpha, in memory bounded by max_buckets.
+    Values are counted in buckets growing by the factor gamma, so sketches with the same alpha can be merged by adding their counts"""
+
+    def __init__(self, alpha: float = 0.01, max_buckets: int = 2048):
+        self.alpha = alpha
+        self.max_buckets = max_buckets
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = {}
+        self.zero = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float, count: int = 1):
+        """Add a value, ignoring missing and NaN values"""
+
+        if value == None or value != value:
+            return
+
+        if value > MIN_VALUE:
+            index = math.ceil(math.log(value) / self.log_gamma)
+            self.buckets[index] = self.buckets.get(index, 0) + count
+            if len(self.buckets) > self.max_buckets:
+                self.collapse()
+        else:
+            self.zero += count
+
+        self.count += count
+        self.sum += value * count
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def collapse(self):
+        """Merge the lowest buckets until the limit is kept, which only loses accuracy of the lowest quantiles"""
+
+        indexes = sorted(self.buckets)
+        excess = len(indexes) - self.max_buckets
+        if excess > 0:
+            target = indexes[excess]
+            for index in indexes[:excess]:
+                self.buckets[target] += self.buckets.pop(index)
+
+    def merge(self, other):
+        """Add the counts of another sketch with the same relative accuracy"""
+
+        if other.gamma != self.gamma:
+            raise ValueError('cannot merge sketches with relative accuracy ' + str(self.alpha) + ' and ' + str(other.alpha))
+
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        if len(self.buckets) > self.max_buckets:
+            self.collapse()
+
+        self.zero += other.zero
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float):
+        """Return the estimated value at quantile q between 0 and 1, or None if the sketch is empty"""
+
+        if self.count == 0:
+            return None
+
+        rank = q * (self.count - 1)
+        if rank < self.zero:
+            return max(self.min, 0.0)
+
+        seen = self.zero
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                # center of the bucket, which is within alpha of every value counted in it
+                value = 2 * self.gamma ** index / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    @property
+    def avg(self):
+        return self.sum / self.count if self.count > 0 else None
+
+    def toDict(self):
+        return {
+            'alpha': self.alpha,
+            'max_buckets': self.max_buckets,
+            'buckets': {str(index): count for index, count in self.buckets.items()},
+            'zero': self.zero,
+            'count': self.count,
+            'sum': self.sum,
+            'min': self.min if self.count > 0 else None,
+            'max': self.max if self.count > 0 else None,
+        }
+
+    @staticmethod
+    def fromDict(data: dict):
+        sketch = DDSketch(data['alpha'], data['max_buckets'])
+        sketch.buckets = {int(index): count for index, count in data['buckets'].items()}
+        sketch.zero = data['zero']
+        sketch.count = data['count']
+        sketch.sum = data['sum']
+        if sketch.count > 0:
+            sketch.min = data['min']
+            sketch.max = data['max']
+        return sketch
+
+class Sketches(object):
+    """Sketches of the metrics of servers and sites, one per metric and group, e.g. per location of the sites"""
+
+    def __init__(self, group_by: str = ''):
+        self.group_by = group_by
+        # (resource, group, metric) -> sketch
+        self.sketches = {}
+
+    def add(self, resource: str, groups, metric: str, value):
+        for group in groups:
+            key = (resource, group, metric)
+            sketch = self.sketches.get(key)
+            if sketch == None:
+                sketch = self.sketches[key] = DDSketch()
+            sketch.add(value)
+
+    def addServer(self, server):
+        """Add the usage of a server to the group of each of its tags if grouped by tag"""
+
+        groups = (server.tags or ['(untagged)']) if self.group_by == 'tag' else ['(all)']
+        self.add('servers', groups, 'cpu', server.cpu)
+        self.add('servers', groups, 'mem', server.mem)
+        self.add('servers', groups, 'disk', server.disk)
+
+    def addMonitor(self, monitor):
+        """Add downtime and time to first byte of a monitor to the group of its location if grouped by location"""
+
+        groups = [monitor.location or '(none)'] if self.group_by == 'location' else ['(all)']
+        # like the averages, only monitors that have been checked are counted
+        if monitor.ttfb != None:
+            # uptimes are all close to 100%, the relative accuracy is only meaningful for the downtime
+            self.add('sites', groups, 'downtime', 100 - monitor.uptime)
+            self.add('sites', groups, 'ttfb', monitor.ttfb)
+
+    def merge(self, other):
+        for key, sketch in other.sketches.items():
+            if key in self.sketches:
+                self.sketches[key].merge(sketch)
+            else:
+                self.sketches[key] = sketch
+
+    def save(self, filename: str):
+        """Save all sketches in JSON format"""
+
+        data = {
+            'group_by': self.group_by,
+            'sketches': [{'resource': resource, 'group': group, 'metric': metric, 'sketch': sketch.toDict()}
+                for (resource, group, metric), sketch in sorted(self.sketches.items())],
+        }
+        with open(filename, 'w') as file:
+            json.dump(data, file)
+        print('Saved sketches to', filename)
+
+    def load(self, filename: str):
+        """Merge the sketches saved to a file, e.g. by another run or for another account. Return False if it cannot be read"""
+
+        try:
+            with open(filename) as file:
+                data = json.load(file)
+            other = Sketches(data['group_by'])
+            for item in data['sketches']:
+                other.sketches[(item['resource'], item['group'], item['metric'])] = DDSketch.fromDict(item['sketch'])
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            printError('ERROR: Cannot read sketches from', filename + ':', e)
+            return False
+
+        if other.group_by != self.group_by:
+            printWarn('Sketches in', filename, 'are grouped by', other.group_by or 'nothing', 'instead of', self.group_by or 'nothing')
+
+        try:
+            self.merge(other)
+        except ValueError as e:
+            printError('ERROR: Cannot merge sketches from', filename + ':', e)
+            return False
+        return True
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import time
+import sqlite3
+from urllib.request import pathname2url
+
+from .servers import Servers
+from .sites import Sites
+from .tokens import Tokens
+from .records import Server, Monitor
+from .columns import Thresholds, Aggregate, batches
+from .functions import printError
+
+TABLES = '''
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE servers (id TEXT, name TEXT, ip TEXT, status TEXT, os TEXT, cpu REAL, mem REAL, disk REAL, free REAL, tags TEXT, data TEXT);
+CREATE TABLE server_tags (server_id TEXT, tag TEXT);
+CREATE TABLE monitors (id TEXT, url TEXT, name TEXT, code TEXT, status TEXT, status_message TEXT, location TEXT, uptime REAL, ttfb REAL, data TEXT);
+CREATE TABLE tokens (token TEXT, data TEXT);
+'''
+
+# indexes are created after all rows are inserted, which is faster than updating them for every row
+INDEXES = '''
+CREATE INDEX servers_id ON servers (id);
+CREATE INDEX servers_name ON servers (name);
+CREATE INDEX servers_status ON servers (status);
+CREATE INDEX server_tags_tag ON server_tags (tag, server_id);
+CREATE INDEX monitors_id ON monitors (id);
+CREATE INDEX monitors_url ON monitors (url);
+CREATE INDEX monitors_name ON monitors (name);
+CREATE INDEX monitors_location ON monitors (location);
+CREATE INDEX monitors_status ON monitors (status);
+'''
+
+# table columns of the sort names of the server and site tables, if they differ
+SERVER_COLUMNS = {}
+MONITOR_COLUMNS = {'status': 'status_message'}
+
+def orderBy(order, columns: dict):
+    """Return the ORDER BY clause for a list of (sort name, descending). Missing values are sorted last and ties keep the download order"""
+
+    terms = []
+    for name, descending in order or []:
+        column = columns.get(name, name)
+        terms.append(column + ' IS NULL, ' + column + (' DESC' if descending else ''))
+    return ' ORDER BY ' + ', '.join(terms + ['rowid'])
+
+def aggregate(count, total, minimum, maximum):
+    return Aggregate(count, total, minimum, maximum) if count > 0 else Aggregate()
+
+class Snapshot(object):
+    """Servers, monitors and tokens saved in a SQLite database, queried offline with filters, sorting and limits done by SQL"""
+
+    def __init__(self, config, filename: str):
+        self.config = config
+        self.filename = filename
+        self.thresholds = Thresholds(config)
+        self.db = None
+
+    def open(self):
+        """Open the database read-only"""
+
+        if not os.path.isfile(self.filename):
+            printError('ERROR: Snapshot', self.filename, 'not found. Please run "sleurencli snapshot ' + self.filename + '" to create it.')
+            return False
+
+        self.db = sqlite3.connect('file:' + pathname2url(os.path.abspath(self.filename)) + '?mode=ro', uri=True)
+        return True
+
+    def create(self):
+        """Download all servers, monitors and tokens and save them to the database file, replacing it only if all downloads succeeded"""
+
+        # check if headers are correctly set for authorization
+        if not self.config.headers():
+            return False
+
+        temp = self.filename + '.tmp'
+        if os.path.exists(temp):
+            os.remove(temp)
+
+        db = sqlite3.connect(temp)
+        try:
+            counts = self.write(db)
+        finally:
+            db.close()
+
+        if counts == None:
+            os.remove(temp)
+            return False
+
+        os.replace(temp, self.filename)
+        print('Saved snapshot of', counts[0], 'servers,', counts[1], 'monitors and', counts[2], 'tokens to', self.filename)
+        return True
+
+    def write(self, db):
+        """Download and insert all servers, monitors and tokens. Return their numbers, or None if a download failed"""
+
+        # the file is only moved into place when it is complete, so it needs no journal
+        db.execute('PRAGMA journal_mode = OFF')
+        db.execute('PRAGMA synchronous = OFF')
+        db.executescript(TABLES)
+
+        servers = Servers(self.config)
+        servers.format = 'json'
+        num_servers = self.insertServers(db, servers.iterData())
+        if servers.failed:
+            printError('ERROR: Failed to download servers, snapshot not saved')
+            return None
+
+        sites = Sites(self.config)
+        sites.format = 'json'
+        num_monitors = self.insertMonitors(db, sites.iterData())
+        if sites.failed:
+            printError('ERROR: Failed to download monitors, snapshot not saved')
+            return None
+
+        tokens = Tokens(self.config)
+        if not tokens.fetchData():
+            printError('ERROR: Failed to download tokens, snapshot not saved')
+            return None
+        db.executemany('INSERT INTO tokens VALUES (?, ?)', [(token['token'], json.dumps(token)) for token in tokens.tokens])
+
+        db.executemany('INSERT INTO meta VALUES (?, ?)', [
+            ('created', time.strftime('%Y-%m-%dT%H:%M:%S%z')),
+            ('endpoint', self.config.endpoint),
+            ('version', self.config.version),
+        ])
+        db.executescript(INDEXES)
+        db.commit()
+        return (num_servers, num_monitors, len(tokens.tokens))
+
+    def insertServers(self, db, servers):
+        """Insert the servers in batches as they are downloaded and return their number"""
+
+        count = 0
+        for batch in batches(servers):
+            db.executemany('INSERT INTO servers VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', [(
+                server.id, server.name, server.ip_address, server.status, server.os, server.cpu, server.mem, server.disk,
+                min((disk.free_percent for disk in server.disks), default=None), ', '.join(server.tags), json.dumps(server.data),
+            ) for server in batch])
+            db.executemany('INSERT INTO server_tags VALUES (?, ?)', [(server.id, tag) for server in batch for tag in server.tags])
+            count += len(batch)
+        return count
+
+    def insertMonitors(self, db, monitors):
+        """Insert the monitors in batches as they are downloaded and return their number"""
+
+        count = 0
+        for batch in batches(monitors):
+            db.executemany('INSERT INTO monitors VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', [(
+                monitor.id, monitor.url, monitor.name, monitor.code, monitor.status, monitor.status_message, monitor.location,
+                monitor.uptime, monitor.ttfb, json.dumps(monitor.data),
+            ) for monitor in batch])
+            count += len(batch)
+        return count
+
+    def serverFilter(self, tags = (), issuesOnly: bool = False):
+        """Return the WHERE clause and its parameters selecting the servers having all tags, and only those with issues if requested"""
+
+        conditions = []
+        params = []
+        for tag in tags:
+            conditions.append('id IN (SELECT server_id FROM server_tags WHERE tag = ?)')
+            params.append(tag)
+        if issuesOnly:
+            conditions.append('(cpu >= ? OR mem >= ? OR disk >= ? OR free <= ?)')
+            params += [self.thresholds.cpu_usage, self.thresholds.mem_usage, self.thresholds.disk_usage, self.thresholds.free_diskspace]
+        return (' WHERE ' + ' AND '.join(conditions) if conditions else '', params)
+
+    def monitorFilter(self, id: str = '', url: str = '', name: str = '', location: str = '', pattern: str = '', issuesOnly: bool = False):
+        """Return the WHERE clause and its parameters selecting the monitors matching any of the selectors, and only those with issues if requested"""
+
+        selectors = []
+        params = []
+        for condition, value in (('id = ?', id), ('url = ?', url), ('name = ?', name), ('instr(location, ?) > 0', location), ('instr(url, ?) > 0', pattern)):
+            if value:
+                selectors.append(condition)
+                params.append(value)
+
+        conditions = ['(' + ' OR '.join(selectors) + ')'] if selectors else []
+        if issuesOnly:
+            conditions.append('(uptime <= ? OR ttfb >= ?)')
+            params += [self.thresholds.uptime, self.thresholds.ttfb]
+        return (' WHERE ' + ' AND '.join(conditions) if conditions else '', params)
+
+    def servers(self, tags = (), issuesOnly: bool = False, order = None, limit: int = 0, keep: bool = False):
+        """Return the servers matching the filters, sorted by the list of (sort name, descending) and limited. Only the returned rows are decoded"""
+
+        where, params = self.serverFilter(tags, issuesOnly)
+        query = 'SELECT data FROM servers' + where + orderBy(order, SERVER_COLUMNS)
+        if limit > 0:
+            query += ' LIMIT ?'
+            params.append(limit)
+        return [Server.fromDict(json.loads(data), keep) for (data,) in self.db.execute(query, params)]
+
+    def serverTotals(self, tags = (), issuesOnly: bool = False):
+        """Return the number and the sums of cpu, mem and disk usage of the servers matching the filters"""
+
+        where, params = self.serverFilter(tags, issuesOnly)
+        return self.db.execute('SELECT count(*), total(cpu), total(mem), total(disk) FROM servers' + where, params).fetchone()
+
+    def monitors(self, id: str = '', url: str = '', name: str = '', location: str = '', pattern: str = '', issuesOnly: bool = False, order = None, limit: int = 0, keep: bool = False):
+        """Return the monitors matching the filters, sorted by the list of (sort name, descending) and limited. Only the returned rows are decoded"""
+
+        where, params = self.monitorFilter(id, url, name, location, pattern, issuesOnly)
+        query = 'SELECT data FROM monitors' + where + orderBy(order, MONITOR_COLUMNS)
+        if limit > 0:
+            query += ' LIMIT ?'
+            params.append(limit)
+        return [Monitor.fromDict(json.loads(data), keep) for (data,) in self.db.execute(query, params)]
+
+    def monitorTotals(self, id: str = '', url: str = '', name: str = '', location: str = '', pattern: str = '', issuesOnly: bool = False):
+        """Return the number and the sums of uptime and time to first byte of the checked monitors matching the filters"""
+
+        where, params = self.monitorFilter(id, url, name, location, pattern, issuesOnly)
+        return self.db.execute('SELECT count(ttfb), total(CASE WHEN ttfb IS NOT NULL THEN uptime END), total(ttfb) FROM monitors' + where, params).fetchone()
+
+    def summarizeServers(self):
+        """Return the number of servers and issues and the aggregates of all usage columns, like ServerColumns.aggregates()"""
+
+        row = self.db.execute('''SELECT count(*),
+            count(cpu), total(cpu), min(cpu), max(cpu),
+            count(mem), total(mem), min(mem), max(mem),
+            count(disk), total(disk), min(disk), max(disk),
+            count(free), total(free), min(free), max(free) FROM servers''').fetchone()
+        where, params = self.serverFilter(issuesOnly=True)
+        issues = self.db.execute('SELECT count(*) FROM servers' + where, params).fetchone()[0]
+
+        return {
+            'count': row[0],
+            'issues': issues,
+            'cpu': aggregate(*row[1:5]),
+            'mem': aggregate(*row[5:9]),
+            'disk': aggregate(*row[9:13]),
+            'free': aggregate(*row[13:17]),
+        }
+
+    def summarizeSites(self):
+        """Return the number of monitors and issues and the aggregates of uptime and time to first byte, like MonitorColumns.aggregates()"""
+
+        # like in the sites list, the average uptime only includes monitors that have been checked
+        row = self.db.execute('''SELECT count(*),
+            count(ttfb), total(CASE WHEN ttfb IS NOT NULL THEN uptime END), min(CASE WHEN ttfb IS NOT NULL THEN uptime END), max(CASE WHEN ttfb IS NOT NULL THEN uptime END),
+            count(ttfb), total(ttfb), min(ttfb), max(ttfb) FROM monitors''').fetchone()
+        where, params = self.monitorFilter(issuesOnly=True)
+        issues = self.db.execute('SELECT count(*) FROM monitors' + where, params).fetchone()[0]
+
+        return {
+            'count': row[0],
+            'issues': issues,
+            'uptime': aggregate(*row[1:5]),
+            'ttfb': aggregate(*row[5:9]),
+        }
+
+    def countTokens(self):
+        """Return the number of tokens"""
+
+        return self.db.execute('SELECT count(*) FROM tokens').fetchone()[0]
@@ -1,102 +1,214 @@
 #!/usr/bin/env python3
 
-import requests
 import json
+import time
 from prettytable import PrettyTable
 
 from .config import Config
-from .servers import Servers
-from .sites import Sites
-from .tokens import Tokens
+from .history import History, HOUR, formatDuration, resolution
+from .sketch import Sketches
+from .columns import Thresholds
+from . import tracing
 from .functions import printError, printWarn
 from .bcolors import bcolors
+from ..api import SleurenTimeout, ServerSummary, SiteSummary
 
 class Statistics(object):
 
     def __init__(self, config):
         self.config = config
+        self.thresholds = Thresholds(config)
         self.statistics = None
+        # snapshot to summarize instead of downloading all assets
+        self.source = None
+        # window in seconds of the recorded history to summarize as well
+        self.history = 0
+        # quantile sketches of all metrics, collected if percentiles are requested
+        self.sketches = None
+        self.save_sketches = ''
+        self.merge_sketches = []
 
         self.table = PrettyTable()
         self.table.field_names = ['Value', 'Metric']
         self.table.align['Value'] = 'r'
         self.table.align['Metric'] = 'l'
 
+    def showPercentiles(self, group_by: str = ''):
+        """Collect quantile sketches of all metrics in the same pass as the averages, grouped by location of the sites or tag of the servers"""
+
+        self.sketches = Sketches(group_by)
+
+    def text(self, value, format: str, issue: bool):
+        """Format a value and highlight it if it is outside of its threshold"""
+
+        if issue:
+            return f"{bcolors.FAIL}" + format.format(value) + f"{bcolors.ENDC}"
+        return format.format(value)
+
+    def addHistory(self, resource: str, rows, window: str):
+        """Add the moving average, change and worst interval of the recorded metrics of a resource over the history window"""
+
+        trends = History(self.config, resource).fleet(self.history)
+        if trends == None:
+            self.table.add_row([f"{bcolors.FAIL}n/a{bcolors.ENDC}", 'History of ' + resource + ' over ' + window])
+            return False
+
+        interval = 'hourly' if resolution(self.history) == HOUR else 'daily'
+        time_format = '%Y-%m-%d %H:%M' if interval == 'hourly' else '%Y-%m-%d'
+        for metric, format, unit, label, issue in rows:
+            trend = trends[metric]
+            if trend.count == 0:
+                continue
+            self.table.add_row([self.text(trend.avg, format, issue(trend.avg)), unit + ' avg ' + label + ' over ' + window])
+            self.table.add_row([format.replace(':', ':+').format(trend.change), unit + ' change of avg ' + label + ' over ' + window])
+            self.table.add_row([self.text(trend.worst, format, issue(trend.worst)), unit + ' worst ' + interval + ' avg ' + label + ' over ' + window + ' at ' + time.strftime(time_format, time.localtime(trend.worst_time))])
+        return True
+
     def print(self, format: str = 'table', delimiter: str = ';'):
         """Iterate through all assets and print statistics"""
 
-        servers = Servers(self.config)
-        if servers.fetchData():
-            sum_cpu_usage = 0
-            sum_mem_usage = 0
-            sum_disk_usage = 0
-            num_servers = len(servers.servers)
-            self.table.add_row([len(servers.servers), 'Servers'])
-
-            for server in servers.servers:
-                sum_cpu_usage = sum_cpu_usage + server['summary']['cpu_usage_percent'] if 'summary' in server else 0
-                sum_mem_usage = sum_mem_usage + server['summary']['mem_usage_percent'] if 'summary' in server else 0
-                sum_disk_usage = sum_disk_usage + server['summary']['disk_usage_percent'] if 'summary' in server else 0
-
-            avg_cpu_usage = sum_cpu_usage / num_servers if sum_cpu_usage > 0 and num_servers > 0 else 0
-            avg_mem_usage = sum_mem_usage / num_servers if sum_mem_usage > 0 and num_servers > 0 else 0
-            avg_disk_usage = sum_disk_usage / num_servers if sum_disk_usage > 0 and num_servers > 0 else 0
-
-            if avg_cpu_usage >= float(self.config.threshold_cpu_usage):
-                avg_cpu_usage_text = f"{bcolors.FAIL}" + "{:.1f}".format(avg_cpu_usage) + f"{bcolors.ENDC}"
-            else:
-               avg_cpu_usage_text = "{:.1f}".format(avg_cpu_usage)
-
-            if avg_mem_usage >= float(self.config.threshold_mem_usage):
-                avg_mem_usage_text = f"{bcolors.FAIL}" + "{:.1f}".format(avg_mem_usage) + f"{bcolors.ENDC}"
-            else:
-               avg_mem_usage_text = "{:.1f}".format(avg_mem_usage)
-
-            if avg_disk_usage >= float(self.config.threshold_disk_usage):
-                avg_disk_usage_text = f"{bcolors.FAIL}" + "{:.1f}".format(avg_disk_usage) + f"{bcolors.ENDC}"
-            else:
-               avg_disk_usage_text = "{:.1f}".format(avg_disk_usage)
-
-            self.table.add_row([avg_cpu_usage_text, '% avg cpu usage of all ' + str(num_servers) + ' servers'])
-            self.table.add_row([avg_mem_usage_text, '% avg mem usage of all ' + str(num_servers) + ' servers'])
-            self.table.add_row([avg_disk_usage_text, '% avg disk usage of all ' + str(num_servers) + ' servers'])
-
-        sites = Sites(self.config)
-        if sites.fetchData():
-            sum_uptime = 0
-            sum_ttfb = 0
-            num_monitors = len(sites.monitors)
-            self.table.add_row([len(sites.monitors), 'Sites'])
-
-            for monitor in sites.monitors:
-                uptime_percentage = float(monitor['uptime_percentage'])
-
-                if 'last_check' in monitor and 'ttfb' in monitor['last_check']:
-                    ttfb = float(monitor['last_check']['ttfb'])
-                    sum_uptime = sum_uptime + uptime_percentage
-                    sum_ttfb = sum_ttfb + ttfb
-
-            avg_uptime = sum_uptime / num_monitors if sum_uptime > 0 and num_monitors > 0 else 0
-            avg_ttfb = sum_ttfb / num_monitors if sum_ttfb > 0 and num_monitors > 0 else 0
-
-            if avg_uptime <= float(self.config.threshold_uptime):
-                uptime_percentage_text = f"{bcolors.FAIL}" + "{:.4f}".format(avg_uptime) + f"{bcolors.ENDC}"
-            else:
-                uptime_percentage_text = "{:.4f}".format(avg_uptime)
-
-            if avg_ttfb >= float(self.config.threshold_ttfb):
-                ttfb_text = f"{bcolors.FAIL}" + "{:.2f}".format(avg_ttfb) + f"{bcolors.ENDC}"
-            else:
-                ttfb_text = "{:.2f}".format(avg_ttfb)
-
-            self.table.add_row([uptime_percentage_text, '% avg uptime of all ' + str(num_monitors) + ' sites'])
-            self.table.add_row([ttfb_text, 'sec avg ttfb of all ' + str(num_monitors) + ' sites'])
-
-        tokens = Tokens(self.config)
-        if tokens.fetchData():
-            self.table.add_row([len(tokens.tokens), 'Tokens'])
+        if self.source != None:
+            # a snapshot is summarized by SQL aggregates without calling the API
+            servers = self.source.summarizeServers()
+            sites = self.source.summarizeSites()
+            fetched = {
+                'servers': ServerSummary(servers) if servers != None else None,
+                'sites': SiteSummary(sites) if sites != None else None,
+                'tokens': self.source.countTokens(),
+            }
+            if self.sketches != None:
+                for server in self.source.servers():
+                    self.sketches.addServer(server)
+                for monitor in self.source.monitors():
+                    self.sketches.addMonitor(monitor)
+        else:
+            # check if headers are correctly set for authorization before starting any requests
+            if not self.config.headers():
+                return
+
+            # a download that timed out may still add to its sketches, so they are only merged if its summary arrived
+            server_sketches = Sketches(self.sketches.group_by) if self.sketches != None else None
+            monitor_sketches = Sketches(self.sketches.group_by) if self.sketches != None else None
+            statistics = self.config.api().statistics(
+                onServer=server_sketches.addServer if server_sketches != None else None,
+                onMonitor=monitor_sketches.addMonitor if monitor_sketches != None else None)
+            if statistics.servers != None and server_sketches != None:
+                self.sketches.merge(server_sketches)
+            if statistics.sites != None and monitor_sketches != None:
+                self.sketches.merge(monitor_sketches)
+            for name, error in statistics.errors.items():
+                if isinstance(error, SleurenTimeout):
+                    printWarn(str(error))
+                elif getattr(error, 'status', None) != None:
+                    printError(error)
+                else:
+                    printError('An error occurred while fetching ' + name + ':', error)
+            fetched = {
+                'servers': statistics.servers,
+                'sites': statistics.sites,
+                'tokens': statistics.tokens,
+            }
+
+        if fetched['servers'] != None:
+            summary = fetched['servers']
+            servers_text = ' of all ' + str(summary.count) + ' servers'
+            self.table.add_row([summary.count, 'Servers'])
+            self.table.add_row([self.text(summary.issues, '{}', summary.issues > 0), 'Servers with issues'])
+
+            self.table.add_row([self.text(summary.cpu.avg, '{:.1f}', summary.cpu.avg >= self.thresholds.cpu_usage), '% avg cpu usage' + servers_text])
+            self.table.add_row([self.text(summary.mem.avg, '{:.1f}', summary.mem.avg >= self.thresholds.mem_usage), '% avg mem usage' + servers_text])
+            self.table.add_row([self.text(summary.disk.avg, '{:.1f}', summary.disk.avg >= self.thresholds.disk_usage), '% avg disk usage' + servers_text])
+            self.table.add_row([self.text(summary.cpu.max, '{:.1f}', summary.cpu.max >= self.thresholds.cpu_usage), '% max cpu usage' + servers_text])
+            self.table.add_row([self.text(summary.mem.max, '{:.1f}', summary.mem.max >= self.thresholds.mem_usage), '% max mem usage' + servers_text])
+            self.table.add_row([self.text(summary.disk.max, '{:.1f}', summary.disk.max >= self.thresholds.disk_usage), '% max disk usage' + servers_text])
+            if summary.free.count > 0:
+                self.table.add_row([self.text(summary.free.min, '{:.1f}', summary.free.min <= self.thresholds.free_diskspace), '% min free disk space' + servers_text])
+        else:
+            self.table.add_row([f"{bcolors.FAIL}n/a{bcolors.ENDC}", 'Servers'])
+
+        if fetched['sites'] != None:
+            summary = fetched['sites']
+            sites_text = ' of all ' + str(summary.count) + ' sites'
+            self.table.add_row([summary.count, 'Sites'])
+            self.table.add_row([self.text(summary.issues, '{}', summary.issues > 0), 'Sites with issues'])
+
+            self.table.add_row([self.text(summary.uptime.avg, '{:.4f}', summary.uptime.avg <= self.thresholds.uptime), '% avg uptime' + sites_text])
+            self.table.add_row([self.text(summary.ttfb.avg, '{:.2f}', summary.ttfb.avg >= self.thresholds.ttfb), 'sec avg ttfb' + sites_text])
+            self.table.add_row([self.text(summary.uptime.min, '{:.4f}', summary.uptime.min <= self.thresholds.uptime), '% min uptime' + sites_text])
+            self.table.add_row([self.text(summary.ttfb.max, '{:.2f}', summary.ttfb.max >= self.thresholds.ttfb), 'sec max ttfb' + sites_text])
+        else:
+            self.table.add_row([f"{bcolors.FAIL}n/a{bcolors.ENDC}", 'Sites'])
+
+        if fetched['tokens'] != None:
+            self.table.add_row([fetched['tokens'], 'Tokens'])
+        else:
+            self.table.add_row([f"{bcolors.FAIL}n/a{bcolors.ENDC}", 'Tokens'])
+
+        if self.history:
+            window = formatDuration(self.history)
+            recorded = self.addHistory('servers', [
+                ('cpu', '{:.1f}', '%', 'cpu usage', lambda value: value >= self.thresholds.cpu_usage),
+                ('mem', '{:.1f}', '%', 'mem usage', lambda value: value >= self.thresholds.mem_usage),
+                ('disk', '{:.1f}', '%', 'disk usage', lambda value: value >= self.thresholds.disk_usage),
+            ], window)
+            recorded = self.addHistory('sites', [
+                ('uptime', '{:.4f}', '%', 'uptime', lambda value: value <= self.thresholds.uptime),
+                ('ttfb', '{:.2f}', 'sec', 'ttfb', lambda value: value >= self.thresholds.ttfb),
+            ], window) or recorded
+            if not recorded and not self.config.history_enabled:
+                printWarn('No history recorded, run "sleurencli config save --history on" to record the metrics of every fetch.')
+
+        with tracing.span('render statistics', 'render'):
+            if (format == 'table'):
+                print(self.table)
+            elif (format == 'csv'):
+                print(self.table.get_csv_string(delimiter=delimiter))
+
+        if self.sketches != None:
+            self.printPercentiles(fetched, format, delimiter)
+
+    def printPercentiles(self, fetched: dict, format: str = 'table', delimiter: str = ';'):
+        """Print p50, p90, p99 and the worst value of every metric and group, after saving the sketches of this run and merging saved ones"""
+
+        # sketches of a failed download are incomplete
+        for resource in ('servers', 'sites'):
+            if fetched[resource] == None:
+                self.sketches.sketches = {key: sketch for key, sketch in self.sketches.sketches.items() if key[0] != resource}
+
+        if self.save_sketches:
+            self.sketches.save(self.save_sketches)
+
+        for filename in self.merge_sketches:
+            self.sketches.load(filename)
+
+        # the uptime is sketched as downtime, its worst values are the highest downtimes
+        metrics = [
+            ('servers', 'cpu', '% cpu usage', '{:.1f}', lambda value: value, lambda value: value >= self.thresholds.cpu_usage),
+            ('servers', 'mem', '% mem usage', '{:.1f}', lambda value: value, lambda value: value >= self.thresholds.mem_usage),
+            ('servers', 'disk', '% disk usage', '{:.1f}', lambda value: value, lambda value: value >= self.thresholds.disk_usage),
+            ('sites', 'downtime', '% uptime (lowest)', '{:.4f}', lambda value: 100 - value, lambda value: value <= self.thresholds.uptime),
+            ('sites', 'ttfb', 'sec ttfb', '{:.2f}', lambda value: value, lambda value: value >= self.thresholds.ttfb),
+        ]
+
+        table = PrettyTable()
+        grouped = bool(self.sketches.group_by)
+        table.field_names = (['Group'] if grouped else []) + ['Metric', 'Count', 'p50', 'p90', 'p99', 'Worst']
+        for name in table.field_names:
+            table.align[name] = 'r'
+        table.align['Metric'] = 'l'
+        if grouped:
+            table.align['Group'] = 'l'
+
+        groups = sorted(set(group for resource, group, metric in self.sketches.sketches))
+        for resource, metric, label, number, value, issue in metrics:
+            for group in groups:
+                sketch = self.sketches.sketches.get((resource, group, metric))
+                if sketch == None or sketch.count == 0:
+                    continue
+                values = [value(sketch.quantile(q)) for q in (0.5, 0.9, 0.99)] + [value(sketch.max)]
+                table.add_row(([group] if grouped else []) + [label, sketch.count] + [self.text(value, number, issue(value)) for value in values])
 
         if (format == 'table'):
-            print(self.table)
+            print(table)
         elif (format == 'csv'):
-            print(self.table.get_csv_string(delimiter=delimiter))
+            print(table.get_csv_string(delimiter=delimiter))
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+
+import re
+import sys
+import heapq
+import unicodedata
+
+from . import tracing
+from .functions import printError
+
+ANSI_ESCAPE = re.compile(r'\x1b\[[0-9;]*m')
+
+def textWidth(text: str):
+    """Return the printed width of a text, ignoring color codes and counting wide characters twice"""
+
+    if '\x1b' in text:
+        text = ANSI_ESCAPE.sub('', text)
+    if text.isascii():
+        return len(text)
+
+    width = 0
+    for char in text:
+        if unicodedata.combining(char):
+            continue
+        width += 2 if unicodedata.east_asian_width(char) in ('W', 'F') else 1
+    return width
+
+class SortKey(object):
+    """Sort key comparing the typed values of a row by several columns, each ascending or descending. Missing values are sorted last"""
+
+    __slots__ = ('values', 'order')
+
+    def __init__(self, values, order):
+        self.values = values
+        self.order = order
+
+    def __lt__(self, other):
+        for index, descending in self.order:
+            a = self.values[index]
+            b = other.values[index]
+            if a == b:
+                continue
+            if a == None:
+                return False
+            if b == None:
+                return True
+            return a > b if descending else a < b
+        return False
+
+class Table(object):
+    """ASCII table in the style of PrettyTable, rendered in one pass with sorting and limiting applied before formatting"""
+
+    def __init__(self, field_names, short_names = None):
+        self.field_names = list(field_names)
+        # short names of the columns to be used with --sort, e.g. cpu instead of 'CPU Usage %'
+        self.short_names = list(short_names) if short_names != None else [name.lower() for name in self.field_names]
+        self.align = {name: 'c' for name in self.field_names}
+        self.min_width = {}
+        self.rows = []
+        self.keys = []
+
+    def add_column(self, field_name: str, short_name: str, align: str = 'c'):
+        """Add a column after the existing ones, before any rows are added"""
+
+        self.field_names.append(field_name)
+        self.short_names.append(short_name)
+        self.align[field_name] = align
+
+    def add_row(self, row, keys = None):
+        """Add a row of printed texts. Keys are the typed values the rows are sorted by, e.g. numbers instead of colored texts"""
+
+        self.rows.append([str(value) for value in row])
+        self.keys.append(keys if keys != None else self.rows[-1])
+
+    def column(self, sort: str, names):
+        """Return the index of the column given by short name, name or by its number counting from 1"""
+
+        if sort.isdecimal() and 0 < int(sort) <= len(names):
+            return self.field_names.index(names[int(sort) - 1])
+        if sort.lower() in self.short_names:
+            return self.short_names.index(sort.lower())
+        for index, name in enumerate(self.field_names):
+            if sort.lower() == name.lower():
+                return index
+
+        printError('ERROR: Unknown column', sort, '- use one of:', ', '.join(self.short_names))
+        return None
+
+    def sortOrder(self, sort: str, names, reverse: bool = False):
+        """Return the list of (column index, descending) for a comma separated list of columns, each descending if prefixed with -"""
+
+        order = []
+        for column in sort.split(','):
+            column = column.strip()
+            descending = column.startswith('-')
+            index = self.column(column[1:] if descending else column, names)
+            if index == None:
+                return None
+            order.append((index, descending != reverse))
+        return order
+
+    def sortColumns(self, sort: str, reverse: bool = False, hide = ()):
+        """Return the list of (short name, descending) of the columns to sort by, e.g. to sort in a database query"""
+
+        order = self.sortOrder(sort, [name for name in self.field_names if name not in hide], reverse)
+        if order == None:
+            return None
+        return [(self.short_names[index], descending) for index, descending in order]
+
+    def justify(self, text: str, width: int, align: str):
+        """Pad the text to the given width"""
+
+        excess = width - textWidth(text)
+        if align == 'l':
+            return text + ' ' * excess
+        elif align == 'r':
+            return ' ' * excess + text
+        elif excess % 2:
+            # same as PrettyTable: odd texts get the extra space on the right, even texts on the left
+            if textWidth(text) % 2:
+                return ' ' * (excess // 2) + text + ' ' * (excess // 2 + 1)
+            return ' ' * (excess // 2 + 1) + text + ' ' * (excess // 2)
+        return ' ' * (excess // 2) + text + ' ' * (excess // 2)
+
+    def render(self, sort: str = '', reverse: bool = False, limit: int = 0, footer = None, hide = ()):
+        """Return the lines of the table. The footer row is printed below the rows and excluded from sorting and limiting"""
+
+        names = [name for name in self.field_names if name not in hide]
+        columns = [self.field_names.index(name) for name in names]
+
+        rows = self.rows
+        if sort:
+            order = self.sortOrder(sort, names, reverse)
+            if order == None:
+                return None
+
+            # select the first rows with a heap if limited, ties keep the order in which the rows were added
+            key = lambda position: SortKey(self.keys[position], order)
+            with tracing.span('sort', 'render', rows=len(rows), limit=limit):
+                if limit > 0:
+                    positions = heapq.nsmallest(limit, range(len(rows)), key=key)
+                else:
+                    positions = sorted(range(len(rows)), key=key)
+            rows = [self.rows[position] for position in positions]
+        elif limit > 0:
+            rows = rows[:limit]
+
+        with tracing.span('format table', 'render', rows=len(rows)):
+            return self.format(names, columns, rows, footer)
+
+    def format(self, names, columns, rows, footer):
+        # compute all column widths in one pass over the rows that are printed
+        widths = [max(textWidth(name), self.min_width.get(name, 0)) for name in names]
+        for row in rows + ([footer] if footer else []):
+            for i, index in enumerate(columns):
+                width = textWidth(row[index])
+                if width > widths[i]:
+                    widths[i] = width
+
+        border = '+' + '+'.join('-' * (width + 2) for width in widths) + '+'
+        aligns = [self.align[name] for name in names]
+
+        def line(row):
+            return '| ' + ' | '.join(self.justify(row[index], widths[i], aligns[i]) for i, index in enumerate(columns)) + ' |'
+
+        lines = [border, '| ' + ' | '.join(self.justify(name, widths[i], aligns[i]) for i, name in enumerate(names)) + ' |', border]
+        lines.extend(line(row) for row in rows)
+        lines.append(border)
+        if footer:
+            lines.append(line([str(value) for value in footer]))
+            lines.append(border)
+        return lines
+
+    def print(self, sort: str = '', reverse: bool = False, limit: int = 0, footer = None, hide = ()):
+        """Render the table and write it to stdout at once"""
+
+        lines = self.render(sort=sort, reverse=reverse, limit=limit, footer=footer, hide=hide)
+        if lines != None:
+            with tracing.span('write table', 'render', lines=len(lines)):
+                sys.stdout.write('\n'.join(lines) + '\n')
+                sys.stdout.flush()
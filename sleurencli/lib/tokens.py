@@ -1,20 +1,26 @@
 #!/usr/bin/env python3
 
-import requests
 import json
-from prettytable import PrettyTable
 
 from .config import Config
+from .table import Table
+from .csvwriter import CsvWriter
 from .functions import printError, printWarn
+from ..api import SleurenError
 
 class Tokens(object):
 
+    # header and value of the columns of the CSV output
+    csv_columns = [
+        ('token', lambda token: token['token']),
+    ]
+
     def __init__(self, config):
         self.config = config
         self.tokens = None
+        self.csv = None
 
-        self.table = PrettyTable()
-        self.table.field_names = ['Token']
+        self.table = Table(['Token'])
 
     def fetchData(self):
         """Retrieve the list of all tokens"""
@@ -27,28 +33,15 @@ class Tokens(object):
         if not self.config.headers():
             return False
 
-        if self.config.debug:
-            print('GET', self.config.endpoint + 'token?', self.config.params())
-
-        # Make request to API endpoint
-        response = requests.get(self.config.endpoint + 'token', params=self.config.params(), headers=self.config.headers())
-
-        # Check status code of response
-        if response.status_code == 200:
-            # Get list of tokens from response
-            json = response.json()
-            if 'tokens' in json:
-                self.tokens = response.json()['tokens']
-                return True
-            else:
-                self.tokens = None
-                return False
-        else:
-            printError('An error occurred:', response.status_code)
+        try:
+            self.tokens = self.config.api().tokens()
+            return True
+        except SleurenError as e:
+            printError(e)
             self.tokens = None
             return False
 
-    def list(self, token: str = '', format: str = 'table', delimiter: str = ';'):
+    def list(self, token: str = '', format: str = 'table', delimiter: str = ';', quoting: str = 'minimal'):
         """Iterate through list of tokens and print details"""
 
         if self.fetchData():
@@ -59,18 +52,22 @@ class Tokens(object):
                     print(json.dumps(self.tokens, indent=4))
                     return
 
-                for token in self.tokens:
+                if (format == 'csv'):
+                    self.csv = CsvWriter(self.csv_columns, delimiter=delimiter, quoting=quoting)
+                    self.csv.writeHeader()
+
+                for item in self.tokens:
                     if token:
-                        if token['token'] == token:
-                            self.print(token)
+                        if item['token'] == token:
+                            self.print(item, format)
                             break
                     else:
-                        self.print(token)
+                        self.print(item, format)
 
             if (format == 'table'):
-                print(self.table)
-            elif (format == 'csv'):
-                print(self.table.get_csv_string(delimiter=delimiter))
+                self.table.print()
+            elif (format == 'csv' and self.csv != None):
+                self.csv.close()
 
     def token(self):
         """Print the data of first token"""
@@ -85,27 +82,22 @@ class Tokens(object):
         if not self.config.headers():
             return False
 
-        if self.config.debug:
-            print('POST', self.config.endpoint + 'token', self.config.params())
-
-        if self.config.readonly:
+        try:
+            if not self.config.api().createToken():
+                return False
+        except SleurenError as e:
+            printError(e)
             return False
 
-        response = requests.post(self.config.endpoint + 'token',  headers=self.config.headers())
-
-        # Check status code of response
-        if response.status_code == 200:
-            print('Created token')
-            return True
-        else:
-            printError('Failed to create token with response code:', response.status_code)
-            return False
+        print('Created token')
+        return True
 
     def print(self, token, format: str = 'table'):
         """Print the data of the specified token"""
 
         if (format == 'json'):
             print(json.dumps(token, indent=4))
+        elif (format == 'csv'):
+            self.csv.write(token)
         else:
-            token = token['token']
-            self.table.add_row([token])
+            self.table.add_row([token['token']])
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import time
+
+# the tracer of the running command, set by enable() only if --trace is given, so that spans cost nothing otherwise
+tracer = None
+
+class NullSpan(object):
+    """Span doing nothing, returned while tracing is disabled"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, name: str, value):
+        pass
+
+NULL_SPAN = NullSpan()
+
+class Span(object):
+    """Time of a phase of the command, recorded when the with block is left"""
+
+    __slots__ = ('tracer', 'name', 'category', 'group', 'args', 'start')
+
+    def __init__(self, tracer, name: str, category: str, group: str, args: dict):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.group = group
+        self.args = args
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.name, self.category, self.start, time.perf_counter(), self.group, self.args)
+        return False
+
+    def set(self, name: str, value):
+        """Add an argument shown with the span in the trace viewer, e.g. the status code of a response"""
+        self.args[name] = value
+
+class Tracer(object):
+    """Spans of all threads in the format of the Chrome trace viewer, with the totals per phase for the summary"""
+
+    def __init__(self):
+        import threading
+        self.threading = threading
+        self.start = time.perf_counter()
+        self.events = []
+        self.threads = {}
+        # (category, group) -> [calls, total seconds, max seconds]
+        self.totals = {}
+        self.lock = threading.Lock()
+
+    def span(self, name: str, category: str, group: str = None, **args):
+        return Span(self, name, category, group or name, args)
+
+    def record(self, name: str, category: str, start: float, end: float, group: str = None, args: dict = None, summary: bool = True):
+        """Record a span that started and ended at the given values of time.perf_counter()"""
+
+        thread = self.threading.current_thread()
+        with self.lock:
+            self.threads[thread.ident] = thread.name
+            self.events.append({
+                'name': name,
+                'cat': category,
+                'ph': 'X',
+                'ts': round((start - self.start) * 1e6, 1),
+                'dur': round((end - start) * 1e6, 1),
+                'pid': os.getpid(),
+                'tid': thread.ident,
+                'args': args or {},
+            })
+        if summary:
+            self.count(group or name, category, end - start)
+
+    def count(self, group: str, category: str, seconds: float, calls: int = 1):
+        """Add time to the summary without a span, e.g. the time waited for the chunks of a body"""
+
+        with self.lock:
+            total = self.totals.get((category, group))
+            if total == None:
+                total = self.totals[(category, group)] = [0, 0.0, 0.0]
+            total[0] += calls
+            total[1] += seconds
+            total[2] = max(total[2], seconds / calls if calls > 0 else seconds)
+
+    def stream(self, name: str, chunks, decode):
+        """Yield the items decoded from the chunks of a body, recording the time waited for the network,
+        spent decoding and spent processing the items separately, as they are interleaved when streaming"""
+
+        waited = [0.0, 0]
+        def timed():
+            while True:
+                start = time.perf_counter()
+                chunk = next(chunks, None)
+                waited[0] += time.perf_counter() - start
+                if chunk == None:
+                    return
+                waited[1] += len(chunk)
+                yield chunk
+
+        items = decode(timed())
+        start = time.perf_counter()
+        decoding = 0.0
+        processing = 0.0
+        count = 0
+        try:
+            while True:
+                resumed = time.perf_counter()
+                item = next(items, None)
+                yielded = time.perf_counter()
+                decoding += yielded - resumed
+                if item == None:
+                    break
+                count += 1
+                yield item
+                processing += time.perf_counter() - yielded
+        finally:
+            # decoding pulls the chunks, so it includes the time waited for them
+            decoding -= waited[0]
+            self.record(name, 'download', start, time.perf_counter(), args={
+                'items': count,
+                'bytes': waited[1],
+                'network_ms': round(waited[0] * 1000, 3),
+                'decode_ms': round(decoding * 1000, 3),
+                'process_ms': round(processing * 1000, 3),
+            }, summary=False)
+            self.count('read body', 'network', waited[0])
+            self.count('decode JSON', 'decode', decoding)
+            self.count('process items', 'command', processing)
+
+    def save(self, filename: str):
+        """Write the spans as JSON to open with chrome://tracing or https://ui.perfetto.dev"""
+
+        import json
+        metadata = [{'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': ident, 'args': {'name': name}} for ident, name in self.threads.items()]
+        try:
+            with open(filename, 'w') as file:
+                json.dump({'traceEvents': metadata + self.events, 'displayTimeUnit': 'ms'}, file)
+        except OSError as e:
+            from .functions import printError
+            printError('ERROR: Cannot write trace to', filename + ':', e)
+            return False
+        print('Saved trace to', filename, file=sys.stderr)
+        return True
+
+    def summary(self):
+        """Return the lines of the table of the total time per phase, longest first"""
+
+        from .table import Table
+        wall = time.perf_counter() - self.start
+        table = Table(['Phase', 'Category', 'Calls', 'Total ms', 'Max ms', '% of wall'])
+        table.align = {'Phase': 'l', 'Category': 'l', 'Calls': 'r', 'Total ms': 'r', 'Max ms': 'r', '% of wall': 'r'}
+        for (category, group), (calls, total, longest) in sorted(self.totals.items(), key=lambda item: -item[1][1]):
+            table.add_row([group, category, str(calls), '{:.1f}'.format(total * 1000), '{:.1f}'.format(longest * 1000), '{:.1f}'.format(total / wall * 100)])
+        return table.render(footer=['wall time', '', '', '{:.1f}'.format(wall * 1000), '', '100.0'])
+
+def span(name: str, category: str, group: str = None, **args):
+    """Return a span recording the time of its with block if tracing is enabled. Spans of the same group are added up in the summary"""
+
+    if tracer == None:
+        return NULL_SPAN
+    return tracer.span(name, category, group, **args)
+
+def enable():
+    """Start tracing, including the time of all modules imported from now on"""
+
+    global tracer
+    tracer = Tracer()
+    traceImports()
+    return tracer
+
+def finish(filename: str):
+    """Save the trace if a file is given and print the summary to stderr"""
+
+    if tracer == None:
+        return
+    if filename:
+        tracer.save(filename)
+    sys.stderr.write('\n'.join(tracer.summary()) + '\n')
+    sys.stderr.flush()
+
+def traceImports():
+    """Record a span for every import that loads new modules. Nested imports are shown in the trace, only the outermost in the summary"""
+
+    import builtins
+    original = builtins.__import__
+    local = tracer.threading.local()
+
+    def timedImport(name, globals=None, locals=None, fromlist=(), level=0):
+        if level == 0 and name in sys.modules and not fromlist:
+            return original(name, globals, locals, fromlist, level)
+
+        depth = getattr(local, 'depth', 0)
+        local.depth = depth + 1
+        loaded = len(sys.modules)
+        start = time.perf_counter()
+        try:
+            return original(name, globals, locals, fromlist, level)
+        finally:
+            end = time.perf_counter()
+            local.depth = depth
+            # only imports loading modules are of interest, not lookups of modules imported already
+            if len(sys.modules) > loaded:
+                module = '.' * level + name
+                tracer.record('import ' + module, 'import', start, end, 'imports', {'modules': len(sys.modules) - loaded}, summary=(depth == 0))
+
+    builtins.__import__ = timedImport
+
+def traceConnections():
+    """Record spans for name resolution, connecting and the TLS handshake of new connections, as far as urllib3 allows to hook in"""
+
+    import socket
+    import urllib3.connection
+    import urllib3.util.connection
+
+    if getattr(urllib3.util.connection.create_connection, 'traced', False):
+        return
+
+    def wrap(function, name: str, category: str):
+        def traced(*args, **kwargs):
+            with span(name, category):
+                return function(*args, **kwargs)
+        traced.traced = True
+        return traced
+
+    socket.getaddrinfo = wrap(socket.getaddrinfo, 'resolve name', 'network')
+    urllib3.util.connection.create_connection = wrap(urllib3.util.connection.create_connection, 'connect', 'network')
+    if hasattr(urllib3.connection, 'ssl_wrap_socket'):
+        urllib3.connection.ssl_wrap_socket = wrap(urllib3.connection.ssl_wrap_socket, 'TLS handshake', 'network')
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+import sys
+import time
+
+from .bcolors import bcolors
+
+class Watch(object):
+    """Poll a resource on an interval, keep the last state in memory and print only the rows that changed"""
+
+    def __init__(self, config, interval: float):
+        self.config = config
+        self.interval = float(interval)
+        self.rows = {}
+
+        # every cycle needs current data, so cached responses are always revalidated
+        self.config.max_age = 0
+
+    def run(self, refresh, show, issuesOnly: bool = False):
+        """Print the full list once, then print the changes of every following cycle until interrupted.
+        refresh returns a dict of id -> (label, dict of values, has issue) or None if the data could not be fetched"""
+
+        try:
+            rows = refresh()
+            if rows == None:
+                return
+            show()
+            self.rows = rows
+
+            while True:
+                time.sleep(self.interval)
+                rows = refresh()
+                if rows != None:
+                    self.printChanges(rows, issuesOnly)
+                    self.rows = rows
+        except KeyboardInterrupt:
+            print()
+
+    def printChanges(self, rows: dict, issuesOnly: bool):
+        """Print rows that were added, removed or changed since the last cycle"""
+
+        now = time.strftime('%H:%M:%S')
+        lines = []
+
+        for id, (label, values, issue) in rows.items():
+            if id not in self.rows:
+                if issue or not issuesOnly:
+                    lines.append(self.format(now, '+', label, id, ', '.join(name + ' ' + value for name, value in values.items()), issue, issue))
+                continue
+
+            old_label, old_values, old_issue = self.rows[id]
+            changes = [name + ' ' + old_values.get(name, '') + ' -> ' + value for name, value in values.items() if old_values.get(name) != value]
+            if not changes and issue == old_issue:
+                continue
+            if issuesOnly and not (issue or old_issue):
+                continue
+
+            if issue and not old_issue:
+                changes.append('new issue')
+            elif old_issue and not issue:
+                changes.append('issue resolved')
+            lines.append(self.format(now, '~', label, id, ', '.join(changes), issue, issue and not old_issue))
+
+        for id, (label, values, issue) in self.rows.items():
+            if id not in rows and (issue or not issuesOnly):
+                lines.append(self.format(now, '-', label, id, 'removed', False, False))
+
+        if lines:
+            sys.stdout.write('\n'.join(lines) + '\n')
+            sys.stdout.flush()
+
+    def format(self, now: str, marker: str, label: str, id: str, text: str, issue: bool, newIssue: bool):
+        """Format a single line of changes and highlight issues"""
+
+        ids = '' if self.config.hide_ids else ' [ ' + id + ' ]'
+        line = now + ' ' + marker + ' ' + label + ids + ': ' + text
+        if newIssue:
+            return f"{bcolors.FAIL}{bcolors.BOLD}" + line + f"{bcolors.ENDC}"
+        elif issue:
+            return f"{bcolors.FAIL}" + line + f"{bcolors.ENDC}"
+        return line
@@ -1,23 +1,25 @@
 #!/usr/bin/env python3
 
 import os
+import sys
 import argparse
-import json
-import webbrowser
 
+# modules of the commands, and with them requests and prettytable, are imported only when a command is called
 # suprisingly this works in PyPi, but not locally. For local usage replace ".lib." with "lib."
-from .lib.config import Config
-from .lib.servers import Servers
-from .lib.sites import Sites
-from .lib.tokens import Tokens
-from .lib.statistics import Statistics
 
 __version__ = '1.0.3'
 
-cfg = Config(__version__)
+# settings of the config file, read by load_settings() only when a command is called
+cfg = None
 cli = argparse.ArgumentParser(prog='sleurencli', description='CLI for Sleuren Monitoring')
 cli_subcommands = dict()
 
+def load_settings():
+    """Read the settings from the config file"""
+    global cfg
+    from .lib.config import Config
+    cfg = Config(__version__)
+
 def check_columns(columns):
     """Show or hide columns in ASCII table view"""
     for column in columns:
@@ -26,6 +28,51 @@ def check_columns(columns):
         elif 'id' == column.lower():
             cfg.hide_ids = False
 
+def add_cache_arguments(parser):
+    """Add the arguments controlling the response cache to a sub command"""
+    parser.add_argument('--no-cache', action='store_true', help='do not use or update the local response cache')
+    parser.add_argument('--max-age', nargs='?', default=None, type=float, metavar='sec', help='use cached data only if it is not older than the given number of seconds')
+
+def csv_delimiter(value: str):
+    """Return the delimiter given with --delimiter, a single character or \\t for a tab"""
+    if value == '\\t':
+        return '\t'
+    if len(value) != 1 or value in '"\r\n':
+        raise argparse.ArgumentTypeError('must be a single character other than a quote or line break, or \\t for a tab')
+    return value
+
+def positive_seconds(value: str):
+    """Return the seconds given with --watch, which must be more than 0"""
+    try:
+        seconds = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError('invalid number of seconds: ' + repr(value))
+    if seconds <= 0:
+        raise argparse.ArgumentTypeError('must be more than 0 seconds')
+    return seconds
+
+def add_csv_arguments(parser):
+    """Add the arguments controlling the CSV format to a sub command"""
+    parser.add_argument('--delimiter', default=';', type=csv_delimiter, metavar='char', help='field delimiter of the CSV output, \\t for a tab')
+    parser.add_argument('--quoting', choices=['minimal', 'all', 'nonnumeric', 'none'], default='minimal', help='quote all fields, only non-numeric fields, fields containing special characters (default) or none of the CSV output')
+
+def open_snapshot(path: str):
+    """Open the snapshot database given with --from-snapshot, or return None if it does not exist"""
+    from .lib.snapshot import Snapshot
+    snapshot = Snapshot(cfg, path)
+    return snapshot if snapshot.open() else None
+
+def check_settings(args):
+    """Apply arguments of the sub command that override settings of the config file"""
+    if 'no_cache' in args and args.no_cache:
+        cfg.cache_enabled = False
+    if 'max_age' in args and args.max_age != None:
+        cfg.max_age = args.max_age
+    if 'workers' in args and args.workers:
+        cfg.workers = args.workers
+    if 'rate_limit' in args and args.rate_limit != None:
+        cfg.rate_limit = args.rate_limit
+
 # --- config functions ---
 
 def config_print(args):
@@ -36,6 +83,8 @@ def config_save(args):
     """Sub command for config save"""
     if args.api_key:
         cfg.api_key = args.api_key
+    if args.history:
+        cfg.history_enabled = (args.history == 'on')
 
     cfg.saveToFile()
 
@@ -47,12 +96,14 @@ def config(args):
 
 def dashboard(args):
     """Sub command for dashboard"""
+    import webbrowser
     webbrowser.open('https://sleuren.com/dashboard')
 
 # --- servers functions ---
 
 def servers_add(args):
     """Sub command for servers add"""
+    from .lib.tokens import Tokens
     tokens = Tokens(cfg)
     token = tokens.token()
     if not token:
@@ -69,10 +120,28 @@ def servers_add(args):
 
 def servers_list(args):
     """Sub command for servers list"""
+    from .lib.servers import Servers
     check_columns(args.columns)
     servers = Servers(cfg)
     servers.format = args.output
-    servers.list(args.issues, args.sort, args.reverse, args.limit, args.tag)
+    servers.delimiter = args.delimiter
+    servers.quoting = args.quoting
+    if args.from_snapshot:
+        if args.watch:
+            print('ERROR: --watch cannot be used together with --from-snapshot')
+            return
+        servers.source = open_snapshot(args.from_snapshot)
+        if servers.source == None:
+            return
+    if args.group_by:
+        if args.watch:
+            print('ERROR: --watch cannot be used together with --group-by')
+            return
+        servers.listGroups(args.group_by, args.issues, args.sort, args.reverse, args.limit, args.tag)
+    elif args.watch:
+        servers.watch(args.watch, args.issues, args.sort, args.reverse, args.limit, args.tag)
+    else:
+        servers.list(args.issues, args.sort, args.reverse, args.limit, args.tag)
 
 def servers_remove(args):
     """Sub command for servers remove"""
@@ -81,13 +150,9 @@ def servers_remove(args):
 
 def servers_update(args):
     """Sub command for servers update"""
+    from .lib.servers import Servers
     servers = Servers(cfg)
-    pattern = ''
-    if args.id:
-        pattern = args.id
-    elif args.name:
-        pattern = args.name
-    servers.setTags(pattern, args.tag)
+    servers.updateTags(id=args.id, name=args.name, regex=args.regex, matchTags=args.match_tag, issuesOnly=args.issues, tags=args.tag, addTags=args.add_tag, removeTags=args.remove_tag, dryRun=args.dry_run, report=args.report)
 
 def servers(args):
     """Sub command for servers"""
@@ -97,20 +162,20 @@ def servers(args):
 
 def signup(args):
     """Sub command for signup"""
+    import webbrowser
     webbrowser.open('https://sleuren.com')
 
 # --- sites functions ---
 
 def sites_add(args):
     """Sub command for sites add"""
+    from .lib.sites import Sites
     sites = Sites(cfg)
 
     if args.file:
         if os.path.isfile(args.file):
             with open(args.file) as file:
-                lines = file.readlines()
-                for line in lines:
-                    sites.add(line.strip())
+                sites.addMany(file, protocol=args.protocol, force=args.force, report=args.report)
         else:
             print('ERROR: File', args.file, 'to import not found')
     elif args.url:
@@ -120,15 +185,40 @@ def sites_add(args):
 
 def sites_list(args):
     """Sub command for sites list"""
+    from .lib.sites import Sites
     check_columns(args.columns)
     sites = Sites(cfg)
     sites.format = args.output
-    sites.list(id=args.id, url=args.url, name=args.name, location=args.location, pattern=args.pattern, issuesOnly=args.issues, sort=args.sort, reverse=args.reverse, limit=args.limit)
+    sites.delimiter = args.delimiter
+    sites.quoting = args.quoting
+    if args.from_snapshot:
+        if args.watch:
+            print('ERROR: --watch cannot be used together with --from-snapshot')
+            return
+        sites.source = open_snapshot(args.from_snapshot)
+        if sites.source == None:
+            return
+    if args.trend:
+        from .lib.history import parseDuration
+        window = parseDuration(args.trend)
+        if window == None:
+            return
+        sites.showTrend(window)
+    if args.group_by:
+        if args.watch:
+            print('ERROR: --watch cannot be used together with --group-by')
+            return
+        sites.listGroups(args.group_by, id=args.id, url=args.url, name=args.name, location=args.location, pattern=args.pattern, issuesOnly=args.issues, sort=args.sort, reverse=args.reverse, limit=args.limit)
+    elif args.watch:
+        sites.watch(args.watch, id=args.id, url=args.url, name=args.name, location=args.location, pattern=args.pattern, issuesOnly=args.issues, sort=args.sort, reverse=args.reverse, limit=args.limit)
+    else:
+        sites.list(id=args.id, url=args.url, name=args.name, location=args.location, pattern=args.pattern, issuesOnly=args.issues, sort=args.sort, reverse=args.reverse, limit=args.limit)
 
 def sites_remove(args):
     """Sub command for sites remove"""
+    from .lib.sites import Sites
     sites = Sites(cfg)
-    sites.remove(id=args.id, url=args.url, name=args.name, location=args.location, pattern=args.pattern)
+    sites.remove(id=args.id, url=args.url, name=args.name, location=args.location, pattern=args.pattern, dryRun=args.dry_run, report=args.report)
 
 def sites(args):
     """Sub command for sites"""
@@ -138,34 +228,86 @@ def sites(args):
 
 def statistics(args):
     """Sub command for statistics"""
+    from .lib.statistics import Statistics
     statistics = Statistics(cfg)
+    if args.from_snapshot:
+        statistics.source = open_snapshot(args.from_snapshot)
+        if statistics.source == None:
+            return
+    if args.history:
+        from .lib.history import parseDuration
+        statistics.history = parseDuration(args.history)
+        if statistics.history == None:
+            return
+    if args.percentiles or args.group_by or args.save_sketches or args.merge_sketches:
+        statistics.showPercentiles(args.group_by)
+        statistics.save_sketches = args.save_sketches
+        statistics.merge_sketches = args.merge_sketches
     statistics.print(format=args.output)
 
+# --- snapshot functions ---
+
+def snapshot(args):
+    """Sub command for snapshot"""
+    from .lib.snapshot import Snapshot
+    Snapshot(cfg, args.file).create()
+
 # --- tokens functions ---
 
 def tokens_create(args):
     """Sub command for tokens create"""
+    from .lib.tokens import Tokens
     tokens = Tokens(cfg)
     tokens.create()
 
 def tokens_list(args):
     """Sub command for tokens list"""
+    from .lib.tokens import Tokens
     tokens = Tokens(cfg)
-    tokens.list(format=args.output)
+    tokens.list(format=args.output, delimiter=args.delimiter, quoting=args.quoting)
 
 def tokens(args):
     """Sub command for tokens"""
     cli_subcommands[args.subparser].print_help()
 
-def performCLI():
-    """Parse the command line parameters and call the related functions"""
-
-    subparsers = cli.add_subparsers(title='commands', dest='subparser')
-    cli.add_argument('-v', '--version', action='store_true', help='print CLI version')
+# --- completion functions ---
+
+# options whose values are completed from the local index of the last download, as (resource, field)
+completions = {
+    ('servers', 'list'): {'--id': ('servers', 'id'), '--name': ('servers', 'name'), '--tag': ('servers', 'tag')},
+    ('servers', 'update'): {'--id': ('servers', 'id'), '--name': ('servers', 'name'), '--match-tag': ('servers', 'tag'), '--tag': ('servers', 'tag'), '--add-tag': ('servers', 'tag'), '--remove-tag': ('servers', 'tag')},
+    ('sites', 'list'): {'--id': ('sites', 'id'), '--url': ('sites', 'url'), '--name': ('sites', 'name'), '--location': ('sites', 'location')},
+    ('sites', 'remove'): {'--id': ('sites', 'id'), '--url': ('sites', 'url'), '--name': ('sites', 'name'), '--location': ('sites', 'location')},
+}
+
+def completion(args):
+    """Sub command for completion"""
+    from .lib.completion import SCRIPTS
+    print(SCRIPTS[args.shell], end='')
+
+def complete_values(path, option: str, prefix: str):
+    """Return the values of an option from the local completion index, or None if they are not indexed"""
+    from .lib.completion import CompletionIndex
+    if path in completions and option in completions[path]:
+        resource, field = completions[path][option]
+        return CompletionIndex(cfg, resource).find(field, prefix)
+    return None
+
+def complete(shell: str, args):
+    """Print the completions of the command line, called by the completion scripts"""
+    from .lib.completion import complete
+    # only the arguments of the commands on the command line are needed
+    words = ' '.join(args).split()
+    add_commands([name for name, help, build in commands if name in words])
+    load_settings()
+    complete(cli, shell, args, complete_values)
+
+# --- argument parsers of the commands ---
+
+def build_config(cli_config):
+    """Add the arguments of the config command"""
+    from .lib.config import CONFIG_FILE
 
-    # config
-
-    cli_config = subparsers.add_parser('config', help='configure connection to sleuren account')
     cli_config.set_defaults(func=config)
 
     config_subparsers = cli_config.add_subparsers(title='commands', dest='subparser')
@@ -173,19 +315,19 @@ def performCLI():
     cli_config_print = config_subparsers.add_parser('print', help='print current settings for Sleuren')
     cli_config_print.set_defaults(func=config_print)
 
-    cli_config_save = config_subparsers.add_parser('save', help='save current settings for Sleuren to ' + cfg.filename)
+    cli_config_save = config_subparsers.add_parser('save', help='save current settings for Sleuren to ' + CONFIG_FILE)
     cli_config_save.set_defaults(func=config_save)
     cli_config_save.add_argument('-a', '--api-key', metavar='key', help='specify your API KEY for Sleuren')
+    cli_config_save.add_argument('--history', choices=['on', 'off'], help='record the metrics of every fetch for statistics --history and sites list --trend')
 
+def build_dashboard(cli_dashboard):
+    """Add the arguments of the dashboard command"""
 
-    # dashboard
-
-    cli_dashboard = subparsers.add_parser('dashboard', help='open Sleuren Dashboard in your Web Browser')
     cli_dashboard.set_defaults(func=dashboard)
 
-    # servers
+def build_servers(cli_servers):
+    """Add the arguments of the servers command"""
 
-    cli_servers = subparsers.add_parser('servers', help='list and manage monitored servers')
     cli_servers.set_defaults(func=servers)
     cli_servers_subparsers = cli_servers.add_subparsers(title='commands', dest='subparser')
 
@@ -194,52 +336,74 @@ def performCLI():
 
     cli_servers_list = cli_servers_subparsers.add_parser('list', help='list monitored servers')
     cli_servers_list.set_defaults(func=servers_list)
+    add_cache_arguments(cli_servers_list)
     cli_servers_list.add_argument('--id', nargs='?', default='', metavar='id', help='update server with given ID')
     cli_servers_list.add_argument('--name', nargs='?', default='', metavar='name', help='update server with given name')
     cli_servers_list.add_argument('--tag', nargs='*', default='', metavar='tag', help='only list servers matching these tags')
     cli_servers_list.add_argument('--issues', action='store_true', help='show only servers with issues')
 
     cli_servers_list.add_argument('--columns', nargs='*', default='', metavar='col', help='specify columns to print in table view or remove columns with 0 as prefix e.g. "0id"')
-    cli_servers_list.add_argument('--sort', nargs='?', default='', metavar='col', help='sort by specified column. Reverse sort by adding --reverse')
+    cli_servers_list.add_argument('--sort', nargs='?', default='', metavar='col', help='sort by comma separated columns (id, name, ip, status, os, cpu, mem, disk, free, tags, with --group-by count, issues, avg_cpu, max_cpu, avg_mem, max_mem, avg_disk, max_disk, min_free or column number), prefix - sorts descending e.g. --sort=-cpu,name. Reverse sort by adding --reverse')
     cli_servers_list.add_argument('--reverse', action='store_true', help='show in descending order. Works only together with --sort')
     cli_servers_list.add_argument('--limit', nargs='?', default=0, type=int, metavar='n', help='limit the number of printed items')
+    cli_servers_list.add_argument('--from-snapshot', nargs='?', default='', metavar='file', help='query the servers of a snapshot created with "sleurencli snapshot" instead of the API')
+    cli_servers_list.add_argument('--watch', nargs='?', default=0, const=10.0, type=positive_seconds, metavar='sec', help='keep polling every sec seconds (10 if not given) and print only the servers that changed')
+    cli_servers_list.add_argument('--group-by', choices=['tag', 'os', 'status'], default='', help='print one row per tag, OS or status with count, issues, averages and worst values')
 
     cli_servers_list.add_argument('--output', choices=['json', 'csv', 'table'], default='table', help='output format for the data')
     cli_servers_list.add_argument('--json', action='store_const', const='json', dest='output', help='print data in JSON format')
     cli_servers_list.add_argument('--csv', action='store_const', const='csv', dest='output', help='print data in CSV format')
     cli_servers_list.add_argument('--table', action='store_const', const='table', dest='output', help='print data as ASCII table')
+    add_csv_arguments(cli_servers_list)
 
     cli_servers_remove = cli_servers_subparsers.add_parser('remove', help='remove monitoring for a server')
     cli_servers_remove.set_defaults(func=servers_remove)
 
-    cli_servers_update = cli_servers_subparsers.add_parser('update', help='set tags for a server')
+    cli_servers_update = cli_servers_subparsers.add_parser('update', help='set tags for one or more servers')
     cli_servers_update.set_defaults(func=servers_update)
+    add_cache_arguments(cli_servers_update)
     cli_servers_update.add_argument('--id', nargs='?', default='', metavar='id', help='update server with given ID')
-    cli_servers_update.add_argument('--name', nargs='?', default='', metavar='name', help='update server with given name')
-    cli_servers_update.add_argument('--tag', nargs='*', default='', metavar='tag', help='set these tags for one or more servers specified')
+    cli_servers_update.add_argument('--name', nargs='?', default='', metavar='name', help='update servers with given text in their name')
+    cli_servers_update.add_argument('--regex', nargs='?', default='', metavar='regex', help='update servers with names matching the regular expression')
+    cli_servers_update.add_argument('--match-tag', nargs='*', default=[], metavar='tag', help='update servers having all of these tags')
+    cli_servers_update.add_argument('--issues', action='store_true', help='update only servers with issues')
+
+    cli_servers_update.add_argument('--tag', nargs='*', default=None, metavar='tag', help='replace the tags of the selected servers with these tags')
+    cli_servers_update.add_argument('--add-tag', nargs='*', default=[], metavar='tag', help='add these tags to the selected servers')
+    cli_servers_update.add_argument('--remove-tag', nargs='*', default=[], metavar='tag', help='remove these tags from the selected servers')
 
-    # signup
+    cli_servers_update.add_argument('--dry-run', action='store_true', help='only print the servers that would be updated')
+    cli_servers_update.add_argument('--workers', nargs='?', default=None, type=int, metavar='n', help='number of parallel requests')
+    cli_servers_update.add_argument('--rate-limit', nargs='?', default=None, type=float, metavar='n', help='maximum number of requests per second, 0 for no limit')
+    cli_servers_update.add_argument('--report', nargs='?', default='', metavar='file', help='save updated and failed servers in JSON format to file')
+
+def build_signup(cli_signup):
+    """Add the arguments of the signup command"""
 
-    cli_signup = subparsers.add_parser('signup', help='sign up for Sleuren')
     cli_signup.set_defaults(func=signup)
 
-    # sites
+def build_sites(cli_sites):
+    """Add the arguments of the sites command"""
 
-    cli_sites = subparsers.add_parser('sites', help='list and manage monitored websites')
     cli_sites.set_defaults(func=sites)
     cli_sites_subparsers = cli_sites.add_subparsers(title='commands', dest='subparser')
 
     cli_sites_add = cli_sites_subparsers.add_parser('add', help='activate monitoring for a site')
     cli_sites_add.set_defaults(func=sites_add)
+    add_cache_arguments(cli_sites_add)
     cli_sites_add.add_argument('--url', nargs='?', metavar='url', help='url of site that should be monitored')
     cli_sites_add.add_argument('--name', nargs='?', metavar='name', help='name of site that should be monitored (optional)')
     cli_sites_add.add_argument('--protocol', nargs='?', default='https', metavar='protocol', help='specify a different protocol than https')
 #    cli_sites_add.add_argument('--port', nargs='?', default=443, type=int, metavar='port', help='specify a different port than 443')
     cli_sites_add.add_argument('--force', action='store_true', help='add new monitor even if already exists')
     cli_sites_add.add_argument('--file', nargs='?', default='', metavar='file', help='file containing one URL per line to monitor')
+    cli_sites_add.add_argument('--workers', nargs='?', default=None, type=int, metavar='n', help='number of parallel requests when importing a file')
+    cli_sites_add.add_argument('--rate-limit', nargs='?', default=None, type=float, metavar='n', help='maximum number of requests per second, 0 for no limit')
+    cli_sites_add.add_argument('--report', nargs='?', default='', metavar='file', help='save added, skipped and failed URLs of the import in JSON format to file')
 
     cli_sites_list = cli_sites_subparsers.add_parser('list', help='list sites')
     cli_sites_list.set_defaults(func=sites_list)
+    add_cache_arguments(cli_sites_list)
     cli_sites_list.add_argument('--id', nargs='?', default='', metavar='id', help='list site with given ID')
     cli_sites_list.add_argument('--url', nargs='?', default='', metavar='url', help='list site with given url')
     cli_sites_list.add_argument('--name', nargs='?', default='', metavar='name', help='list site with given name')
@@ -248,34 +412,64 @@ def performCLI():
     cli_sites_list.add_argument('--issues', action='store_true', help='show only sites with issues')
 
     cli_sites_list.add_argument('--columns', nargs='*', default='', metavar='col', help='specify columns to print in table view or remove columns with 0 as prefix e.g. "0id"')
-    cli_sites_list.add_argument('--sort', nargs='?', default='', metavar='col', help='sort by specified column. Reverse sort by adding --reverse')
+    cli_sites_list.add_argument('--sort', nargs='?', default='', metavar='col', help='sort by comma separated columns (id, url, status, uptime, ttfb, location, with --trend uptime_trend, avg_ttfb, ttfb_trend, worst_ttfb, with --group-by count, issues, avg_uptime, min_uptime, avg_ttfb, max_ttfb or column number), prefix - sorts descending e.g. --sort=-ttfb,url. Reverse sort by adding --reverse')
     cli_sites_list.add_argument('--reverse', action='store_true', help='show in descending order. Works only together with --sort')
     cli_sites_list.add_argument('--limit', nargs='?', default=0, type=int, metavar='n', help='limit the number of printed items')
+    cli_sites_list.add_argument('--from-snapshot', nargs='?', default='', metavar='file', help='query the sites of a snapshot created with "sleurencli snapshot" instead of the API')
+    cli_sites_list.add_argument('--watch', nargs='?', default=0, const=10.0, type=positive_seconds, metavar='sec', help='keep polling every sec seconds (10 if not given) and print only the sites that changed')
+    cli_sites_list.add_argument('--group-by', choices=['location', 'status', 'code'], default='', help='print one row per location, status or response code with count, issues, averages and worst values')
+    cli_sites_list.add_argument('--trend', nargs='?', default='', const='7d', metavar='window', help='add uptime change, avg, change and worst ttfb of the recorded history over the window, e.g. 24h or 7d (default 7d)')
 
     cli_sites_list.add_argument('--output', choices=['json', 'csv', 'table'], default='table', help='output format for the data')
     cli_sites_list.add_argument('--json', action='store_const', const='json', dest='output', help='print data in JSON format')
     cli_sites_list.add_argument('--csv', action='store_const', const='csv', dest='output', help='print data in CSV format')
     cli_sites_list.add_argument('--table', action='store_const', const='table', dest='output', help='print data as ASCII table')
+    add_csv_arguments(cli_sites_list)
 
     cli_sites_remove = cli_sites_subparsers.add_parser('remove', help='remove a contact')
     cli_sites_remove.set_defaults(func=sites_remove)
+    add_cache_arguments(cli_sites_remove)
     cli_sites_remove.add_argument('--id', nargs='?', default='', metavar='id', help='remove site with given ID')
     cli_sites_remove.add_argument('--url', nargs='?', default='', metavar='url', help='remove site with given url')
     cli_sites_remove.add_argument('--name', nargs='?', default='', metavar='name', help='remove site with given name')
     cli_sites_remove.add_argument('--location', nargs='?', default='', metavar='location', help='remove sites monitored from given location')
     cli_sites_remove.add_argument('--pattern', nargs='?', default='', metavar='pattern', help='remove sites with pattern included in URL')
+    cli_sites_remove.add_argument('--dry-run', action='store_true', help='only print the sites that would be removed')
+    cli_sites_remove.add_argument('--workers', nargs='?', default=None, type=int, metavar='n', help='number of parallel requests')
+    cli_sites_remove.add_argument('--rate-limit', nargs='?', default=None, type=float, metavar='n', help='maximum number of requests per second, 0 for no limit')
+    cli_sites_remove.add_argument('--report', nargs='?', default='', metavar='file', help='save removed and failed sites in JSON format to file')
 
-    # statistics
+def build_statistics(cli_statistics):
+    """Add the arguments of the statistics command"""
 
-    cli_statistics = subparsers.add_parser('statistics', help='print statistics')
     cli_statistics.set_defaults(func=statistics)
+    add_cache_arguments(cli_statistics)
+    cli_statistics.add_argument('--from-snapshot', nargs='?', default='', metavar='file', help='summarize a snapshot created with "sleurencli snapshot" instead of the API')
+    cli_statistics.add_argument('--history', nargs='?', default='', const='7d', metavar='window', help='summarize the recorded history over the window as well, e.g. 24h, 7d or 4w (default 7d)')
+    cli_statistics.add_argument('--percentiles', action='store_true', help='print p50, p90, p99 and the worst value of cpu, mem and disk usage, uptime and ttfb')
+    cli_statistics.add_argument('--group-by', choices=['location', 'tag'], default='', help='print the percentiles per location of the sites or per tag of the servers')
+    cli_statistics.add_argument('--save-sketches', nargs='?', default='', metavar='file', help='save the quantile sketches of this run in JSON format to file, to be merged by later runs')
+    cli_statistics.add_argument('--merge-sketches', nargs='+', default=[], metavar='file', help='merge quantile sketches saved by other runs or accounts into the percentiles')
     cli_statistics.add_argument('--output', choices=['csv', 'table'], default='table', help='output format for the data')
     cli_statistics.add_argument('--csv', action='store_const', const='csv', dest='output', help='print data in CSV format')
     cli_statistics.add_argument('--table', action='store_const', const='table', dest='output', help='print data as ASCII table')
 
-    # user tokens
+def build_completion(cli_completion):
+    """Add the arguments of the completion command"""
+
+    cli_completion.set_defaults(func=completion)
+    cli_completion.add_argument('shell', choices=['bash', 'zsh', 'fish'], help='shell to print the completion script for')
+
+def build_snapshot(cli_snapshot):
+    """Add the arguments of the snapshot command"""
+
+    cli_snapshot.set_defaults(func=snapshot)
+    add_cache_arguments(cli_snapshot)
+    cli_snapshot.add_argument('file', nargs='?', default='sleuren.db', help='SQLite database file to save the snapshot to (default: sleuren.db)')
+
+def build_tokens(cli_tokens):
+    """Add the arguments of the tokens command"""
 
-    cli_tokens = subparsers.add_parser('tokens', help='list or create tokens')
     cli_tokens.set_defaults(func=tokens)
     cli_tokens_subparsers = cli_tokens.add_subparsers(title='commands', dest='subparser')
 
@@ -284,43 +478,108 @@ def performCLI():
 
     cli_tokens_list = cli_tokens_subparsers.add_parser('list', help='list tokens')
     cli_tokens_list.set_defaults(func=tokens_list)
+    add_cache_arguments(cli_tokens_list)
     cli_tokens_list.add_argument('--output', choices=['json', 'csv', 'table'], default='table', help='output format for the data')
     cli_tokens_list.add_argument('--json', action='store_const', const='json', dest='output', help='print data in JSON format')
     cli_tokens_list.add_argument('--csv', action='store_const', const='csv', dest='output', help='print data in CSV format')
     cli_tokens_list.add_argument('--table', action='store_const', const='table', dest='output', help='print data as ASCII table')
+    add_csv_arguments(cli_tokens_list)
+
+# name, help and function adding the arguments of all commands, only the arguments of the called command are added
+commands = [
+    ('config', 'configure connection to sleuren account', build_config),
+    ('dashboard', 'open Sleuren Dashboard in your Web Browser', build_dashboard),
+    ('servers', 'list and manage monitored servers', build_servers),
+    ('signup', 'sign up for Sleuren', build_signup),
+    ('sites', 'list and manage monitored websites', build_sites),
+    ('snapshot', 'save all servers, sites and tokens to a local SQLite database', build_snapshot),
+    ('statistics', 'print statistics', build_statistics),
+    ('tokens', 'list or create tokens', build_tokens),
+    ('completion', 'print the shell completion script for bash, zsh or fish', build_completion),
+]
+
+def add_commands(names):
+    """Add all commands to the parser, but their arguments only for the commands with the given names"""
+
+    subparsers = cli.add_subparsers(title='commands', dest='subparser')
+    cli.add_argument('-v', '--version', action='store_true', help='print CLI version')
+    # only listed for the help, the option is taken from the arguments by trace_option() before they are parsed
+    cli.add_argument('--trace', nargs='?', const='', metavar='FILE', help='print the time spent per phase of the command to stderr, phases of parallel downloads can add up to more than the wall time, and save all spans to FILE in Chrome trace format for chrome://tracing or ui.perfetto.dev. FILE must end with .json unless given as --trace=FILE')
+
+    for name, help, build in commands:
+        cli_subcommands[name] = subparsers.add_parser(name, help=help)
+        if name in names:
+            build(cli_subcommands[name])
 
-    # Parse
-    cli_subcommands['config'] = cli_config
-    cli_subcommands['dashboard'] = cli_dashboard
-    cli_subcommands['servers'] = cli_servers
-    cli_subcommands['signup'] = cli_signup
-    cli_subcommands['sites'] = cli_sites
-    cli_subcommands['statistics'] = cli_statistics
-    cli_subcommands['tokens'] = cli_tokens
+def performCLI():
+    """Parse the command line parameters and call the related functions"""
 
-    args = cli.parse_args()
+    from .lib.tracing import span
+
+    # the called command is the first argument that is no option
+    command = next((arg for arg in sys.argv[1:] if not arg.startswith('-')), None)
+    with span('parse arguments', 'cli'):
+        add_commands([command])
+
+        # Parse
+        args = cli.parse_args()
     if args.subparser == None:
         if args.version:
             print('Sleuren CLI Version:', __version__)
         elif 'func' in args:
             # statistics, signup and dashboard is shown directly without subparser
             if args.func == config:
-                cli_config.print_help()
+                cli_subcommands['config'].print_help()
             elif args.func == servers:
-                cli_servers.print_help()
+                cli_subcommands['servers'].print_help()
             elif args.func == sites:
-                cli_sites.print_help()
+                cli_subcommands['sites'].print_help()
             elif args.func == tokens:
-                cli_tokens.print_help()
+                cli_subcommands['tokens'].print_help()
             else:
                 cli.print_help()
         else:
             cli.print_help()
     else:
-        args.func(args)
+        with span('load settings', 'config'):
+            load_settings()
+            check_settings(args)
+        with span(args.func.__name__.replace('_', ' '), 'command', 'run command'):
+            args.func(args)
+
+def trace_option():
+    """Remove --trace [FILE] from the arguments, so it can be given anywhere, and return the file, '' without file or None if not given"""
+
+    for i, arg in enumerate(sys.argv[1:], 1):
+        if arg == '--':
+            break
+        if arg.startswith('--trace='):
+            del sys.argv[i]
+            return arg[len('--trace='):]
+        if arg == '--trace':
+            del sys.argv[i]
+            # the option value is optional, so only a following .json file is taken as value, not e.g. the command
+            if i < len(sys.argv) and sys.argv[i].lower().endswith('.json'):
+                return sys.argv.pop(i)
+            return ''
+    return None
 
 def main():
-    performCLI()
+    # tracing starts first to include the imports of the command
+    trace = trace_option()
+    if trace != None:
+        from .lib import tracing
+        tracing.enable()
+
+    try:
+        # shell completion is answered from the local index, without calling the API
+        if len(sys.argv) > 2 and sys.argv[1] == '__complete':
+            complete(sys.argv[2], sys.argv[3:])
+        else:
+            performCLI()
+    finally:
+        if trace != None:
+            tracing.finish(trace)
 
 if __name__ == '__main__':
     main()
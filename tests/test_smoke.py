@@ -0,0 +1,92 @@
+"""Smoke tests running the CLI against the mock API of the benchmarks, so no API key is needed"""
+
+import os
+import sys
+import json
+import subprocess
+import urllib.error
+import urllib.request
+
+import pytest
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(root, 'benchmarks'))
+
+from mockapi import MockApi
+
+SERVERS = 250
+MONITORS = 300
+
+CONFIG = '''[Connection]
+api-key = smoke
+endpoint = {endpoint}
+'''
+
+@pytest.fixture(scope='module')
+def api():
+    api = MockApi(0, SERVERS, MONITORS).start()
+    yield api
+    api.stop()
+
+@pytest.fixture
+def cli(api, tmp_path):
+    """Return a function running the CLI in a directory of its own, with an empty cache, and returning its output"""
+
+    api.reset()
+    with open(os.path.join(str(tmp_path), 'sleuren.ini'), 'w') as file:
+        file.write(CONFIG.format(endpoint=api.endpoint))
+    env = dict(os.environ, PYTHONPATH=root, XDG_CACHE_HOME=os.path.join(str(tmp_path), 'cache'))
+
+    def run(*args):
+        process = subprocess.run([sys.executable, '-m', 'sleurencli.sleurencli'] + list(args), cwd=str(tmp_path), env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, timeout=60)
+        output = process.stdout.decode()
+        assert process.returncode == 0, output
+        return output
+
+    return run
+
+def get(api, path: str):
+    with urllib.request.urlopen(api.endpoint + path) as response:
+        return json.loads(response.read().decode())
+
+def test_servers_list(api, cli):
+    output = cli('servers', 'list')
+    assert 'host-0.example.com' in output
+    assert 'host-%d.example.com' % (SERVERS - 1) in output
+    assert 'ERROR' not in output
+    assert api.counts.get('GET servers', 0) > 0
+
+def test_sites_list_csv(cli):
+    lines = cli('sites', 'list', '--csv').splitlines()
+    assert lines[0].split(';')[:3] == ['id', 'url', 'name']
+    assert len(lines) == MONITORS + 1
+    assert lines[1].startswith('mon000000;site0.example.com;site0;')
+
+def test_statistics(cli):
+    output = cli('statistics')
+    assert 'Servers' in output and 'Sites' in output
+    assert 'avg cpu usage of all %d servers' % SERVERS in output
+    assert 'avg uptime of all %d sites' % MONITORS in output
+
+def test_cache(api, cli):
+    first = cli('servers', 'list')
+    requests = api.counts['GET servers']
+
+    # a fresh cache answers without any request
+    assert cli('servers', 'list') == first
+    assert api.counts['GET servers'] == requests
+    assert 'not modified' not in api.counts
+
+    # --max-age 0 revalidates every page, which the mock API answers with 304
+    api.resetCounts()
+    assert cli('servers', 'list', '--max-age', '0') == first
+    assert api.counts['GET servers'] > 0
+    assert api.counts['not modified'] == api.counts['GET servers']
+
+def test_items(api):
+    assert get(api, 'server/srv000001')['name'] == 'host-1.example.com'
+    assert get(api, 'monitor/mon000002')['url'] == 'site2.example.com'
+    for path in ('server/unknown', 'monitor/unknown'):
+        with pytest.raises(urllib.error.HTTPError) as error:
+            get(api, path)
+        assert error.value.code == 404